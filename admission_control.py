@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from config.config import (ADMISSION_MAX_TRACKED_SOURCES, MAX_CONCURRENT_HANDLERS, RATE_LIMIT_PER_COMMAND,
+                           RATE_LIMIT_PER_SOURCE)
+from utils import metrics
+
+KNOWN_COMMANDS = frozenset(["REG", "UNREG", "JOIN", "LEAVE", "SER", "ERROR", "REPL"])
+
+REJECTED = metrics.REGISTRY.counter("bs_admission_rejected", "Requests rejected by admission control", ["reason"])
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst` tokens."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class AdmissionController:
+    """
+    Admission control for the bootstrap server.
+
+    Requests go through three cheap checks, in the order they can be made:
+        1. `acquire` on accept: a global cap on concurrently running handlers, then a token bucket per
+           source IP. Nothing has been read from the socket yet.
+        2. `check_frame` on the first bytes: the 4-digit length prefix and the command must look valid and the
+           source's token bucket for that command must have a token. Only then is the frame parsed.
+        3. `release` when the handler finishes.
+
+    Every rejection is counted in `rejected` by reason, so a misbehaving client shows up without
+    starving well-behaved registrations.
+    """
+
+    def __init__(self, per_source=RATE_LIMIT_PER_SOURCE, per_command=RATE_LIMIT_PER_COMMAND,
+                 max_concurrent=MAX_CONCURRENT_HANDLERS, max_sources=ADMISSION_MAX_TRACKED_SOURCES, clock=None,
+                 exempt_sources=()):
+        """
+        Args:
+            per_source (tuple): (rate per second, burst) for each source IP, or None to disable.
+            per_command (dict): Command -> (rate per second, burst) for each source IP, so one client cannot use
+                up a command for everyone.
+            max_concurrent (int): Maximum number of handlers running at once.
+            max_sources (int): Number of sources whose buckets are kept; the least recently seen are dropped first.
+            clock (callable): Time source, `time.monotonic` by default.
+            exempt_sources (iterable): Source IPs that skip the per-source limit, e.g. the other bootstrap servers of
+                the cluster. Their per-command limits still apply.
+        """
+        self.per_source = per_source
+        self.per_command = per_command or {}
+        self.max_sources = max_sources
+        self.clock = clock or time.monotonic
+        self.exempt_sources = frozenset(exempt_sources)
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.source_buckets = OrderedDict()  # ip -> TokenBucket, in least recently used order
+        self.command_buckets = OrderedDict()  # (ip, command) -> TokenBucket, in least recently used order
+        self.lock = threading.Lock()
+        self.rejected = Counter()  # reason -> count
+        self.admitted = 0
+
+    def acquire(self, source_ip):
+        """
+        Decide on a new connection before anything is read from it.
+
+        Returns:
+            str: None if admitted (the caller must call `release` later), otherwise the rejection reason.
+        """
+        if not self.slots.acquire(blocking=False):
+            return self.reject("concurrency")
+        limited = self.per_source is not None and source_ip not in self.exempt_sources
+        if limited and not self.take_source_token(source_ip):
+            self.slots.release()
+            return self.reject("source_rate")
+        return None
+
+    def take_source_token(self, source_ip):
+        return self.take_token(self.source_buckets, source_ip, self.per_source, self.max_sources)
+
+    def take_command_token(self, source_ip, command):
+        limit = self.per_command.get(command)
+        if limit is None:
+            return True
+        return self.take_token(self.command_buckets, (source_ip, command), limit,
+                               self.max_sources * len(self.per_command))
+
+    def take_token(self, buckets, key, limit, max_buckets):
+        """Take a token from the bucket of `key`, creating it (and forgetting the least recently used) if needed."""
+        now = self.clock()
+        with self.lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(*limit, now)
+                buckets[key] = bucket
+                if len(buckets) > max_buckets:
+                    buckets.popitem(last=False)
+            else:
+                buckets.move_to_end(key)
+            return bucket.take(now)
+
+    def check_frame(self, data, source_ip=None):
+        """
+        Cheaply validate the start of a frame before it is tokenized.
+
+        Args:
+            data (str): The received frame.
+            source_ip (str): Address the frame came from; its command buckets are charged.
+
+        Returns:
+            tuple: (command, rejection reason). The reason is None if the frame may be handled.
+        """
+        if len(data) < 6 or not data[:4].isdigit() or data[4] != " ":
+            return None, self.reject("malformed")
+        end = data.find(" ", 5)
+        command = data[5:end] if end != -1 else data[5:].rstrip()
+        if command not in KNOWN_COMMANDS:
+            return command, self.reject("unknown_command")
+        if not self.take_command_token(source_ip, command):
+            return command, self.reject(f"command_rate:{command}")
+        with self.lock:
+            self.admitted += 1
+        return command, None
+
+    def release(self):
+        self.slots.release()
+
+    def reject(self, reason):
+        with self.lock:
+            self.rejected[reason] += 1
+        REJECTED.labels(reason).inc()
+        return reason
+
+    def stats(self):
+        """Return a snapshot of the admission counters."""
+        with self.lock:
+            return {"admitted": self.admitted, "rejected": dict(self.rejected)}
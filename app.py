@@ -1,12 +1,28 @@
 import os
 import random
-import hashlib
-from flask import Flask, jsonify, send_file, request, send_from_directory
+import time
+from flask import Flask, jsonify, send_file, request, send_from_directory, Response, g
+from werkzeug.exceptions import NotFound
 
-from config.config import FLASK_API_PORT
+from config.config import DOWNLOAD_CACHE_DIR, FLASK_API_PORT, HASH_BLOCK_SIZE
+from download_cache import DownloadCache
+from utils import metrics
+from utils.hash_pipeline import HashPipeline
 
 app = Flask(__name__)
 
+# Throughput buckets in bytes per second, from 100 KB/s to 1 GB/s
+THROUGHPUT_BUCKETS = (1e5, 5e5, 1e6, 5e6, 1e7, 2.5e7, 5e7, 1e8, 2.5e8, 5e8, 1e9)
+
+REQUEST_LATENCY = metrics.REGISTRY.histogram("api_request_duration_seconds", "Time spent handling an API request",
+                                             ["endpoint"])
+BYTES_SERVED = metrics.REGISTRY.counter("api_bytes_served", "File bytes sent by the API", ["endpoint"])
+BYTES_RECEIVED = metrics.REGISTRY.counter("api_bytes_received", "File bytes uploaded to the API")
+BYTES_GENERATED = metrics.REGISTRY.counter("api_bytes_generated", "Bytes of random files generated")
+TRANSFER_THROUGHPUT = metrics.REGISTRY.histogram("api_transfer_throughput_bytes_per_second",
+                                                 "Throughput of completed file transfers", ["endpoint"],
+                                                 buckets=THROUGHPUT_BUCKETS)
+
 # Directory to store generated and uploaded files
 FILE_DIR = './files'
 UPLOAD_FOLDER = './uploaded_files'
@@ -14,6 +30,9 @@ os.makedirs(FILE_DIR, exist_ok=True)
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# Files this node downloaded from others (see download_cache.py); served when not found in the folders above
+cache = DownloadCache(DOWNLOAD_CACHE_DIR)
+
 
 def generate_file():
     """Generate a random file with size between 2-10 MB and return its details."""
@@ -22,30 +41,66 @@ def generate_file():
     file_name = f"file_{file_size_mb}MB.bin"
     file_path = os.path.join(FILE_DIR, file_name)
 
-    # Write the file in chunks and calculate SHA-256 hash incrementally
-    sha256_hash = hashlib.sha256()
-    chunk_size = 1024 * 1024  # 1 MB
+    # Write the file in chunks while a worker thread hashes them
+    chunk_size = HASH_BLOCK_SIZE
     bytes_written = 0
-    with open(file_path, 'wb') as f:
+    with HashPipeline() as pipeline, open(file_path, 'wb') as f:
         while bytes_written < file_size_bytes:
             chunk = os.urandom(min(chunk_size, file_size_bytes - bytes_written))
+            pipeline.feed(chunk)
             f.write(chunk)
-            sha256_hash.update(chunk)
             bytes_written += len(chunk)
 
-    sha256_hash = sha256_hash.hexdigest()
+    sha256_hash = pipeline.hexdigest()
+    block_hashes = pipeline.block_hexdigests()
+
+    BYTES_GENERATED.inc(bytes_written)
+    return file_name, file_path, file_size_mb, sha256_hash, block_hashes
+
+
+def track_transfer(response, endpoint, start):
+    """Record bytes and throughput of a file response once it has been fully streamed to the client."""
+    size = response.content_length or 0
+
+    def record():
+        elapsed = time.perf_counter() - start
+        BYTES_SERVED.labels(endpoint).inc(size)
+        if size and elapsed > 0:
+            TRANSFER_THROUGHPUT.labels(endpoint).observe(size / elapsed)
+
+    response.call_on_close(record)
+    return response
+
 
-    return file_name, file_path, file_size_mb, sha256_hash
+@app.before_request
+def start_timer():
+    g.start_time = time.perf_counter()
+
+
+@app.after_request
+def record_latency(response):
+    start = g.get("start_time")
+    if start is not None:
+        REQUEST_LATENCY.labels(request.endpoint or "unknown").observe(time.perf_counter() - start)
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def export_metrics():
+    """Expose the process metrics in the Prometheus text format."""
+    return Response(metrics.REGISTRY.render(), mimetype=metrics.CONTENT_TYPE)
 
 
 @app.route('/generate', methods=['GET'])
 def generate_and_get_file():
     """Generate a file and return its details."""
-    file_name, file_path, file_size_mb, sha256_hash = generate_file()
+    file_name, file_path, file_size_mb, sha256_hash, block_hashes = generate_file()
     return jsonify({
         'file_name': file_name,
         'file_size_mb': file_size_mb,
-        'sha256_hash': sha256_hash
+        'sha256_hash': sha256_hash,
+        'block_size': HASH_BLOCK_SIZE,
+        'block_sha256': block_hashes
     })
 
 
@@ -54,8 +109,19 @@ def download_file(file_name):
     """Download the generated file."""
     file_path = os.path.join(FILE_DIR, file_name)
     if os.path.exists(file_path):
-        return send_file(file_path, as_attachment=True)
-    return jsonify({'error': 'File not found'}), 404
+        return track_transfer(send_file(file_path, as_attachment=True), 'download', g.start_time)
+    return send_cached(file_name, 'download')
+
+
+def send_cached(file_name, endpoint):
+    """Serve a file from the download cache, marking it as recently used."""
+    try:
+        cached_path = cache.get(file_name)
+    except ValueError:
+        cached_path = None
+    if cached_path is None:
+        return jsonify({'error': 'File not found'}), 404
+    return track_transfer(send_file(cached_path, as_attachment=True), f'{endpoint}_cache', g.start_time)
 
 
 @app.route('/upload', methods=['POST'])
@@ -70,6 +136,7 @@ def upload_file():
 
     file_path = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
     file.save(file_path)
+    BYTES_RECEIVED.inc(os.path.getsize(file_path))
     return jsonify({'message': f'File {file.filename} uploaded successfully'}), 200
 
 
@@ -77,9 +144,10 @@ def upload_file():
 def download_uploaded_file(filename):
     """Download an uploaded file."""
     try:
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename, as_attachment=True)
-    except FileNotFoundError:
-        return jsonify({'error': 'File not found'}), 404
+        response = send_from_directory(app.config['UPLOAD_FOLDER'], filename, as_attachment=True)
+        return track_transfer(response, 'uploaded', g.start_time)
+    except (FileNotFoundError, NotFound):
+        return send_cached(filename, 'uploaded')
 
 
 if __name__ == '__main__':
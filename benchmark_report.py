@@ -0,0 +1,203 @@
+"""
+Headless benchmark report generator.
+
+Loads one or more result files (JSON lines or CSV, one sample per row), computes percentiles and CDFs with NumPy,
+writes one CDF plot per metric comparing the runs, and a summary table with the change of every run against the
+first (baseline) run.
+
+Example:
+    python benchmark_report.py baseline.jsonl candidate.jsonl --metric latency --output-dir report --format svg
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+
+from utils.plotting import load_pyplot
+
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+def load_results(path):
+    """
+    Load a result file into numeric columns.
+
+    Args:
+        path (str): A .jsonl / .json (one JSON object per line) or .csv file.
+
+    Returns:
+        dict: Column name -> 1-D float array. Non-numeric columns are dropped.
+    """
+    with open(path, "r", newline="") as f:
+        if path.endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    columns = {}
+    for key in {key for row in rows for key in row}:
+        try:
+            values = np.array([row[key] for row in rows if row.get(key) not in (None, "")], dtype=float)
+        except (TypeError, ValueError):
+            continue
+        if values.size:
+            columns[key] = values
+    return columns
+
+
+def summarize(values, percentiles=PERCENTILES):
+    """
+    Compute count, mean, standard deviation, min, max and the requested percentiles of a sample.
+
+    The array is sorted once; all percentiles are then read from it in a single vectorized call.
+    """
+    ordered = np.sort(values)
+    summary = {
+        "count": int(ordered.size),
+        "mean": float(ordered.mean()),
+        "std": float(ordered.std(ddof=1)) if ordered.size > 1 else 0.0,
+        "min": float(ordered[0]),
+        "max": float(ordered[-1]),
+    }
+    for p, value in zip(percentiles, np.percentile(ordered, percentiles)):
+        summary[f"p{p:g}"] = float(value)
+    return summary
+
+
+def empirical_cdf(values):
+    """Return (sorted values, cumulative fractions)."""
+    ordered = np.sort(values)
+    return ordered, np.arange(1, ordered.size + 1) / ordered.size
+
+
+def compare_runs(runs, metric, percentiles=PERCENTILES):
+    """
+    Summarize `metric` for every run and compute the relative change of each statistic against the first run.
+
+    Args:
+        runs (list): (run name, columns) pairs, the baseline first.
+        metric (str): Column to compare.
+
+    Returns:
+        list: One dict per run that has the metric, with "run", the statistics and "<stat>_change" ratios.
+    """
+    rows = []
+    baseline = None
+    for name, columns in runs:
+        if metric not in columns:
+            continue
+        row = {"run": name, **summarize(columns[metric], percentiles)}
+        if baseline is None:
+            baseline = row
+        for key in ["mean"] + [f"p{p:g}" for p in percentiles]:
+            row[f"{key}_change"] = (row[key] / baseline[key] - 1) if baseline[key] else 0.0
+        rows.append(row)
+    return rows
+
+
+def render_markdown(metric, rows, percentiles=PERCENTILES, threshold=None):
+    """Render a comparison table; with `threshold`, runs whose p99 grew by more than it are flagged."""
+    stats = ["mean"] + [f"p{p:g}" for p in percentiles]
+    lines = [f"### {metric}", "",
+             "| run | count | " + " | ".join(stats) + " | max |" + (" status |" if threshold is not None else ""),
+             "|---" * (len(stats) + 3 + (threshold is not None)) + "|"]
+    for row in rows:
+        cells = [f"{row[s]:.6g} ({row[s + '_change']:+.1%})" for s in stats]
+        line = f"| {row['run']} | {row['count']} | " + " | ".join(cells) + f" | {row['max']:.6g} |"
+        if threshold is not None:
+            line += " REGRESSION |" if is_regression(row, threshold) else " ok |"
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def is_regression(row, threshold):
+    return row.get("p99_change", 0.0) > threshold
+
+
+def plot_metric(runs, metric, output_base, formats):
+    """Write one CDF plot of `metric` with a curve per run, in every requested format."""
+    plt = load_pyplot(headless=True)
+    figure, axis = plt.subplots()
+    for name, columns in runs:
+        if metric in columns:
+            x, y = empirical_cdf(columns[metric])
+            axis.step(x, y, where="post", label=name)
+    axis.set_title(f"CDF of {metric}")
+    axis.set_xlabel(metric)
+    axis.set_ylabel("CDF")
+    axis.grid(True)
+    axis.legend()
+    paths = []
+    for fmt in formats:
+        path = f"{output_base}.{fmt}"
+        figure.savefig(path, format=fmt)
+        paths.append(path)
+    plt.close(figure)
+    return paths
+
+
+def generate_report(paths, metrics=None, output_dir="report", formats=("png",), threshold=None, plot=True):
+    """
+    Build the report for the given result files.
+
+    Returns:
+        tuple: (markdown summary text, list of rows flagged as regressions)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    runs = [(os.path.splitext(os.path.basename(path))[0], load_results(path)) for path in paths]
+    if metrics is None:
+        metrics = sorted(set.intersection(*(set(columns) for _, columns in runs))) if runs else []
+
+    sections = ["# Benchmark report", "", "Runs: " + ", ".join(name for name, _ in runs) + f" (baseline: {runs[0][0]})"
+                if runs else "No runs.", ""]
+    regressions = []
+    with open(os.path.join(output_dir, "summary.csv"), "w", newline="") as f:
+        writer = None
+        for metric in metrics:
+            rows = compare_runs(runs, metric)
+            if not rows:
+                continue
+            sections.append(render_markdown(metric, rows, threshold=threshold))
+            if plot:
+                plot_metric(runs, metric, os.path.join(output_dir, f"{metric}_cdf"), formats)
+            if threshold is not None:
+                regressions += [dict(row, metric=metric) for row in rows[1:] if is_regression(row, threshold)]
+            for row in rows:
+                row = {"metric": metric, **row}
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+
+    text = "\n".join(sections)
+    with open(os.path.join(output_dir, "summary.md"), "w") as f:
+        f.write(text)
+    return text, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare benchmark runs and write CDF plots plus a summary table.")
+    parser.add_argument("results", nargs="+", help="Result files (.jsonl or .csv); the first one is the baseline.")
+    parser.add_argument("--metric", action="append", help="Column to report (repeatable). Default: all shared.")
+    parser.add_argument("--output-dir", default="report")
+    parser.add_argument("--format", action="append", choices=["png", "svg"], help="Plot format (repeatable).")
+    parser.add_argument("--regression-threshold", type=float, default=None,
+                        help="Flag runs whose p99 exceeds the baseline by more than this fraction (e.g. 0.1).")
+    parser.add_argument("--no-plots", action="store_true", help="Only write the summary table.")
+    args = parser.parse_args(argv)
+
+    text, regressions = generate_report(args.results, metrics=args.metric, output_dir=args.output_dir,
+                                        formats=args.format or ["png"], threshold=args.regression_threshold,
+                                        plot=not args.no_plots)
+    print(text)
+    if regressions:
+        print(f"{len(regressions)} regression(s) above the threshold.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import bisect
+import hashlib
+import logging
+import queue
+import socket
+import threading
+
+from config.config import (BOOTSTRAP_REPLICATION_BACKOFF, BOOTSTRAP_REPLICATION_MAX_BACKOFF,
+                           BOOTSTRAP_REPLICATION_TIMEOUT, BOOTSTRAP_RING_REPLICAS, BUFFER_SIZE)
+from connections import codec
+
+
+class HashRing:
+    """
+    Consistent hash ring over bootstrap servers.
+
+    Each server is placed on the ring `replicas` times (virtual nodes) so keys spread evenly and adding or
+    removing a server only moves the keys next to it.
+    """
+
+    def __init__(self, servers, replicas=BOOTSTRAP_RING_REPLICAS):
+        self.servers = [(ip, int(port)) for ip, port in servers]
+        self.ring = sorted(
+            (self.hash(f"{ip}:{port}#{i}"), (ip, port)) for ip, port in self.servers for i in range(replicas)
+        )
+        self.hashes = [h for h, _ in self.ring]
+
+    @staticmethod
+    def hash(key):
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def preference_list(self, ip, port):
+        """
+        Return every server, ordered by how responsible it is for the node (ip, port).
+
+        The first entry is the owner; the rest are the failover order.
+        """
+        if not self.ring:
+            return []
+        start = bisect.bisect(self.hashes, self.hash(f"{ip}:{port}"))
+        ordered = []
+        for i in range(len(self.ring)):
+            server = self.ring[(start + i) % len(self.ring)][1]
+            if server not in ordered:
+                ordered.append(server)
+                if len(ordered) == len(self.servers):
+                    break
+        return ordered
+
+    def owner(self, ip, port):
+        servers = self.preference_list(ip, port)
+        return servers[0] if servers else None
+
+
+class BootstrapCluster:
+    """
+    Membership replication between cooperating bootstrap servers.
+
+    Every server keeps the full registry so it can hand out neighbors and answer for any node when the owner is
+    down. Ownership on the hash ring decides which server health-checks a node and which one clients try
+    first. Registry changes are pushed to the other servers as REPL messages by background workers so the
+    request path never waits on a peer. Each peer has its own outbox and worker, so a peer that is down only
+    delays its own messages, and a message stays at the head of its outbox until the peer acknowledges it.
+    """
+
+    def __init__(self, me, servers, timeout=BOOTSTRAP_REPLICATION_TIMEOUT, backoff=BOOTSTRAP_REPLICATION_BACKOFF,
+                 max_backoff=BOOTSTRAP_REPLICATION_MAX_BACKOFF):
+        """
+        Args:
+            me (tuple): (ip, port) of this bootstrap server, as listed in `servers`.
+            servers (list): (ip, port) of every bootstrap server in the cluster, including this one.
+            timeout (float): Socket timeout for replication messages.
+            backoff (float): Seconds before an unacknowledged message is sent again; doubles with every retry.
+            max_backoff (float): Seconds between retries at most.
+        """
+        self.me = (me[0], int(me[1]))
+        self.ring = HashRing(servers)
+        self.peers = [server for server in self.ring.servers if server != self.me]
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stopped = threading.Event()
+        self.outboxes = {peer: queue.Queue() for peer in self.peers}
+        for peer in self.peers:
+            threading.Thread(target=self.replication_worker, args=(peer,), daemon=True).start()
+
+    def owns(self, ip, port):
+        return self.ring.owner(ip, int(port)) == self.me
+
+    def replicate(self, message):
+        """Queue a REPL message for every peer."""
+        for outbox in self.outboxes.values():
+            outbox.put(message)
+
+    def stop(self):
+        self.stopped.set()
+        for outbox in self.outboxes.values():
+            outbox.put(None)  # Wake up the worker
+
+    def replication_worker(self, peer):
+        """Send the messages queued for `peer` in order, retrying each with backoff until the peer answers REPLOK."""
+        outbox = self.outboxes[peer]
+        while not self.stopped.is_set():
+            message = outbox.get()
+            if message is None:
+                return
+            delay = self.backoff
+            while not self.send(peer, message):
+                if self.stopped.wait(delay):
+                    return
+                delay = min(delay * 2, self.max_backoff)
+
+    def send(self, peer, message):
+        """Send one REPL message; returns True if the peer applied it."""
+        ip, port = peer
+        frame = f"{len(message) + 5:04d} {message}".encode()
+        try:
+            with socket.create_connection(peer, timeout=self.timeout) as s:
+                s.sendall(frame)
+                reply = codec.decode(s.recv(BUFFER_SIZE).decode())
+        except (OSError, ValueError) as e:  # ValueError covers codec.ProtocolError
+            logging.warning(f"Failed to replicate to bootstrap server {ip}:{port}: {e}")
+            return False
+        if not (isinstance(reply, codec.ReplOk) and reply.ok):
+            logging.warning(f"Bootstrap server {ip}:{port} did not apply {message}: {reply.encode()}")
+            return False
+        return True
@@ -1,152 +1,477 @@
+import argparse
 import logging
 import random
 import socket
 import threading
 import time
 
-from config.config import BOOTSTRAP_IP, BOOTSTRAP_PORT
+from admission_control import AdmissionController
+from bootstrap_cluster import BootstrapCluster
+from config.config import (BOOTSTRAP_IP, BOOTSTRAP_METRICS_PORT, BOOTSTRAP_PORT, BOOTSTRAP_SERVERS, BS_SEARCH_DEADLINE,
+                           BS_SEARCH_SKIP_FAILED, BS_SEARCH_WORKERS, CATALOG_PATH, NEIGHBOR_COUNT, NEIGHBOR_POLICY,
+                           REGISTRY_DIR, REPLICATION_INTERVAL)
+from connections import codec
 from connections.bootstrap_server_connection import BootstrapServerConnection
+from neighbor_selection import get_policy
+import tracing
+from registry_store import RegistryStore
+from replication import QueryTracker, ReplicationManager
+from search_aggregation import ResultAggregator, parse_aggregate
+from search_deadline import SearchDeadline, drop_if_expired
 from ttypes import Node as SimpleNode
+from utils import metrics
+from utils.catalog import get_catalog
+
+REGISTRATIONS = metrics.REGISTRY.counter("bs_registrations", "REG requests handled by the bootstrap server")
+REMOVALS = metrics.REGISTRY.counter("bs_removals", "Nodes removed from the registry", ["op"])
+SEARCH_SKIPPED = metrics.REGISTRY.counter("bs_search_skipped_nodes",
+                                         "Recently unreachable nodes left out of a SER fan-out")
+REGISTERED_NODES = metrics.REGISTRY.gauge("bs_registered_nodes", "Nodes currently in the registry")
+REQUEST_LATENCY = metrics.REGISTRY.histogram("bs_request_duration_seconds", "Time spent handling a request",
+                                             ["command"])
 
 
 class Node:
-    def __init__(self, ip, port, name, file_list):
+    def __init__(self, ip, port, name, file_list, files=None):
         self.ip = ip
         self.port = port
         self.name = name
-        self.files = self.assign_files(file_list)
+        self.files = files if files is not None else self.assign_files(file_list)
 
     def assign_files(self, file_list):
         """Assign 3-5 random files to the node."""
         return random.sample(file_list, k=random.randint(3, 5))
 
 
+def stamp_deadline(message, deadline):
+    """Return the frame of a SER carrying what is left of `deadline`; frames and SERs without a deadline pass as is."""
+    if isinstance(message, str):
+        return message
+    if deadline is not None:
+        message = codec.Ser(message.ip, message.port, message.file_name, message.hops,
+                            deadline.forwarded_fields(message.fields))
+    return message.encode()
+
+
 class BootstrapServer:
-    def __init__(self, ip='0.0.0.0', port=5000):
+    def __init__(self, ip='0.0.0.0', port=5000, neighbor_policy=NEIGHBOR_POLICY, neighbor_count=NEIGHBOR_COUNT,
+                 store=None, cluster=None, admission=None):
         self.ip = ip
         self.port = port
         self.nodes = []  # Registered nodes
+        self.neighbor_policy = get_policy(neighbor_policy)
+        self.neighbor_count = neighbor_count
+        self.adjacency = {}  # (ip, port) -> set of neighbor (ip, port) handed out by this server
+        self.latencies = {}  # (ip, port) -> smoothed round-trip time in seconds
+        self.lock = threading.Lock()
+        self.store = store  # Optional RegistryStore making the registry survive restarts
+        if self.store is not None:
+            self.restore()
+        self.cluster = cluster  # Optional BootstrapCluster replicating membership to other bootstrap servers
+        self.admission = admission  # Optional AdmissionController applying rate limits and a concurrency cap
+        self.queries = QueryTracker()  # Searched file names, read by the ReplicationManager
+        self.search_workers = BS_SEARCH_WORKERS  # Nodes queried at once by a SER
+        self.search_deadline = BS_SEARCH_DEADLINE  # Seconds a SER may take in total
+        self.failed_nodes = {}  # (ip, port) -> monotonic time until which the node is left out of searches
+        self.running = False
+        self.ready = threading.Event()  # Set once the listening socket is bound
+        self.stopped = threading.Event()  # Ends the heartbeat
+        self.dispatcher = codec.Dispatcher({
+            "REG": self.handle_reg,
+            "UNREG": self.handle_unreg,
+            "LEAVE": self.handle_leave,
+            "JOIN": self.handle_join,
+            "SER": self.handle_ser,
+            "ERROR": self.handle_error,
+            "REPL": self.handle_repl,
+        }, default=self.handle_invalid)
 
     def handle_client(self, conn, addr):
+        start = time.perf_counter()
+        command = "invalid"
         try:
             # Receive the data from the client
             data = conn.recv(1024).decode()
-            logging.info(f"Received: {data}")
 
-            # Tokenize the message
-            toks = data.split()
-            response = ""
+            # Reject malformed, unknown or over-limit commands before doing any parsing
+            if self.admission is not None:
+                _, reason = self.admission.check_frame(data, addr[0])
+                if reason is not None:
+                    conn.send(self.error_frame(reason))
+                    return
+
+            logging.info(f"Received: {data}")
 
-            if len(toks) < 2:
+            try:
+                message = codec.decode(data)
+            except codec.ProtocolError:
                 # Invalid message format
-                response = f"{len('REGOK 9999') + 5:04d} REGOK 9999"  # Default error format
-            elif toks[1] == "REG":
-                # Handle registration
-                ip, port, name = toks[2], toks[3], toks[4]
-                print(f"Registering node: {name}, IP: {ip}, Port: {port}")
-
-                # Check if node is already registered
-                exists = any(n.ip == ip and n.port == int(port) for n in self.nodes)
-                if not exists:
-                    file_list = self.get_files()  # Retrieve the list of files
-                    self.nodes.append(Node(ip, int(port), name, file_list))
-
-                # Create response with up to 2 neighbors
-                num_nodes = min(len(self.nodes) - 1, 2)  # Exclude the new node itself
-                other_nodes = [n for n in self.nodes if not (n.ip == ip and n.port == int(port))]
-                response = f"REGOK {num_nodes}"
-                for n in other_nodes[:2]:
-                    response += f" {n.ip} {n.port} {n.name}"
-                response = f"{len(response) + 5:04d} {response}"
-            elif toks[1] == "UNREG":
-                # Handle unregistration
-                ip, port, name = toks[2], toks[3], toks[4]
-                print(f"Unregistering node: {name}, IP: {ip}, Port: {port}")
-
-                # Remove the node if it exists
-                self.nodes = [n for n in self.nodes if not (n.ip == ip and n.port == int(port) and n.name == name)]
-
-                # Send success acknowledgment
-                response = f"{len('UNROK 0') + 5:04d} UNROK 0"
-            elif toks[1] == "LEAVE":
-                # Handle LEAVE request
-                ip, port = toks[2], toks[3]
-                response = self.handle_leave_request(ip, int(port))
-            elif toks[1] == "JOIN":
-                # Handle JOIN request using BootstrapServerConnection
-                join_message = " ".join(toks)
-                connection = BootstrapServerConnection(
-                    bs=self,
-                    me=SimpleNode(ip=self.ip, port=self.port, name="BootstrapServer")
-                )
-                response = connection.handle_join_request(join_message)
-            elif toks[1] == "SER":
-                ip, port = toks[2], toks[3]
-                hops = int(toks[-1])  # Parse the last token as hops
-                file_name = " ".join(toks[4:-1]).strip('"')  # Join tokens for the file name
-                print(f"Search request: IP: {ip}, Port: {port}, File: {file_name}, Hops: {hops}")
-
-                # Forward the request to neighbors
-                response = self.forward_request(f"SER {ip} {port} \"{file_name}\" {hops - 1}", hops)
-            elif toks[1] == "ERROR":
-                # Handle ERROR message
-                self.handle_error_message(" ".join(toks[2:]))
+                response = codec.RegOk(9999).encode()
             else:
-                # Invalid command
-                response = f"{len('REGOK 9999') + 5:04d} REGOK 9999"
+                command = message.command
+                response = self.dispatcher.dispatch(message, addr)
 
             # Send the response back to the client
-            print(f"Handled command: {toks[1]}")
+            print(f"Handled command: {command}")
             conn.send(response.encode())
         except Exception as e:
             print(f"Error handling client: {e}")
         finally:
             conn.close()
+            REQUEST_LATENCY.labels(command).observe(time.perf_counter() - start)
 
-    def forward_request(self, message, hops):
-        """Forward requests to active neighbors."""
-        for neighbor in self.nodes:
-            try:
-                if hops > 0:
-                    with socket.create_connection((neighbor.ip, neighbor.port), timeout=5) as s:
-                        s.sendall(message.encode())
-                        response = s.recv(1024).decode()
-                        if response.startswith("SEROK"):
-                            return response
-            except (socket.timeout, ConnectionRefusedError):
-                print(f"Neighbor {neighbor.name} at {neighbor.ip}:{neighbor.port} is unreachable.")
-        return f"{len('SEROK 0') + 5:04d} SEROK 0"  # Default response if no results
+    def handle_reg(self, message, addr):
+        print(f"Registering node: {message.name}, IP: {message.ip}, Port: {message.port}")
+
+        # Register the node (if new) and pick up to `neighbor_count` neighbors for it
+        neighbors = self.register(message.ip, message.port, message.name)
+        if self.neighbor_policy.uses_latency:
+            # Off the request path: the sample is needed only when later nodes may pick this one as a neighbor
+            threading.Thread(target=self.check_node_availability, args=(message,), daemon=True).start()
+        return codec.RegOk(len(neighbors), [(n.ip, n.port, n.name) for n in neighbors]).encode()
+
+    def handle_unreg(self, message, addr):
+        print(f"Unregistering node: {message.name}, IP: {message.ip}, Port: {message.port}")
+
+        # Remove the node if it exists
+        self.remove_node(message.ip, message.port, message.name)
+        return codec.UnrOk(0).encode()
+
+    def handle_leave(self, message, addr):
+        return self.handle_leave_request(message.ip, message.port)
+
+    def handle_join(self, message, addr):
+        connection = BootstrapServerConnection(
+            bs=self,
+            me=SimpleNode(ip=self.ip, port=self.port, name="BootstrapServer")
+        )
+        try:
+            return connection.handle_join_request(message.encode())
+        finally:
+            connection.close()
+
+    def handle_ser(self, message, addr):
+        print(f"Search request: IP: {message.ip}, Port: {message.port}, File: {message.file_name}, "
+              f"Hops: {message.hops}")
+        received = SearchDeadline.from_fields(message.fields)
+        if drop_if_expired(received, "received"):
+            return codec.SerOk(0).encode()
+        self.queries.record(message.file_name)
+        # The search ends at the sender's deadline or this server's own, whichever comes first
+        budget = self.search_deadline if received is None else min(self.search_deadline, received.remaining())
+        deadline = SearchDeadline(budget)
+
+        # Forward the request to neighbors
+        span = tracing.start_span(message.trace_context, f"{self.ip}:{self.port}", message.file_name, message.hops)
+        fields = {"trace": span.context()} if span else {}
+        aggregate = parse_aggregate(message.fields)
+        forward_start = time.perf_counter()
+        if aggregate is not None:
+            response = self.aggregate_request(message, (aggregate[0], min(aggregate[1], budget)), fields, deadline)
+        else:
+            forwarded = codec.Ser(message.ip, message.port, message.file_name, message.hops - 1, fields)
+            response = self.forward_request(forwarded, message.hops, deadline)
+        if span:
+            span.forward_seconds = time.perf_counter() - forward_start
+            span.finish("forwarded" if codec.is_search_hit(response) else "miss")
+        return response
+
+    def handle_error(self, message, addr):
+        self.handle_error_message(message.reason)
+        return ""
+
+    def handle_repl(self, message, addr):
+        # Membership change replicated from another bootstrap server
+        self.apply_replicated(message)
+        return codec.ReplOk(0).encode()
+
+    def handle_invalid(self, message, addr):
+        return codec.RegOk(9999).encode()
+
+    def forward_request(self, message, hops, deadline=None):
+        """
+        Forward a SER to the registered nodes concurrently and return the first hit.
+
+        At most `search_workers` nodes are queried at once and the search ends at the first hit or after
+        `search_deadline` seconds (or earlier at `deadline`), so unreachable nodes cost one deadline rather than a
+        timeout each.
+
+        Args:
+            message (codec.Ser or str): The SER to send, or its frame. Each node receives a SER with the time left
+                of `deadline` when it is sent to that node.
+            hops (int): Hops left; nothing is forwarded at 0.
+            deadline (SearchDeadline): Optional time budget of the search.
+        """
+        if hops <= 0:
+            return codec.SerOk(0).encode()
+        hits = []
+
+        def send(node, timeout):
+            response = self.query_node(node, stamp_deadline(message, deadline), timeout)
+            if codec.is_search_hit(response):
+                hits.append(response)
+            return response
+
+        budget = self.search_deadline if deadline is None else min(self.search_deadline, deadline.remaining())
+        aggregator = ResultAggregator(1, budget)  # Done at the first hit
+        aggregator.gather(self.search_targets(), send, self.search_workers)
+        return hits[0] if hits else codec.SerOk(0).encode()  # Default response if no results
+
+    def aggregate_request(self, message, aggregate, fields, deadline=None):
+        """Forward a SER to every registered node at once and merge the hits that arrive before the deadline."""
+        aggregator = ResultAggregator(*aggregate)
+        if message.hops > 0:
+            def send(node, timeout):
+                forwarded = codec.Ser(message.ip, message.port, message.file_name, message.hops - 1,
+                                      aggregator.forwarded_fields(fields))
+                return self.query_node(node, stamp_deadline(forwarded, deadline), timeout)
+
+            aggregator.gather(self.search_targets(), send, self.search_workers)
+        return aggregator.message(fields).encode()
+
+    def search_targets(self):
+        """Return the registered nodes to search, leaving out those that could not be reached recently."""
+        now = time.monotonic()
+        nodes = list(self.nodes)
+        targets = [node for node in nodes if self.failed_nodes.get((node.ip, node.port), 0) <= now]
+        SEARCH_SKIPPED.inc(len(nodes) - len(targets))
+        return targets
+
+    def query_node(self, node, message, timeout=5):
+        """
+        Send one message to a registered node and return its answer ("" if it cannot be reached).
+
+        A node refusing or not accepting the connection is left out of searches for `BS_SEARCH_SKIP_FAILED` seconds.
+        """
+        key = (node.ip, node.port)
+        try:
+            s = socket.create_connection(key, timeout=timeout)
+        except OSError:
+            self.failed_nodes[key] = time.monotonic() + BS_SEARCH_SKIP_FAILED
+            print(f"Neighbor {node.name} at {node.ip}:{node.port} is unreachable.")
+            return ""
+        self.failed_nodes.pop(key, None)
+        try:
+            with s:
+                s.sendall(message.encode())
+                return s.recv(1024).decode()
+        except OSError:
+            print(f"Neighbor {node.name} at {node.ip}:{node.port} did not answer in time.")
+            return ""
 
     def start_heartbeat(self, interval=10):
         """Periodically check the availability of nodes."""
 
         def heartbeat():
-            while True:
-                for node in self.nodes:
+            while not self.stopped.is_set():
+                for node in list(self.nodes):
+                    if self.cluster is not None and not self.cluster.owns(node.ip, node.port):
+                        continue  # Another bootstrap server is responsible for this node
                     if not self.check_node_availability(node):
                         print(f"Node {node.name} at {node.ip}:{node.port} is unreachable. Marking as failed.")
-                        self.nodes.remove(node)
-                time.sleep(interval)
+                        self.remove_node(node.ip, node.port, op="LEAVE")
+                self.stopped.wait(interval)
 
         threading.Thread(target=heartbeat, daemon=True).start()
 
     def check_node_availability(self, node):
-        """Check if a node is reachable."""
+        """Check if a node is reachable, recording the connect time as a latency sample."""
         try:
+            start = time.monotonic()
             with socket.create_connection((node.ip, node.port), timeout=5):
+                self.record_latency(node.ip, node.port, time.monotonic() - start)
                 return True
-        except (socket.timeout, ConnectionRefusedError):
+        except OSError:  # Timed out, refused or unreachable
             return False
 
+    def record_latency(self, ip, port, rtt, alpha=0.2):
+        """
+        Fold a round-trip time sample into the node's exponentially weighted average.
+
+        Probes run off the request path, so a sample may arrive after the node was removed; it is then dropped
+        rather than written back for a node that is no longer registered.
+        """
+        key = (ip, port)
+        with self.lock:
+            if not any(n.ip == ip and n.port == port for n in self.nodes):
+                return
+            previous = self.latencies.get(key)
+            self.latencies[key] = rtt if previous is None else (1 - alpha) * previous + alpha * rtt
+
+    def register(self, ip, port, name, neighbors=None):
+        """
+        Add a node to the registry (if it is not already there) and assign its neighbors.
+
+        Args:
+            ip (str): IP address of the registering node.
+            port (int): Port of the registering node.
+            name (str): Name of the registering node.
+            neighbors (list): (ip, port) neighbors already chosen by another bootstrap server. When given, the
+                registration is a replica and is not replicated again.
+
+        Returns:
+            list(Node): The neighbors assigned to the node, at most `neighbor_count` of them.
+        """
+        file_list = self.get_files()
+        with self.lock:
+            node = next((n for n in self.nodes if n.ip == ip and n.port == port), None)
+            if node is None:
+                node = Node(ip, port, name, file_list)
+                self.nodes.append(node)
+                REGISTRATIONS.inc()
+            self.failed_nodes.pop((ip, port), None)  # Reachable again if it registers
+            replica = neighbors is not None
+            if replica:
+                self.set_neighbors((ip, port), neighbors)
+                neighbors = [n for n in self.nodes if (n.ip, n.port) in self.adjacency[(ip, port)]]
+            else:
+                neighbors = self.assign_neighbors((ip, port))
+            assigned = sorted(self.adjacency[(ip, port)])
+            if self.store is not None:
+                self.store.append("REG", ip, port, name=node.name, files=node.files, neighbors=assigned)
+                self.snapshot_if_due()
+
+        if self.cluster is not None and not replica:
+            self.cluster.replicate(codec.Repl("REG", ip, port, name, assigned).body())
+        return neighbors
+
+    def set_neighbors(self, key, neighbors):
+        """Record neighbors chosen elsewhere, keeping the adjacency symmetric. Must hold `self.lock`."""
+        current = self.adjacency.setdefault(key, set())
+        for neighbor in neighbors:
+            if neighbor != key:
+                current.add(neighbor)
+                self.adjacency.setdefault(neighbor, set()).add(key)
+
+    def assign_neighbors(self, key):
+        """
+        Top up the neighbor set of a node using the configured selection policy. Must hold `self.lock`.
+
+        Neighbors already handed out to the node are kept, so a node that re-registers gets a stable answer.
+        """
+        current = self.adjacency.setdefault(key, set())
+        missing = self.neighbor_count - len(current)
+        if missing > 0:
+            candidates = [n for n in self.nodes if (n.ip, n.port) != key and (n.ip, n.port) not in current]
+            degrees = {k: len(v) for k, v in self.adjacency.items()}
+            for n in self.neighbor_policy.select(candidates, missing, degrees, self.latencies):
+                current.add((n.ip, n.port))
+                self.adjacency.setdefault((n.ip, n.port), set()).add(key)
+        return [n for n in self.nodes if (n.ip, n.port) in current]
+
+    def remove_node(self, ip, port, name=None, op="UNREG", replicate=True):
+        """
+        Remove a node from the registry and release the degree it held on its neighbors.
+
+        `op` is the event ("UNREG" or "LEAVE") recorded in the registry log and sent to the other bootstrap
+        servers unless `replicate` is False.
+
+        Returns:
+            bool: True if a node was removed.
+        """
+        with self.lock:
+            before = len(self.nodes)
+            self.nodes = [n for n in self.nodes
+                          if not (n.ip == ip and n.port == port and (name is None or n.name == name))]
+            if len(self.nodes) == before:
+                return False
+            for neighbor in self.adjacency.pop((ip, port), set()):
+                self.adjacency.get(neighbor, set()).discard((ip, port))
+            self.latencies.pop((ip, port), None)
+            self.failed_nodes.pop((ip, port), None)
+            REMOVALS.labels(op).inc()
+            if self.store is not None:
+                self.store.append(op, ip, port)
+                self.snapshot_if_due()
+
+        if self.cluster is not None and replicate:
+            self.cluster.replicate(codec.Repl(op, ip, port).body())
+        return True
+
+    def apply_replicated(self, message):
+        """Apply a REPL message (codec.Repl) from another bootstrap server."""
+        if message.op == "REG":
+            self.register(message.ip, message.port, message.name, neighbors=message.neighbors)
+        elif message.op in ("UNREG", "LEAVE"):
+            self.remove_node(message.ip, message.port, op=message.op, replicate=False)
+        else:
+            logging.warning(f"Unknown replicated operation: {message.body()}")
+
+    def restore(self):
+        """Load the registry from the store, e.g. after a restart."""
+        start = time.monotonic()
+        state = self.store.load()
+        with self.lock:
+            self.nodes = [Node(n["ip"], n["port"], n["name"], [], files=n["files"]) for n in state["nodes"].values()]
+            self.adjacency = state["adjacency"]
+        logging.info(f"Restored {len(self.nodes)} registered nodes in {(time.monotonic() - start) * 1000:.1f} ms")
+
+    def snapshot_if_due(self):
+        """Compact the registry log into a snapshot once enough events piled up. Must hold `self.lock`."""
+        if self.store.should_snapshot():
+            self.store.snapshot({
+                "nodes": {(n.ip, n.port): {"ip": n.ip, "port": n.port, "name": n.name, "files": n.files}
+                          for n in self.nodes},
+                "adjacency": self.adjacency,
+            })
+
+    def degree(self, ip, port):
+        """Number of overlay neighbors this server has assigned to or through the node."""
+        return len(self.adjacency.get((ip, port), ()))
+
     def start(self):
+        self.get_files()  # Load the catalog before the first REG arrives
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             s.bind((self.ip, self.port))
+            self.port = s.getsockname()[1]  # Resolve the port when binding to port 0
             s.listen()
+            s.settimeout(0.5)  # Wake up periodically so stop() can end the loop
+            self.running = True
+            self.ready.set()
             print(f"Bootstrap server listening on {self.ip}:{self.port}")
-            while True:
-                conn, addr = s.accept()
-                threading.Thread(target=self.handle_client, args=(conn, addr)).start()
+            while self.running:
+                try:
+                    conn, addr = s.accept()
+                except socket.timeout:
+                    continue
+                if self.admission is None:
+                    threading.Thread(target=self.handle_client, args=(conn, addr)).start()
+                    continue
+
+                reason = self.admission.acquire(addr[0])
+                if reason is not None:
+                    # Refuse without spending a thread on the connection
+                    self.reject_connection(conn, reason)
+                    continue
+                threading.Thread(target=self.handle_admitted_client, args=(conn, addr)).start()
+
+    def handle_admitted_client(self, conn, addr):
+        try:
+            self.handle_client(conn, addr)
+        finally:
+            self.admission.release()
+
+    def error_frame(self, reason):
+        message = f"ERROR {reason}"
+        return f"{len(message) + 5:04d} {message}".encode()
+
+    def reject_connection(self, conn, reason):
+        try:
+            conn.setblocking(False)
+            conn.send(self.error_frame(reason))
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def stop(self):
+        self.running = False
+        self.stopped.set()
+        if self.cluster is not None:
+            self.cluster.stop()
+        if self.store is not None:
+            self.store.close()
 
     def register_node(self, ip, port, name):
         new_node = {"ip": ip, "port": port, "name": name}
@@ -158,22 +483,21 @@ class BootstrapServer:
 
     def handle_leave_request(self, ip, port):
         """Handle LEAVE requests from nodes."""
-        for node in self.nodes:
-            if node.ip == ip and node.port == int(port):
-                self.nodes.remove(node)
-                return f"{len('LEAVEOK 0') + 5:04d} LEAVEOK 0"
-        return f"{len('LEAVEOK 9999') + 5:04d} LEAVEOK 9999"
+        if self.remove_node(ip, int(port), op="LEAVE"):
+            return codec.LeaveOk(0).encode()
+        return codec.LeaveOk(9999).encode()
 
     def get_files(self):
         """
-        Reads file names from the 'File Names.txt' file and returns them as a list.
+        Returns the file names of the shared catalog ('File Names.txt').
+
+        The catalog is read once and reloaded in the background when the file changes, so registering a node never
+        waits for the disk.
+
+        Returns:
+            tuple: The file names; empty if the catalog could not be read.
         """
-        try:
-            with open('File Names.txt', 'r') as file:
-                return [line.strip() for line in file if line.strip()]
-        except FileNotFoundError:
-            print("Error: 'File Names.txt' not found.")
-            return []
+        return get_catalog(CATALOG_PATH).get()
 
     def handle_error_message(self, message):
         """
@@ -190,6 +514,31 @@ class BootstrapServer:
 
 
 if __name__ == "__main__":
-    server = BootstrapServer(ip=BOOTSTRAP_IP, port=BOOTSTRAP_PORT)
+    parser = argparse.ArgumentParser(description="Run a bootstrap server.")
+    parser.add_argument("--ip", default=BOOTSTRAP_IP)
+    parser.add_argument("--port", type=int, default=BOOTSTRAP_PORT)
+    parser.add_argument("--peer", action="append", default=[], metavar="IP:PORT",
+                        help="Another bootstrap server in the cluster (repeatable). Defaults to BOOTSTRAP_SERVERS.")
+    parser.add_argument("--registry-dir", default=REGISTRY_DIR)
+    parser.add_argument("--no-admission-control", action="store_true", help="Disable rate limits and the handler cap.")
+    parser.add_argument("--metrics-port", type=int, default=BOOTSTRAP_METRICS_PORT,
+                        help="Port of the Prometheus /metrics listener (0 disables it).")
+    parser.add_argument("--replication-interval", type=float, default=REPLICATION_INTERVAL,
+                        help="Seconds between replication rounds of popular files (0 disables replication).")
+    args = parser.parse_args()
+
+    servers = [(peer.rsplit(":", 1)[0], int(peer.rsplit(":", 1)[1])) for peer in args.peer] or BOOTSTRAP_SERVERS
+    servers = sorted(set(servers) | {(args.ip, args.port)})
+    cluster = BootstrapCluster((args.ip, args.port), servers) if len(servers) > 1 else None
+    store = RegistryStore(args.registry_dir) if args.registry_dir else None
+    peer_ips = {ip for ip, port in servers if (ip, port) != (args.ip, args.port)}
+    admission = None if args.no_admission_control else AdmissionController(exempt_sources=peer_ips)
+    server = BootstrapServer(ip=args.ip, port=args.port, store=store, cluster=cluster, admission=admission)
+    if args.metrics_port:
+        # The gauge is process-wide, so it is bound to the one server this process runs, not to every instance
+        REGISTERED_NODES.set_function(lambda: len(server.nodes))
+        metrics.start_http_server(args.metrics_port)
+    if args.replication_interval:
+        ReplicationManager(server, interval=args.replication_interval).start()
     # server.start_heartbeat(interval=10)  # Check every 10 seconds
     server.start()
@@ -0,0 +1,416 @@
+"""
+Churn and failure-injection harness for search under load.
+
+Runs a bootstrap server and a changing population of node daemons in this process, all on 127.0.0.1, while a
+query workload searches the overlay:
+
+- New nodes arrive as a Poisson process (`arrival_rate` per second), register with the bootstrap server and JOIN
+  the neighbors it returns. Every node, including the initial ones, stays for a session length drawn from an
+  exponential, Pareto (heavy-tailed) or fixed distribution with mean `mean_session` seconds.
+- At the end of its session a node either crashes (`crash_fraction` of departures: its sockets close, nobody is
+  told) or leaves gracefully (LEAVE to its neighbors and the bootstrap server, then stop).
+- Searches start as a Poisson process (`query_rate` per second) at a random live node, each for a file held by
+  another live node, so a miss means the overlay failed to find a file that exists.
+
+The report gives the search success rate, the latency percentiles of the searches, and how long the overlay took
+to recover from each departure: the time until no live node's routing table lists the departed node any more,
+separately for crashes (found by the routing table maintenance pings) and graceful leaves (told by LEAVE). After the
+run, churn stops for `settle` seconds so pending recoveries can complete; departures still listed somewhere then are
+reported as unrecovered. The share of routing table entries pointing at departed nodes and the number of live nodes
+without any neighbor are sampled throughout.
+
+Example:
+    python churn_harness.py --initial 20 --arrival-rate 1 --mean-session 20 --session pareto --crash-fraction 0.5 \\
+        --query-rate 20 --duration 60 --maintenance-interval 2
+"""
+import argparse
+import contextlib
+import heapq
+import io
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from bootstrap_server import BootstrapServer
+from config.config import NODE_FILE_NAMES_PATH, ROUTING_MAINTENANCE_INTERVAL, SHUFFLE_INTERVAL
+from node_daemon import NodeDaemon
+from utils.file_reader import read_file_names
+from utils.streaming_stats import StreamingSummary
+
+SESSION_DISTRIBUTIONS = ("exponential", "pareto", "fixed")
+PARETO_SHAPE = 1.5  # Heavy tail: a few nodes stay very long, most leave early
+START_ATTEMPTS = 3  # Ports tried per node
+
+
+def session_sampler(kind, mean, rng):
+    """
+    Return a function drawing session lengths in seconds.
+
+    Args:
+        kind (str): "exponential", "pareto" (shape PARETO_SHAPE, scaled to the mean) or "fixed".
+        mean (float): Mean session length in seconds.
+        rng (random.Random): Source of randomness.
+    """
+    if kind == "exponential":
+        return lambda: rng.expovariate(1 / mean)
+    if kind == "pareto":
+        scale = mean * (PARETO_SHAPE - 1) / PARETO_SHAPE  # Minimum session, so that the mean is `mean`
+        return lambda: scale * rng.paretovariate(PARETO_SHAPE)
+    if kind == "fixed":
+        return lambda: mean
+    raise ValueError(f"Unknown session distribution {kind}")
+
+
+class Departure:
+    """A node that left, and when the overlay stopped listing it."""
+
+    __slots__ = ("address", "kind", "at", "recovered_at")
+
+    def __init__(self, address, kind):
+        self.address = address
+        self.kind = kind  # "crash" or "leave"
+        self.at = time.monotonic()
+        self.recovered_at = None
+
+
+class ChurnHarness:
+    def __init__(self, catalog, initial=10, arrival_rate=0.5, session="exponential", mean_session=20.0,
+                 crash_fraction=0.5, query_rate=10.0, concurrency=16, maintenance_interval=ROUTING_MAINTENANCE_INTERVAL,
+                 shuffle_interval=SHUFFLE_INTERVAL, heartbeat_interval=0, poll_interval=0.1, seed=None):
+        """
+        Args:
+            catalog (list): File names the nodes sample their files from.
+            initial (int): Nodes started before the run.
+            arrival_rate (float): New nodes per second (0 for none).
+            session (str): Session length distribution, one of SESSION_DISTRIBUTIONS.
+            mean_session (float): Mean session length in seconds.
+            crash_fraction (float): Share of departures that are crashes rather than graceful leaves.
+            query_rate (float): Searches started per second.
+            concurrency (int): Searches in flight at most.
+            maintenance_interval (float): Seconds between the routing table pings of every node.
+            shuffle_interval (float): Seconds between the peer sampling shuffles of every node.
+            heartbeat_interval (float): Seconds between the bootstrap server's checks of registered nodes (0 leaves
+                crashed nodes registered, so newcomers may be handed dead neighbors).
+            poll_interval (float): Seconds between checks of the routing tables for departed nodes.
+            seed (int): Seed of the schedule and of the searches, for repeatable runs.
+        """
+        self.catalog = list(catalog)
+        self.initial = initial
+        self.arrival_rate = arrival_rate
+        self.crash_fraction = crash_fraction
+        self.query_rate = query_rate
+        self.maintenance_interval = maintenance_interval
+        self.shuffle_interval = shuffle_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.rng = random.Random(seed)  # Schedule; only drawn from by the thread running `run`
+        self.query_rng = random.Random(None if seed is None else f"{seed}-queries")  # Seeds of the searches
+        self.session_length = session_sampler(session, mean_session, self.rng)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+
+        self.server = None
+        self.live = {}  # (ip, port) -> NodeDaemon
+        self.lock = threading.Lock()
+        self.names = 0
+        self.departures = []
+        self.stopping = []  # Threads stopping departed daemons
+        self.nodes = Counter()  # started, failed_start, crash, leave
+        self.queries = Counter()  # hit, miss, error, skipped
+        self.latency = StreamingSummary()
+        self.stale_entries = StreamingSummary()  # Share of routing table entries pointing at departed nodes
+        self.isolated_nodes = StreamingSummary()  # Live nodes with an empty routing table
+        self.monitor_done = threading.Event()
+        self.monitor = None
+
+    def start(self):
+        """Start the bootstrap server, the initial nodes and the recovery monitor."""
+        self.server = BootstrapServer(ip="127.0.0.1", port=0)
+        threading.Thread(target=self.server.start, daemon=True).start()
+        self.server.ready.wait()
+        if self.heartbeat_interval:
+            self.server.start_heartbeat(self.heartbeat_interval)
+        for _ in range(self.initial):
+            self.add_node()
+        self.monitor = threading.Thread(target=self.watch_routing_tables, daemon=True)
+        self.monitor.start()
+
+    def add_node(self):
+        """Start a node and register it; returns its (ip, port), or None if it could not join."""
+        self.names += 1
+        for _ in range(START_ATTEMPTS):
+            try:
+                # The free TCP port picked for the node may be taken for UDP
+                daemon = NodeDaemon("127.0.0.1", 0, f"churn{self.names}", self.catalog,
+                                    [("127.0.0.1", self.server.port)], ("127.0.0.1", 0),
+                                    maintenance_interval=self.maintenance_interval)
+            except OSError:
+                continue
+            daemon.node.peer_sampler.interval = self.shuffle_interval
+            daemon.start()
+            break
+        else:
+            logging.warning(f"Node churn{self.names} found no free port")
+            self.nodes["failed_start"] += 1
+            return None
+        try:
+            daemon.register()
+        except Exception as e:
+            logging.warning(f"Node {daemon.node.name} failed to join: {e}")
+            self.nodes["failed_start"] += 1
+            daemon.stop()
+            return None
+        address = (daemon.node.ip, daemon.node.port)
+        with self.lock:
+            self.live[address] = daemon
+        self.nodes["started"] += 1
+        return address
+
+    def depart(self, address, crash):
+        """
+        Take a node out of the overlay: crash it, or have it LEAVE first.
+
+        The node stops counting as live at once; stopping it continues in the background.
+        """
+        with self.lock:
+            daemon = self.live.pop(address, None)
+            if daemon is None:
+                return
+            kind = "crash" if crash else "leave"
+            self.departures.append(Departure(address, kind))
+        self.nodes[kind] += 1
+
+        def stop():
+            if not crash:
+                daemon.leave()
+            daemon.stop()
+
+        thread = threading.Thread(target=stop, daemon=True)
+        thread.start()
+        self.stopping.append(thread)
+
+    def run(self, duration, settle=None):
+        """
+        Run churn and searches for `duration` seconds, then wait `settle` seconds (by default two maintenance
+        intervals) without churn for the overlay to recover.
+        """
+        start = time.monotonic()
+        events = []  # (seconds from start, sequence, event, address)
+        sequence = 0
+
+        def schedule(delay, event, address=None):
+            nonlocal sequence
+            sequence += 1
+            heapq.heappush(events, (time.monotonic() - start + delay, sequence, event, address))
+
+        with self.lock:
+            addresses = list(self.live)
+        for address in addresses:
+            schedule(self.session_length(), "depart", address)
+        if self.arrival_rate > 0:
+            schedule(self.rng.expovariate(self.arrival_rate), "arrive")
+        if self.query_rate > 0:
+            schedule(self.rng.expovariate(self.query_rate), "query")
+
+        while events and events[0][0] < duration:
+            due, _, event, address = heapq.heappop(events)
+            time.sleep(max(start + due - time.monotonic(), 0))
+            if event == "query":
+                self.executor.submit(self.query, self.query_rng.random())
+                schedule(self.rng.expovariate(self.query_rate), "query")
+            elif event == "arrive":
+                address = self.add_node()
+                if address is not None:
+                    schedule(self.session_length(), "depart", address)
+                schedule(self.rng.expovariate(self.arrival_rate), "arrive")
+            else:
+                self.depart(address, crash=self.rng.random() < self.crash_fraction)
+
+        self.executor.shutdown(wait=True)
+        time.sleep(max(start + duration - time.monotonic(), 0))
+        self.wait_for_recovery(2 * self.maintenance_interval if settle is None else settle)
+
+    def query(self, query_seed):
+        """
+        Search, from a random live node, for a file held by another live node.
+
+        Args:
+            query_seed (float): Seed of this search's choices. Searches run on the executor threads, so each gets its
+                own random source instead of sharing the schedule's.
+        """
+        rng = random.Random(query_seed)
+        with self.lock:
+            nodes = list(self.live.values())
+        if len(nodes) < 2:
+            self.count("skipped")
+            return
+        origin = rng.choice(nodes)
+        wanted = set()
+        for node in nodes:
+            if node is not origin:
+                wanted |= node.node.file_list
+        wanted -= origin.node.file_list
+        if not wanted:
+            self.count("skipped")
+            return
+        file_name = rng.choice(sorted(wanted))
+        try:
+            result = origin.search(file_name)
+        except Exception as e:
+            logging.warning(f"Search for {file_name} from {origin.node.name} failed: {e}")
+            self.count("error")
+            return
+        self.count("hit" if result["hit"] else "miss", result["seconds"])
+
+    def count(self, outcome, seconds=None):
+        with self.lock:
+            self.queries[outcome] += 1
+            if seconds is not None:
+                self.latency.add(seconds)
+
+    def watch_routing_tables(self):
+        """Record when each departed node disappears from every live routing table, and sample stale entries."""
+        while not self.monitor_done.wait(self.poll_interval):
+            self.check_routing_tables()
+
+    def check_routing_tables(self):
+        with self.lock:
+            live = dict(self.live)
+            pending = [d for d in self.departures if d.recovered_at is None]
+        listed = set()
+        entries = stale = isolated = 0
+        for daemon in live.values():
+            table = list(daemon.node.routing_table)
+            if not table:
+                isolated += 1
+            for peer in table:
+                peer = (peer[0], int(peer[1]))
+                entries += 1
+                if peer not in live:
+                    stale += 1
+                    listed.add(peer)
+        now = time.monotonic()
+        for departure in pending:
+            if departure.address not in listed:
+                departure.recovered_at = now
+        if entries:
+            self.stale_entries.add(stale / entries)
+        self.isolated_nodes.add(isolated)
+
+    def wait_for_recovery(self, timeout):
+        """Wait until every departed node is forgotten, or `timeout` seconds pass."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if all(d.recovered_at is not None for d in self.departures):
+                    return
+            time.sleep(self.poll_interval)
+
+    def stop(self):
+        """Stop the monitor, every node and the bootstrap server."""
+        self.monitor_done.set()
+        self.executor.shutdown(wait=True)
+        with self.lock:
+            daemons = list(self.live.values())
+        threads = [threading.Thread(target=daemon.stop, daemon=True) for daemon in daemons]
+        for thread in threads:
+            thread.start()
+        for thread in threads + self.stopping:
+            thread.join()
+        if self.server is not None:
+            self.server.stop()
+
+    def report(self):
+        """Return the outcome of the run as a dict."""
+        answered = self.queries["hit"] + self.queries["miss"] + self.queries["error"]
+        recovery = {}
+        for kind in ("crash", "leave"):
+            summary = StreamingSummary()
+            unrecovered = 0
+            for departure in self.departures:
+                if departure.kind != kind:
+                    continue
+                if departure.recovered_at is None:
+                    unrecovered += 1
+                else:
+                    summary.add(departure.recovered_at - departure.at)
+            recovery[kind] = {**summary.summary(), "unrecovered": unrecovered}
+        return {
+            "nodes": {"initial": self.initial, "live": len(self.live), **dict(self.nodes)},
+            "queries": {**dict(self.queries), "success_rate": self.queries["hit"] / answered if answered else None},
+            "latency": self.latency.summary(),
+            "recovery": recovery,
+            "stale_entries": self.stale_entries.summary(),
+            "isolated_nodes": self.isolated_nodes.summary(),
+        }
+
+
+def ms(seconds):
+    return f"{seconds * 1000:8.2f} ms" if seconds is not None else "       - ms"
+
+
+def print_report(report):
+    nodes, queries, latency = report["nodes"], report["queries"], report["latency"]
+    print(f"nodes: {nodes['initial']} initial, {nodes.get('started', 0) - nodes['initial']} arrived, "
+          f"{nodes.get('crash', 0)} crashed, {nodes.get('leave', 0)} left, {nodes['live']} live at the end")
+    success = queries["success_rate"]
+    print(f"searches: {queries.get('hit', 0)} hits, {queries.get('miss', 0)} misses, {queries.get('error', 0)} "
+          f"errors, {queries.get('skipped', 0)} skipped, success rate "
+          + (f"{success * 100:.1f}%" if success is not None else "-"))
+    print(f"search latency: p50 {ms(latency['p50'])}  p99 {ms(latency['p99'])}  p99.9 {ms(latency['p999'])}")
+    for kind, recovery in report["recovery"].items():
+        print(f"recovery after {kind:5}: {recovery['count']:4d} recovered  p50 {ms(recovery['p50'])}  "
+              f"p99 {ms(recovery['p99'])}  max {ms(recovery['max'])}  unrecovered {recovery['unrecovered']}")
+    stale, isolated = report["stale_entries"], report["isolated_nodes"]
+    if stale["count"]:
+        print(f"stale routing entries: {stale['average'] * 100:.1f}% on average, {stale['max'] * 100:.1f}% at most; "
+              f"isolated nodes: {isolated['average']:.1f} on average, {isolated['max']:.0f} at most")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run searches against a local overlay under node churn.")
+    parser.add_argument("--files", default=NODE_FILE_NAMES_PATH, help="File with one candidate file name per line.")
+    parser.add_argument("--initial", type=int, default=10, help="Nodes started before the run.")
+    parser.add_argument("--arrival-rate", type=float, default=0.5, help="New nodes per second.")
+    parser.add_argument("--session", choices=SESSION_DISTRIBUTIONS, default="exponential")
+    parser.add_argument("--mean-session", type=float, default=20.0, help="Mean session length in seconds.")
+    parser.add_argument("--crash-fraction", type=float, default=0.5,
+                        help="Share of departures that crash instead of leaving gracefully.")
+    parser.add_argument("--query-rate", type=float, default=10.0, help="Searches per second.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Searches in flight at most.")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of churn and searches.")
+    parser.add_argument("--settle", type=float, help="Seconds without churn afterwards for the overlay to recover.")
+    parser.add_argument("--maintenance-interval", type=float, default=ROUTING_MAINTENANCE_INTERVAL)
+    parser.add_argument("--shuffle-interval", type=float, default=SHUFFLE_INTERVAL)
+    parser.add_argument("--heartbeat-interval", type=float, default=0,
+                        help="Seconds between the bootstrap server's node checks (0 disables them).")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="Write the report as JSON.")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the nodes and the server.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    harness = ChurnHarness(read_file_names(args.files), args.initial, args.arrival_rate, args.session,
+                           args.mean_session, args.crash_fraction, args.query_rate, args.concurrency,
+                           args.maintenance_interval, args.shuffle_interval, args.heartbeat_interval, seed=args.seed)
+    # The nodes and the server print every message they handle
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        try:
+            harness.start()
+            harness.run(args.duration, args.settle)
+        finally:
+            harness.stop()
+    report = harness.report()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
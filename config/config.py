@@ -7,4 +7,92 @@ BUFFER_SIZE = 1024
 
 # Flask API details
 FLASK_API_PORT = 4000
-FLASK_API_URL = f'http://{BOOTSTRAP_IP}:{FLASK_API_PORT}'
\ No newline at end of file
+FLASK_API_URL = f'http://{BOOTSTRAP_IP}:{FLASK_API_PORT}'
+
+# Neighbor selection at the bootstrap server ("random", "least_degree" or "latency")
+NEIGHBOR_POLICY = "least_degree"
+NEIGHBOR_COUNT = 2
+
+# Gossip-based peer sampling between nodes
+PEER_SAMPLING_VIEW_SIZE = 5  # Target number of neighbors per node
+SHUFFLE_LENGTH = 3  # Entries exchanged per shuffle
+SHUFFLE_INTERVAL = 10  # Seconds between shuffles
+
+# Bootstrap server registry persistence (set REGISTRY_DIR to None to keep the registry in memory only)
+REGISTRY_DIR = None
+REGISTRY_FSYNC_POLICY = "interval"  # "always", "interval" or "never"
+REGISTRY_FSYNC_INTERVAL = 1.0  # Seconds between fsyncs with the "interval" policy
+REGISTRY_SNAPSHOT_EVERY = 1000  # Events logged before the registry is compacted into a snapshot
+
+# Cooperating bootstrap servers; nodes fail over between them in consistent-hash order
+BOOTSTRAP_SERVERS = [(BOOTSTRAP_IP, BOOTSTRAP_PORT)]
+BOOTSTRAP_RING_REPLICAS = 64  # Virtual nodes per bootstrap server on the hash ring
+BOOTSTRAP_REPLICATION_TIMEOUT = 2.0  # Seconds
+BOOTSTRAP_REPLICATION_BACKOFF = 0.5  # Seconds before a REPL a peer did not acknowledge is sent again; doubles per try
+BOOTSTRAP_REPLICATION_MAX_BACKOFF = 30.0  # Seconds between retries at most
+BS_CONNECT_TIMEOUT = 1.0  # Seconds before failing over to the next bootstrap server
+BS_REPLY_TIMEOUT = 5.0  # Seconds a connected bootstrap server may take to answer before failing over
+BS_RETRY_AFTER = 30  # Seconds an unreachable bootstrap server is tried last
+
+# Admission control at the bootstrap server: (tokens per second, burst) for each source IP, overall and per command.
+# A command's limit is below the per-source one, so no single command can use up a source's whole budget. The other
+# bootstrap servers of the cluster skip the per-source limit; their REPL frames only count against the REPL limit.
+RATE_LIMIT_PER_SOURCE = (200, 400)
+RATE_LIMIT_PER_COMMAND = {
+    "REG": (150, 300),
+    "UNREG": (150, 300),
+    "LEAVE": (150, 300),
+    "JOIN": (100, 200),
+    "SER": (50, 100),  # Each SER fans out to every registered node
+    "ERROR": (20, 40),
+    "REPL": (5000, 10000),  # Replays a peer's registration bursts
+}
+MAX_CONCURRENT_HANDLERS = 128
+ADMISSION_MAX_TRACKED_SOURCES = 10000
+
+# Prometheus metrics listener of the standalone bootstrap server (None to disable)
+BOOTSTRAP_METRICS_PORT = 9100
+
+# Query tracing: JSON-lines file receiving the SER spans recorded by this process (None disables it)
+TRACE_LOG_PATH = None
+
+# Aggregated search (SER with agg=<target>:<deadline ms>): default result target and deadline, and the number of
+# neighbors queried at once by each node
+SEARCH_AGGREGATION_TARGET = 10
+SEARCH_AGGREGATION_DEADLINE = 2.0  # Seconds
+SEARCH_AGGREGATION_WORKERS = 8
+
+# Time budget of a search started by a node, sent along as SER ttl=<remaining ms> (None sends SERs without one)
+SEARCH_TTL = 10.0  # Seconds
+
+# SER handling at the bootstrap server: nodes queried at once, overall deadline, and how long a node that could not
+# be reached is left out of searches
+BS_SEARCH_WORKERS = 16
+BS_SEARCH_DEADLINE = 5.0  # Seconds
+BS_SEARCH_SKIP_FAILED = 30  # Seconds
+
+# Proactive replication of popular files, planned by the bootstrap server (square-root replication)
+REPLICATION_INTERVAL = 60  # Seconds between replication rounds (0 disables replication)
+NODE_STORAGE_QUOTA = 8  # Files a node holds at most, its own and replicas together
+REPLICATION_MIN_COPIES = 1  # Copies kept of every file
+QUERY_HALF_LIFE = 600  # Seconds after which an observed query counts half
+
+# Cache of files a node downloaded from other nodes, advertised and served while cached (LRU eviction)
+DOWNLOAD_CACHE_DIR = "./cache"
+DOWNLOAD_CACHE_QUOTA = 512 * 1024 * 1024  # Bytes
+
+# Hashing overlapped with file I/O (utils/hash_pipeline.py)
+HASH_BLOCK_SIZE = 1024 * 1024  # Bytes covered by each per-block digest
+HASH_PIPELINE_DEPTH = 8  # Chunks queued for hashing before the producer waits
+
+# Catalog of file names handed out to registering nodes, reloaded when the file changes (utils/catalog.py)
+CATALOG_PATH = "File Names.txt"
+CATALOG_CHECK_INTERVAL = 1.0  # Seconds between checks of the file for changes
+
+# Routing table maintenance at every node: seconds between pings of all neighbors, and how long a ping may take
+ROUTING_MAINTENANCE_INTERVAL = 30  # Seconds
+PING_TIMEOUT = 2.0  # Seconds
+
+# Node daemon: the control socket listens on 127.0.0.1 at the node port plus this offset, unless given explicitly
+NODE_CONTROL_PORT_OFFSET = 1000
+NODE_FILE_NAMES_PATH = "File Names.txt"
@@ -2,16 +2,63 @@ import socket
 import threading
 import time
 
-from config.config import BUFFER_SIZE
+import tracing
+from bootstrap_cluster import HashRing
+from connections import codec
+from config.config import (BS_CONNECT_TIMEOUT, BS_REPLY_TIMEOUT, BS_RETRY_AFTER, BUFFER_SIZE, PING_TIMEOUT,
+                           ROUTING_MAINTENANCE_INTERVAL, SEARCH_TTL)
+from replication import QueryTracker
+from search_aggregation import ResultAggregator
+from search_deadline import SearchDeadline, drop_if_expired
 from ttypes import Node
+from utils import metrics
+from utils.substring_index import SubstringIndex
+
+QUERIES = metrics.REGISTRY.counter("node_queries", "Search queries received by nodes")
+LOCAL_HITS = metrics.REGISTRY.counter("node_query_local_hits", "Queries answered from the node's own files")
+FORWARDS = metrics.REGISTRY.counter("node_query_forwards", "Search queries forwarded to neighbors")
+
+
+def parse_regok(data):
+    '''
+    Parse a REGOK response.
+    Args:
+        data (str): The length-prefixed response, e.g. "0036 REGOK 1 127.0.0.1 5002 peer2"
+    Returns:
+        list(Node): The neighbors listed in the response
+    Raises:
+        RuntimeError: If the response is not a successful REGOK
+    '''
+    try:
+        message = codec.decode(data)
+    except codec.ProtocolError as e:
+        raise RuntimeError(f"Registration failed: {e}")
+
+    # Validate the response
+    if not isinstance(message, codec.RegOk):  # Ensure response starts with REGOK
+        raise RuntimeError("Registration failed")
+    if message.code < 0:
+        raise RuntimeError("Invalid neighbor count")
+    if not message.ok:
+        raise RuntimeError(f"Registration failed with error code {message.code}")
+    return [Node(ip, port, name) for ip, port, name in message.nodes]
 
 
 class BootstrapServerConnection:
-    def __init__(self, bs, me):
-        self.bs = bs
+    # (ip, port) -> monotonic time until which an unreachable bootstrap server is tried last, shared by connections
+    unreachable_servers = {}
+
+    def __init__(self, bs, me, maintenance_interval=ROUTING_MAINTENANCE_INTERVAL):
+        # `bs` is a single bootstrap server Node or a list of them forming a cluster
+        self.bootstrap_servers = list(bs) if isinstance(bs, (list, tuple)) else [bs]
+        self.bs = self.bootstrap_servers[0]
         self.me = me
+        self.reply_timeout = BS_REPLY_TIMEOUT  # A server that accepts but does not answer in time is failed over
         self.users = []
-        self.maintenance_interval = 30  # Run every 30 seconds
+        self.queries = QueryTracker()  # Searches started here, reported to the bootstrap server on QSTAT
+        self.file_index = SubstringIndex()  # Follows `me.file_list`, which is replaced rather than mutated
+        self.maintenance_interval = maintenance_interval  # Seconds between pings of every neighbor
+        self.closed = threading.Event()
         self.start_routing_table_maintenance()
 
     def __enter__(self):
@@ -25,9 +72,56 @@ class BootstrapServerConnection:
         """
         Helper function to prepend the length of the message to the message itself.
         """
-        return f"{len(message) + 5:04d} {message}"
+        return codec.frame(message)
+
+    def ordered_bootstrap_servers(self):
+        """
+        Return the bootstrap servers in the order they should be tried.
+
+        Servers are ordered by the consistent hash of this node's (ip, port), so every node talks to the server
+        owning its registration first. Servers that recently failed are moved to the end.
+        """
+        if len(self.bootstrap_servers) == 1:
+            return self.bootstrap_servers
+        by_address = {(server.ip, int(server.port)): server for server in self.bootstrap_servers}
+        ordered = [by_address[a] for a in HashRing(by_address).preference_list(self.me.ip, int(self.me.port))]
+        now = time.monotonic()
+        return sorted(ordered, key=lambda s: self.unreachable_servers.get((s.ip, int(s.port)), 0) > now)
+
+    def request_bs(self, message):
+        """
+        Send a message to a bootstrap server, failing over to the next one if it cannot be reached.
 
-    def send_message(self, target_ip, target_port, message):
+        Args:
+            message (str): The message without its length prefix.
+
+        Returns:
+            bytes: The raw response. `self.bs` is set to the server that answered.
+
+        Raises:
+            ConnectionError: If no bootstrap server could be reached.
+        """
+        errors = []
+        for server in self.ordered_bootstrap_servers():
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            try:
+                s.settimeout(BS_CONNECT_TIMEOUT)
+                s.connect((server.ip, server.port))
+                s.settimeout(self.reply_timeout)
+                s.send(self.message_with_length(message).encode())
+                data = s.recv(BUFFER_SIZE)
+            except OSError as e:
+                self.unreachable_servers[(server.ip, int(server.port))] = time.monotonic() + BS_RETRY_AFTER
+                errors.append(f"{server.ip}:{server.port} ({e})")
+                continue
+            finally:
+                s.close()
+            self.unreachable_servers.pop((server.ip, int(server.port)), None)
+            self.bs = server
+            return data
+        raise ConnectionError(f"No bootstrap server reachable: {', '.join(errors)}")
+
+    def send_message(self, target_ip, target_port, message, timeout=None):
         """
         Sends a message to a target node.
 
@@ -35,6 +129,7 @@ class BootstrapServerConnection:
             target_ip (str): IP address of the target node.
             target_port (int): Port number of the target node.
             message (str): The message to send.
+            timeout (float): Optional seconds to wait for the connection and the response.
 
         Returns:
             str: Response from the target node, if any.
@@ -42,6 +137,7 @@ class BootstrapServerConnection:
         formatted_message = self.message_with_length(message)
         try:
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.settimeout(timeout)
                 s.connect((target_ip, target_port))
                 s.send(formatted_message.encode())
 
@@ -53,16 +149,16 @@ class BootstrapServerConnection:
 
     def maintain_routing_table(self):
         """Remove stale nodes from the routing table."""
-        while True:
-            time.sleep(self.maintenance_interval)
-            self.me.routing_table = [
-                node for node in self.me.routing_table if self.ping_node(node)
-            ]
+        while not self.closed.wait(self.maintenance_interval):
+            for node in [node for node in list(self.me.routing_table) if not self.ping_node(node)]:
+                # As if the node had left, so the peer sampling view forgets it too and finds a replacement
+                self.update_routing_table_on_leave(node)
 
     def ping_node(self, node):
-        """Check if a node is reachable."""
+        """Check if a node, a Node or an (ip, port) routing table entry, is reachable."""
+        ip, port = (node.ip, node.port) if hasattr(node, "ip") else node
         try:
-            response = self.send_message(node.ip, node.port, "PING")
+            response = self.send_message(ip, int(port), "PING", timeout=PING_TIMEOUT)
             return response == "PONG"
         except:
             return False
@@ -72,6 +168,10 @@ class BootstrapServerConnection:
         maintenance_thread = threading.Thread(target=self.maintain_routing_table, daemon=True)
         maintenance_thread.start()
 
+    def close(self):
+        """Stop the routing table maintenance thread."""
+        self.closed.set()
+
     def connect_to_bs(self):
         '''
         Register node at bootstrap server.
@@ -83,15 +183,10 @@ class BootstrapServerConnection:
         Raises:
             RuntimeError: If server sends an invalid response or if registration is unsuccessful
         '''
-        message = "REG " + self.me.ip + " " + str(self.me.port) + " " + self.me.name
-
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.bs.ip, self.bs.port))
-        s.send(self.message_with_length(message).encode())
+        message = codec.Reg(self.me.ip, self.me.port, self.me.name).body()
 
-        # Receive data from the bootstrap server
-        data = s.recv(BUFFER_SIZE)
-        s.close()
+        # Send to the first reachable bootstrap server and receive its answer
+        data = self.request_bs(message)
 
         # Decode the raw data
         decoded_data = data.decode()
@@ -107,33 +202,7 @@ class BootstrapServerConnection:
         # Log length prefix for debugging purposes
         print(f"DEBUG: Length Prefix: {length_prefix}")
 
-        # Strip the length prefix (4 digits + 1 space)
-        decoded_data = decoded_data[5:].strip()
-
-        # Tokenize the response
-        toks = decoded_data.split()
-        print(f"DEBUG: Tokenized response: {toks}")
-
-        # Validate the response
-        if len(toks) < 2 or toks[0] != "REGOK":  # Ensure response starts with REGOK
-            raise RuntimeError("Registration failed")
-
-        num = int(toks[1])  # Number of neighbors
-        if num < 0:
-            raise RuntimeError("Invalid neighbor count")
-
-        if num == 0:
-            return []
-        elif num == 1:
-            return [Node(toks[2], int(toks[3]), toks[4])]
-        else:
-            nodes = []
-            for i in range(num):
-                ip = toks[2 + i * 3]
-                port = int(toks[3 + i * 3])
-                name = toks[4 + i * 3]
-                nodes.append(Node(ip, port, name))
-            return nodes
+        return parse_regok(decoded_data)
 
     def unreg_from_bs(self):
         '''
@@ -143,33 +212,25 @@ class BootstrapServerConnection:
             me (tuple(str, int)): This node's IP address and port as a tuple.
             myname (str)        : This node's name.
         Returns:
-            None
+            str: The raw UNROK response.
         Raises:
             RuntimeError: If unregistration is unsuccessful.
         '''
-        buffer_size = BUFFER_SIZE
-        message = "UNREG " + self.me.ip + " " + str(self.me.port) + " " + self.me.name
-
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.bs.ip, self.bs.port))
+        message = codec.Unreg(self.me.ip, self.me.port, self.me.name).body()
 
-        # Encode the message before sending to the server
-        s.send(self.message_with_length(message).encode())
-
-        # Receive the response from the server
-        data = s.recv(buffer_size).decode()  # Decode the bytes object to string
-        s.close()
+        # Send to the first reachable bootstrap server and decode its answer
+        data = self.request_bs(message).decode()
 
         print(f"DEBUG: Received data: {data}")
 
-        # Strip the length prefix (first 5 characters) from the response
-        data_without_length = data[5:].strip()
-        toks = data_without_length.split()
-
-        print(f"DEBUG: Tokenized response: {toks}")
+        try:
+            response = codec.decode(data, strict=True)
+        except codec.ProtocolError as e:
+            raise RuntimeError(f"Unreg failed: {e}")
 
-        if toks[0] != "UNROK":  # Check the first token after removing the length prefix
+        if not isinstance(response, codec.UnrOk):
             raise RuntimeError("Unreg failed")
+        return data
 
     def join_network(self, target_ip, target_port):
         """
@@ -182,43 +243,41 @@ class BootstrapServerConnection:
         Returns:
             str: Response from the target node.
         """
-        message = f"JOIN {self.me.ip} {self.me.port}"
-        return self.send_message(target_ip, target_port, message)
+        return self.send_message(target_ip, target_port, codec.Join(self.me.ip, self.me.port).body())
 
     def send_join_request(self, target_node):
         """Send a JOIN request to a target node."""
-        message = f"JOIN {self.me.ip} {self.me.port}"
-        return self.send_message(target_node.ip, target_node.port, message)
+        return self.send_message(target_node.ip, target_node.port, codec.Join(self.me.ip, self.me.port).body())
 
     def handle_join_request(self, message):
         """Handle an incoming JOIN request."""
         # Parse the JOIN message
-        _, _, ip, port = message.split()
+        join = codec.decode(message)
         # Add the new node to the routing table
-        self.me.routing_table.append((ip, int(port)))
+        self.me.routing_table.append((join.ip, join.port))
         # Send JOINOK response
-        response = "JOINOK 0"
-        return self.send_message(ip, int(port), response)
+        return self.send_message(join.ip, join.port, codec.JoinOk(0).body())
 
     def leave_network(self):
         """
-        Sends a LEAVE request to the bootstrap server.
+        Sends a LEAVE request to the bootstrap server, failing over to the next one like REG and UNREG.
 
         Returns:
-            str: Response from the bootstrap server.
+            str: Response from the bootstrap server, or the error if none could be reached.
         """
-        message = f"LEAVE {self.me.ip} {self.me.port}"
-        return self.send_message(self.bs.ip, self.bs.port, message)
+        try:
+            return self.request_bs(codec.Leave(self.me.ip, self.me.port).body()).decode()
+        except ConnectionError as e:
+            return f"Error while sending message: {e}"
 
     def send_leave_request(self, target_node):
         """Send a LEAVE request to a target node."""
-        message = f"LEAVE {self.me.ip} {self.me.port}"
-        return self.send_message(target_node.ip, target_node.port, message)
+        return self.send_message(target_node.ip, target_node.port, codec.Leave(self.me.ip, self.me.port).body())
 
     def send_leave_message(self, target_node):
         """Send a LEAVE message to a target node."""
         try:
-            message = f"LEAVE {self.me.ip} {self.me.port}"
+            message = codec.Leave(self.me.ip, self.me.port).body()
             response = self.send_message(target_node.ip, target_node.port, message)
             return response
         except Exception as e:
@@ -227,15 +286,14 @@ class BootstrapServerConnection:
     def handle_leave_request(self, message):
         """Handle an incoming LEAVE request."""
         # Parse the LEAVE message
-        _, ip, port = message.split()
-        departing_node = (ip, int(port))
+        leave = codec.decode(message)
+        departing_node = (leave.ip, leave.port)
 
         # Update the routing table
         self.update_routing_table_on_leave(departing_node)
 
         # Send LEAVEOK response
-        response = "LEAVEOK 0"
-        return self.send_message(ip, int(port), response)
+        return self.send_message(leave.ip, leave.port, codec.LeaveOk(0).body())
 
     def update_routing_table_on_leave(self, departing_node):
         """
@@ -248,34 +306,111 @@ class BootstrapServerConnection:
             node for node in self.me.routing_table if node != departing_node
         ]
 
-    def search_file(self, file_name, hops=0):
+        # Let the peer sampling service (if the node runs one) find a replacement neighbor
+        peer_sampler = getattr(self.me, "peer_sampler", None)
+        if peer_sampler is not None:
+            peer_sampler.remove_peer(departing_node)
+
+    def search_file(self, file_name, hops=0, trace_context=None, aggregate=None, deadline=None):
         """
         Handles the SER (file search) request and performs the actual file search logic.
 
         Args:
             file_name (str): The name of the file to search for.
             hops (int): The current hop count for the search.
+            trace_context (tuple): Optional (trace id, parent span id) received with the SER. A span is recorded
+                for this hop and the context is passed on to the neighbors and returned with SEROK.
+            aggregate (tuple): Optional (result target, deadline in seconds). Instead of returning the first hit,
+                query every neighbor concurrently and return a SERAGG merging all hits found in time.
+            deadline (SearchDeadline): Time budget received with the SER (ttl field). A search starting here
+                (hops 0) without one gets `SEARCH_TTL` seconds. Expired queries are dropped unanswered by any
+                search, and neighbors receive what is left of the budget.
 
         Returns:
             str: SEROK message if the file is found, or forwards the request to neighbors.
         """
+        if deadline is None and hops == 0 and SEARCH_TTL is not None:
+            deadline = SearchDeadline(SEARCH_TTL)
+        if drop_if_expired(deadline, "received"):
+            return codec.SerOk(0, self.me.ip, self.me.port, hops + 1).encode()
+        QUERIES.inc()
+        if hops == 0:
+            self.queries.record(file_name)
+        span = tracing.start_span(trace_context, f"{self.me.ip}:{self.me.port}", file_name, hops)
+        fields = {"trace": span.context()} if span else {}
+
         # Check if the file exists in the local file list (partial match)
-        matching_files = [f for f in self.me.file_list if file_name.lower() in f.lower()]
+        search_start = time.perf_counter()
+        self.file_index.sync(self.me.file_list)
+        matching_files = self.file_index.search(file_name)
+        if span:
+            span.local_search_seconds = time.perf_counter() - search_start
+        if aggregate is not None:
+            if deadline is not None:
+                aggregate = (aggregate[0], min(aggregate[1], deadline.remaining()))
+            return self.aggregate_search(file_name, hops, matching_files, aggregate, fields, span, deadline)
         if matching_files:
+            LOCAL_HITS.inc()
             # File found locally, respond with SEROK
-            response = f"SEROK {len(matching_files)} {self.me.ip} {self.me.port} {hops + 1} " + " ".join(matching_files)
-            return self.message_with_length(response)
+            response = codec.SerOk(len(matching_files), self.me.ip, self.me.port, hops + 1, matching_files, fields)
+            if span:
+                span.finish("hit")
+            return response.encode()
 
         # If file not found locally, forward the SER request to neighbors
         if hops < self.me.max_hops:
+            forward_start = time.perf_counter()
+            message = codec.Ser(self.me.ip, self.me.port, file_name, hops + 1, fields).body()
             for neighbor in self.me.routing_table:
                 neighbor_ip, neighbor_port = neighbor
-                message = f"SER {self.me.ip} {self.me.port} \"{file_name}\" {hops + 1}"
-                response = self.send_message(neighbor_ip, neighbor_port, message)
-                if response and response.startswith("SEROK"):
+                if drop_if_expired(deadline, "forward"):
+                    break
+                timeout = None
+                if deadline is not None:
+                    message = codec.Ser(self.me.ip, self.me.port, file_name, hops + 1,
+                                        deadline.forwarded_fields(fields)).body()
+                    timeout = deadline.timeout()
+                FORWARDS.inc()
+                response = self.send_message(neighbor_ip, neighbor_port, message, timeout=timeout)
+                if self.is_search_hit(response):
                     # If a neighbor finds the file, return the response
+                    if span:
+                        span.forward_seconds = time.perf_counter() - forward_start
+                        span.finish("forwarded")
                     return response
+            if span:
+                span.forward_seconds = time.perf_counter() - forward_start
 
         # If no file is found and max hops are reached, return SEROK with 0 results
-        response = f"SEROK 0 {self.me.ip} {self.me.port} {hops + 1}"
-        return self.message_with_length(response)
+        if span:
+            span.finish("miss")
+        return codec.SerOk(0, self.me.ip, self.me.port, hops + 1, fields=fields).encode()
+
+    def aggregate_search(self, file_name, hops, matching_files, aggregate, fields, span, deadline=None):
+        """Merge the local matches with the hits of every neighbor that answers before the deadline."""
+        if matching_files:
+            LOCAL_HITS.inc()
+        aggregator = ResultAggregator(*aggregate)
+        aggregator.add_local(self.me.ip, self.me.port, hops + 1, matching_files)
+        if hops < self.me.max_hops and not aggregator.done:
+            forward_start = time.perf_counter()
+            forwarded = aggregator.forwarded_fields(fields)
+            if deadline is not None:
+                forwarded = deadline.forwarded_fields(forwarded)
+            message = codec.Ser(self.me.ip, self.me.port, file_name, hops + 1, forwarded).body()
+
+            def send(neighbor, timeout):
+                FORWARDS.inc()
+                return self.send_message(neighbor[0], neighbor[1], message, timeout=timeout)
+
+            aggregator.gather(list(self.me.routing_table), send)
+            if span:
+                span.forward_seconds = time.perf_counter() - forward_start
+        merged = aggregator.message(fields)
+        if span:
+            span.finish("hit" if matching_files else "forwarded" if merged.hit else "miss")
+        return merged.encode()
+
+    def is_search_hit(self, response):
+        """Return True if a (length-prefixed) SEROK response reports at least one file."""
+        return codec.is_search_hit(response)
@@ -0,0 +1,636 @@
+"""
+Wire codec shared by the bootstrap server, the nodes and the tools.
+
+A frame is "<length> <COMMAND> <arguments...>" where <length> is four digits counting the whole frame. Arguments
+are separated by spaces; an argument can be double-quoted to contain spaces, with a backslash escaping a quote or
+a backslash inside the quotes. SER and SEROK can end with optional key=value fields (e.g.
+trace=<trace id>:<span id>) that older peers ignore.
+
+`decode` turns a frame into one of the message classes below, once; components route the result through a
+`Dispatcher` keyed by command instead of re-tokenizing it.
+"""
+import re
+
+ERROR_CODES = (9996, 9997, 9998, 9999)
+
+# Keys accepted as optional trailing key=value fields of SER / SEROK; extended with `register_field`
+FIELD_KEYS = {"trace"}
+
+
+class ProtocolError(ValueError):
+    """Raised for frames that cannot be decoded."""
+
+
+def register_field(key):
+    FIELD_KEYS.add(key)
+
+
+def frame(message):
+    """Prepend the 4-digit length prefix to a message."""
+    return f"{len(message) + 5:04d} {message}"
+
+
+def unframe(data, strict=False):
+    """
+    Remove the length prefix from a frame.
+
+    Args:
+        data (str or bytes): The received frame.
+        strict (bool): Require the prefix. Otherwise a message without one is returned as it is.
+
+    Raises:
+        ProtocolError: If `strict` and the frame has no valid prefix.
+    """
+    if isinstance(data, bytes):
+        data = data.decode()
+    if data[:4].isdigit() and data[4:5] in (" ", ""):
+        return data[5:].strip()
+    if strict:
+        raise ProtocolError(f"Invalid message length prefix: {data[:10]!r}")
+    return data.strip()
+
+
+def quote(text, always=False):
+    """Quote a token if it contains spaces, quotes or backslashes (or if `always`)."""
+    if always or not text or any(c in text for c in ' "\\\t'):
+        return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return text
+
+
+TOKEN = re.compile(r'"((?:[^"\\]|\\.)*)"?|(\S+)')
+ESCAPE = re.compile(r"\\(.)")
+
+
+def tokenize(body):
+    """Split a message into tokens, honouring double-quoted tokens."""
+    if '"' not in body:
+        return body.split()
+    if "\\" not in body:
+        # Fast path for what `quote` produces: quoted tokens without escapes, each standing between spaces
+        parts = body.split('"')
+        last = len(parts) - 1
+        if last % 2 == 0 and (not parts[0] or parts[0][-1] == " "):
+            toks = parts[0].split()
+            for i in range(1, last, 2):
+                after = parts[i + 1]
+                if i + 1 < last and not (after[:1] == " " and after[-1] == " ") or after and after[0] != " ":
+                    break  # A quote inside a token: leave it to the full tokenizer
+                toks.append(parts[i])
+                toks += after.split()
+            else:
+                return toks
+    toks = []
+    for quoted, bare in TOKEN.findall(body):
+        if bare:
+            toks.append(bare)
+        else:
+            toks.append(ESCAPE.sub(r"\1", quoted) if "\\" in quoted else quoted)
+    return toks
+
+
+def split_fields(args):
+    """
+    Remove trailing key=value fields with a registered key.
+
+    Returns:
+        tuple: (remaining arguments, dict of fields)
+    """
+    if not args or "=" not in args[-1]:
+        return args, {}  # No fields: the common case
+    end = len(args)
+    while end and "=" in args[end - 1] and args[end - 1].partition("=")[0] in FIELD_KEYS:
+        end -= 1
+    if end == len(args):
+        return args, {}
+    fields = {}
+    for arg in args[end:]:
+        key, _, value = arg.partition("=")
+        fields[key] = value
+    return args[:end], fields
+
+
+def format_fields(fields):
+    return "".join(f" {key}={value}" for key, value in fields.items() if value is not None) if fields else ""
+
+
+class Message:
+    """Base class of the decoded messages; subclasses list their fields in __slots__."""
+
+    __slots__ = ()
+    command = None
+    attributes = ()  # The slots of the class and its bases, compared by __eq__
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.attributes = tuple(slot for klass in reversed(cls.__mro__) for slot in klass.__dict__.get("__slots__", ()))
+
+    def body(self):
+        raise NotImplementedError
+
+    def encode(self):
+        """Return the length-prefixed frame."""
+        return frame(self.body())
+
+    @property
+    def ok(self):
+        return True
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, s) == getattr(other, s) for s in self.attributes)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{s}={getattr(self, s)!r}' for s in self.attributes)})"
+
+
+class Reg(Message):
+    __slots__ = ("ip", "port", "name")
+    command = "REG"
+
+    def __init__(self, ip, port, name):
+        self.ip = ip
+        self.port = port
+        self.name = name
+
+    @classmethod
+    def decode(cls, args):
+        return cls(args[0], int(args[1]), args[2])
+
+    def body(self):
+        return f"{self.command} {self.ip} {self.port} {self.name}"
+
+
+class Unreg(Reg):
+    __slots__ = ()
+    command = "UNREG"
+
+
+class Join(Message):
+    __slots__ = ("ip", "port")
+    command = "JOIN"
+
+    def __init__(self, ip, port):
+        self.ip = ip
+        self.port = port
+
+    @classmethod
+    def decode(cls, args):
+        return cls(args[0], int(args[1]))
+
+    def body(self):
+        return f"{self.command} {self.ip} {self.port}"
+
+
+class Leave(Join):
+    __slots__ = ()
+    command = "LEAVE"
+
+
+class RegOk(Message):
+    """REGOK <count> <ip1> <port1> <name1> ...; a count of 9996-9999 is an error code."""
+
+    __slots__ = ("code", "nodes")
+    command = "REGOK"
+
+    def __init__(self, code, nodes=()):
+        self.code = code
+        self.nodes = list(nodes)  # (ip, port, name) tuples
+
+    @classmethod
+    def decode(cls, args):
+        code = int(args[0])
+        if code < 0 or code in ERROR_CODES:
+            return cls(code)
+        if len(args) < 1 + 3 * code:
+            raise ProtocolError(f"REGOK lists fewer than {code} nodes")
+        return cls(code, [(args[1 + i * 3], int(args[2 + i * 3]), args[3 + i * 3]) for i in range(code)])
+
+    @property
+    def ok(self):
+        return 0 <= self.code < ERROR_CODES[0]
+
+    def body(self):
+        return " ".join([self.command, str(self.code)] + [f"{ip} {port} {name}" for ip, port, name in self.nodes])
+
+
+class Ack(Message):
+    """<COMMAND> <value>, where 0 means success."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value=0):
+        self.value = value
+
+    @classmethod
+    def decode(cls, args):
+        return cls(int(args[0]))
+
+    @property
+    def ok(self):
+        return self.value == 0
+
+    def body(self):
+        return f"{self.command} {self.value}"
+
+
+class UnrOk(Ack):
+    __slots__ = ()
+    command = "UNROK"
+
+
+class JoinOk(Ack):
+    __slots__ = ()
+    command = "JOINOK"
+
+
+class LeaveOk(Ack):
+    __slots__ = ()
+    command = "LEAVEOK"
+
+
+class ReplOk(Ack):
+    __slots__ = ()
+    command = "REPLOK"
+
+
+class Ping(Message):
+    __slots__ = ()
+    command = "PING"
+
+    @classmethod
+    def decode(cls, args):
+        return cls()
+
+    def body(self):
+        return self.command
+
+
+class Error(Message):
+    __slots__ = ("reason",)
+    command = "ERROR"
+
+    def __init__(self, reason):
+        self.reason = reason
+
+    @classmethod
+    def decode(cls, args):
+        return cls(" ".join(args))
+
+    @property
+    def ok(self):
+        return False
+
+    def body(self):
+        return f"{self.command} {self.reason}"
+
+
+class Ser(Message):
+    """SER <ip> <port> "<file name>" <hops> [key=value ...]"""
+
+    __slots__ = ("ip", "port", "file_name", "hops", "fields")
+    command = "SER"
+
+    def __init__(self, ip, port, file_name, hops, fields=None):
+        self.ip = ip
+        self.port = port
+        self.file_name = file_name
+        self.hops = hops
+        self.fields = fields or {}
+
+    @classmethod
+    def decode(cls, args):
+        args, fields = split_fields(args)
+        if len(args) < 4:
+            raise ProtocolError("SER needs an address, a file name and a hop count")
+        # Older senders do not quote the name; its words are the tokens between the port and the hop count
+        return cls(args[0], int(args[1]), " ".join(args[2:-1]), int(args[-1]), fields)
+
+    @property
+    def trace_context(self):
+        """(trace id, parent span id) carried in the trace field, or None."""
+        return parse_trace(self.fields.get("trace"))
+
+    def body(self):
+        return (f"{self.command} {self.ip} {self.port} {quote(self.file_name, always=True)} {self.hops}"
+                + format_fields(self.fields))
+
+
+class SerOk(Message):
+    """SEROK <count> <ip> <port> <hops> <file1> <file2> ... [key=value ...]"""
+
+    __slots__ = ("count", "ip", "port", "hops", "files", "fields")
+    command = "SEROK"
+
+    def __init__(self, count, ip=None, port=None, hops=None, files=(), fields=None):
+        self.count = count
+        self.ip = ip
+        self.port = port
+        self.hops = hops
+        self.files = list(files)
+        self.fields = fields or {}
+
+    @classmethod
+    def decode(cls, args):
+        args, fields = split_fields(args)
+        count = int(args[0])
+        if len(args) < 4:
+            return cls(count, fields=fields)  # Bare "SEROK 0" from the bootstrap server
+        files = args[4:]
+        if count == 1 and len(files) > 1:
+            files = [" ".join(files)]  # Unquoted name from an older node
+        return cls(count, args[1], int(args[2]), int(args[3]), files, fields)
+
+    @property
+    def hit(self):
+        return self.count > 0
+
+    @property
+    def trace_context(self):
+        return parse_trace(self.fields.get("trace"))
+
+    def body(self):
+        parts = [self.command, str(self.count)]
+        if self.ip is not None:
+            parts += [self.ip, str(self.port), str(self.hops)] + [quote(name) for name in self.files]
+        return " ".join(parts) + format_fields(self.fields)
+
+
+class SerAgg(Message):
+    """
+    SERAGG <count> <ip1> <port1> <hops1> <rtt ms 1> <file1> ... [key=value ...]
+
+    The merged answer of an aggregated search: one entry per (holder, file), best ranked first.
+    """
+
+    __slots__ = ("entries", "fields")
+    command = "SERAGG"
+
+    def __init__(self, entries=(), fields=None):
+        self.entries = list(entries)  # (ip, port, hops, rtt seconds, file name) tuples
+        self.fields = fields or {}
+
+    @classmethod
+    def decode(cls, args):
+        args, fields = split_fields(args)
+        count = int(args[0])
+        if len(args) != 1 + 5 * count:
+            raise ProtocolError(f"SERAGG does not list {count} entries")
+        entries = []
+        for i in range(1, len(args), 5):
+            ip, port, hops, rtt, file_name = args[i:i + 5]
+            entries.append((ip, int(port), int(hops), float(rtt) / 1000, file_name))
+        return cls(entries, fields)
+
+    @property
+    def count(self):
+        return len(self.entries)
+
+    @property
+    def hit(self):
+        return bool(self.entries)
+
+    @property
+    def trace_context(self):
+        return parse_trace(self.fields.get("trace"))
+
+    def body(self):
+        parts = [self.command, str(len(self.entries))]
+        for ip, port, hops, rtt, file_name in self.entries:
+            parts += [ip, str(port), str(hops), f"{rtt * 1000:.1f}", quote(file_name)]
+        return " ".join(parts) + format_fields(self.fields)
+
+
+class Repl(Message):
+    """
+    Membership change replicated between bootstrap servers:
+        REPL REG <ip> <port> <name> <count> <ip1> <port1> ...
+        REPL UNREG <ip> <port>
+        REPL LEAVE <ip> <port>
+    """
+
+    __slots__ = ("op", "ip", "port", "name", "neighbors")
+    command = "REPL"
+
+    def __init__(self, op, ip, port, name=None, neighbors=()):
+        self.op = op
+        self.ip = ip
+        self.port = port
+        self.name = name
+        self.neighbors = list(neighbors)  # (ip, port) tuples
+
+    @classmethod
+    def decode(cls, args):
+        op, ip, port = args[0], args[1], int(args[2])
+        if op != "REG":
+            return cls(op, ip, port)
+        count = int(args[4])
+        return cls(op, ip, port, args[3], [(args[5 + i * 2], int(args[6 + i * 2])) for i in range(count)])
+
+    def body(self):
+        if self.op != "REG":
+            return f"{self.command} {self.op} {self.ip} {self.port}"
+        neighbors = "".join(f" {ip} {port}" for ip, port in self.neighbors)
+        return f"{self.command} REG {self.ip} {self.port} {self.name} {len(self.neighbors)}{neighbors}"
+
+
+class Shuffle(Message):
+    """SHUFFLE <ip> <port> <count> <ip1> <port1> <age1> ... (peer sampling)"""
+
+    __slots__ = ("sender", "entries")
+    command = "SHUFFLE"
+
+    def __init__(self, sender, entries):
+        self.sender = sender  # (ip, port)
+        self.entries = list(entries)  # ((ip, port), age) pairs
+
+    @classmethod
+    def decode(cls, args):
+        count = int(args[2])
+        return cls((args[0], int(args[1])),
+                   [((args[3 + i * 3], int(args[4 + i * 3])), int(args[5 + i * 3])) for i in range(count)])
+
+    def body(self):
+        entries = "".join(f" {ip} {port} {age}" for (ip, port), age in self.entries)
+        return f"{self.command} {self.sender[0]} {self.sender[1]} {len(self.entries)}{entries}"
+
+
+class ShuffleOk(Shuffle):
+    __slots__ = ()
+    command = "SHUFFLEOK"
+
+
+class Query(Message):
+    """QUERY "<file name>" <sender name>, the UDP search of node.Node"""
+
+    __slots__ = ("file_name", "sender")
+    command = "QUERY"
+
+    def __init__(self, file_name, sender):
+        self.file_name = file_name
+        self.sender = sender
+
+    @classmethod
+    def decode(cls, args):
+        if len(args) != 2:
+            raise ProtocolError(f"{cls.command} needs a file name and a node name")
+        return cls(args[0], args[1])
+
+    def body(self):
+        return f"{self.command} {quote(self.file_name, always=True)} {self.sender}"
+
+
+class Found(Query):
+    __slots__ = ()
+    command = "FOUND"
+
+
+class Replicate(Message):
+    """REPLICATE "<file name>": the bootstrap server asks a node to hold a copy of a popular file."""
+
+    __slots__ = ("file_name",)
+    command = "REPLICATE"
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+
+    @classmethod
+    def decode(cls, args):
+        if len(args) != 1:
+            raise ProtocolError(f"{cls.command} needs one file name")
+        return cls(args[0])
+
+    def body(self):
+        return f"{self.command} {quote(self.file_name, always=True)}"
+
+
+class Drop(Replicate):
+    """DROP "<file name>": the bootstrap server asks a node to give up a replica."""
+
+    __slots__ = ()
+    command = "DROP"
+
+
+class ReplicateOk(Ack):
+    """REPLICATEOK <value>; 9998 means the node's storage quota is full."""
+
+    __slots__ = ()
+    command = "REPLICATEOK"
+
+
+class DropOk(Ack):
+    __slots__ = ()
+    command = "DROPOK"
+
+
+class QStat(Ping):
+    """QSTAT: the bootstrap server asks a node for its query counts and the files it holds."""
+
+    __slots__ = ()
+    command = "QSTAT"
+
+
+class QStatOk(Message):
+    """QSTATOK <n> "<query1>" <count1> ... <m> "<file1>" ..."""
+
+    __slots__ = ("counts", "files")
+    command = "QSTATOK"
+
+    def __init__(self, counts=None, files=()):
+        self.counts = dict(counts or {})  # Query -> times searched since the previous QSTAT
+        self.files = list(files)
+
+    @classmethod
+    def decode(cls, args):
+        n = int(args[0])
+        counts = {args[1 + i * 2]: int(args[2 + i * 2]) for i in range(n)}
+        m = int(args[1 + n * 2])
+        files = args[2 + n * 2:]
+        if len(files) != m:
+            raise ProtocolError(f"QSTATOK does not list {m} files")
+        return cls(counts, files)
+
+    def body(self):
+        parts = [self.command, str(len(self.counts))]
+        for query, count in self.counts.items():
+            parts += [quote(query, always=True), str(count)]
+        parts.append(str(len(self.files)))
+        return " ".join(parts + [quote(name, always=True) for name in self.files])
+
+
+MESSAGES = {cls.command: cls for cls in (Reg, Unreg, Join, Leave, RegOk, UnrOk, JoinOk, LeaveOk, ReplOk, Ping, Error,
+                                         Ser, SerOk, SerAgg, Repl, Shuffle, ShuffleOk, Query, Found, Replicate, Drop,
+                                         ReplicateOk, DropOk, QStat, QStatOk)}
+
+
+def parse_trace(value):
+    """Split a trace field value "<trace id>:<span id>" into (trace id, span id or None)."""
+    if not value:
+        return None
+    trace_id, _, span_id = value.partition(":")
+    return trace_id, span_id or None
+
+
+def decode_tokens(toks):
+    """Decode an already tokenized message (command first, no length prefix)."""
+    if not toks:
+        raise ProtocolError("Empty message")
+    cls = MESSAGES.get(toks[0])
+    if cls is None:
+        raise ProtocolError(f"Unknown command {toks[0]!r}")
+    try:
+        return cls.decode(toks[1:])
+    except (IndexError, ValueError) as e:
+        raise ProtocolError(f"Malformed {toks[0]} message: {e}") from None
+
+
+def decode(data, strict=False):
+    """
+    Decode a frame into a message object.
+
+    Args:
+        data (str or bytes): The frame as received.
+        strict (bool): Reject messages without a length prefix.
+
+    Raises:
+        ProtocolError: If the frame is malformed or the command is unknown.
+    """
+    body = unframe(data, strict)
+    toks = tokenize(body)
+    if toks and toks[0] not in MESSAGES and body.startswith(("QUERY:", "FOUND:")):
+        # Colon-separated format of older nodes: QUERY:<file name>:<sender>; the name may contain colons
+        head, _, sender = body.rpartition(":")
+        command, _, file_name = head.partition(":")
+        return MESSAGES[command](file_name, sender)
+    return decode_tokens(toks)
+
+
+def is_search_hit(response):
+    """Return True if a (length-prefixed) response is a SEROK or SERAGG reporting at least one file."""
+    if not response:
+        return False
+    try:
+        message = decode(response)
+    except ProtocolError:
+        return False
+    return isinstance(message, (SerOk, SerAgg)) and message.hit
+
+
+class Dispatcher:
+    """Routes decoded messages to handlers by command."""
+
+    def __init__(self, handlers=None, default=None):
+        """
+        Args:
+            handlers (dict): Command -> handler(message, *args).
+            default (callable): Handler for commands without one; by default they raise ProtocolError.
+        """
+        self.handlers = dict(handlers or {})
+        self.default = default
+
+    def register(self, command, handler):
+        self.handlers[command] = handler
+
+    def dispatch(self, message, *args):
+        handler = self.handlers.get(message.command, self.default)
+        if handler is None:
+            raise ProtocolError(f"No handler for {message.command}")
+        return handler(message, *args)
@@ -0,0 +1,225 @@
+"""
+Local cache of downloaded files with a size quota and least-recently-used eviction.
+
+A node keeps the files it downloads from other nodes' `app.py` (/download or /uploaded) in a cache directory,
+advertises them in its file list while they are cached (see `NodeDaemon`), and serves them to peers from the same
+directory (`app.py` falls back to the cache). Popular content thereby spreads to the nodes that asked for it.
+
+The recency order is kept in memory and mirrored in the files' modification times, so a restarted process (or
+`app.py` serving from the same directory) resumes the same order. A lookup that misses in memory checks the
+directory, so files stored by another process after this one started are found too.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+
+from config.config import DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_QUOTA
+from utils import metrics
+
+CACHE_BYTES = metrics.REGISTRY.gauge("download_cache_bytes", "Bytes held in the download cache")
+CACHE_STORES = metrics.REGISTRY.counter("download_cache_stores", "Files added to the download cache")
+CACHE_EVICTIONS = metrics.REGISTRY.counter("download_cache_evictions", "Files evicted from the download cache")
+CACHE_LOOKUPS = metrics.REGISTRY.counter("download_cache_lookups", "Download cache lookups", ["outcome"])
+
+CHUNK_SIZE = 1024 * 1024
+TEMP_PREFIX = ".partial-"
+PARTIAL_MAX_AGE = 3600  # Seconds after which an unfinished download is removed (another process may be writing it)
+
+
+class DownloadCache:
+    def __init__(self, directory=DOWNLOAD_CACHE_DIR, quota=DOWNLOAD_CACHE_QUOTA, on_add=None, on_evict=None):
+        """
+        Args:
+            directory (str): Cache directory; files already in it are picked up, oldest first.
+            quota (int): Bytes the cache may hold.
+            on_add (callable): Called with the file name when a file enters the cache.
+            on_evict (callable): Called with the file name when a file leaves the cache.
+        """
+        self.directory = directory
+        self.quota = quota
+        self.on_add = on_add
+        self.on_evict = on_evict
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # File name -> size in bytes, least recently used first
+        self.size = 0
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+
+    def load(self):
+        found = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            if not entry.name.startswith(TEMP_PREFIX):
+                found.append((stat.st_mtime, entry.name, stat.st_size))
+            elif time.time() - stat.st_mtime > PARTIAL_MAX_AGE:
+                os.unlink(entry.path)  # Left over from an interrupted download
+        for _, name, size in sorted(found):
+            self.entries[name] = size
+            self.size += size
+        CACHE_BYTES.set(self.size)
+
+    def names(self):
+        with self.lock:
+            return list(self.entries)
+
+    def file_path(self, name):
+        return os.path.join(self.directory, safe_name(name))
+
+    def get(self, name):
+        """
+        Return the path of a cached file and mark it as recently used, or None if it is not cached.
+
+        A file this instance does not know about but that is in the directory (stored by another process sharing
+        it, such as the node daemon for `app.py`) is adopted as the most recently used entry.
+        """
+        name = safe_name(name)
+        path = self.file_path(name)
+        adopted, evicted = False, []
+        with self.lock:
+            if name in self.entries:
+                self.entries.move_to_end(name)
+            else:
+                try:
+                    size = os.path.getsize(path) if os.path.isfile(path) else None
+                except FileNotFoundError:
+                    size = None  # Removed in between
+                if size is None:
+                    CACHE_LOOKUPS.labels("miss").inc()
+                    return None
+                self.entries[name] = size
+                self.size += size
+                evicted = self.evict_locked(keep=name)
+                adopted = True
+        if adopted:
+            CACHE_BYTES.set(self.size)
+            for old in evicted:
+                self.notify(self.on_evict, old)
+            self.notify(self.on_add, name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.discard(name)  # Removed behind our back
+            CACHE_LOOKUPS.labels("miss").inc()
+            return None
+        CACHE_LOOKUPS.labels("hit").inc()
+        return path
+
+    def put(self, name, chunks):
+        """
+        Store a file from an iterable of byte chunks, evicting least recently used files to stay within the quota.
+
+        Returns:
+            str: The cached file's path, or None if the file is larger than the whole quota.
+        """
+        name = safe_name(name)
+        fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=self.directory)
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.quota:
+                        break
+                    f.write(chunk)
+            if size > self.quota:
+                logging.warning(f"{name} is larger than the download cache quota ({self.quota} bytes), not cached")
+                os.unlink(temp_path)
+                return None
+            os.replace(temp_path, self.file_path(name))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        with self.lock:
+            replaced = self.entries.pop(name, None)
+            if replaced is not None:
+                self.size -= replaced
+            self.entries[name] = size
+            self.size += size
+            evicted = self.evict_locked(keep=name)
+        CACHE_STORES.inc()
+        CACHE_BYTES.set(self.size)
+        for old in evicted:
+            self.notify(self.on_evict, old)
+        if replaced is None:
+            self.notify(self.on_add, name)
+        return self.file_path(name)
+
+    def put_file(self, name, source_path):
+        """Copy a local file into the cache."""
+        with open(source_path, "rb") as f:
+            return self.put(name, iter(lambda: f.read(CHUNK_SIZE), b""))
+
+    def fetch(self, url, name=None, timeout=30):
+        """
+        Download a file over HTTP (e.g. another node's /download/<name>) into the cache, unless it is cached already.
+
+        Returns:
+            str: The cached file's path, or None if it does not fit in the quota.
+        """
+        name = name or urllib.parse.unquote(url.rstrip("/").rsplit("/", 1)[-1])
+        path = self.get(name)
+        if path is not None:
+            return path
+        start = time.perf_counter()
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            path = self.put(name, iter(lambda: response.read(CHUNK_SIZE), b""))
+        logging.info(f"Cached {name} from {url} in {time.perf_counter() - start:.2f}s")
+        return path
+
+    def discard(self, name):
+        """Remove a file from the cache."""
+        name = safe_name(name)
+        with self.lock:
+            size = self.entries.pop(name, None)
+            if size is None:
+                return False
+            self.size -= size
+        try:
+            os.unlink(self.file_path(name))
+        except FileNotFoundError:
+            pass
+        CACHE_BYTES.set(self.size)
+        self.notify(self.on_evict, name)
+        return True
+
+    def evict_locked(self, keep=None):
+        """Remove least recently used files until the cache fits its quota; the caller holds the lock."""
+        evicted = []
+        for name in list(self.entries):
+            if self.size <= self.quota:
+                break
+            if name == keep:
+                continue
+            self.size -= self.entries.pop(name)
+            try:
+                os.unlink(self.file_path(name))
+            except FileNotFoundError:
+                pass
+            CACHE_EVICTIONS.inc()
+            evicted.append(name)
+        return evicted
+
+    def notify(self, callback, name):
+        if callback is not None:
+            try:
+                callback(name)
+            except Exception as e:
+                logging.error(f"Download cache callback failed for {name}: {e}")
+
+
+def safe_name(name):
+    """Reduce a file name to its last path component so that it stays inside the cache directory."""
+    name = os.path.basename(name.replace("\\", "/"))
+    if name in ("", ".", "..") or name.startswith(TEMP_PREFIX):
+        raise ValueError(f"Invalid file name: {name!r}")
+    return name
+
@@ -1,46 +1,47 @@
 import random
-import requests
 import time
-import statistics
 
 from config.config import BOOTSTRAP_IP, BOOTSTRAP_PORT, FLASK_API_URL
 from connections.bootstrap_server_connection import BootstrapServerConnection
 from ttypes import Node
 from performance_analysis import log_query_performance, plot_graphs
+from transfer_client import TransferClient
+from utils.streaming_stats import StreamingSummary
 
 # Nodes
 nodes = []
 
 
-# Performance Metrics
+# Performance Metrics, kept as constant-memory streaming summaries
 class PerformanceMetrics:
     def __init__(self):
-        self.hops = []
-        self.latencies = []
-        self.messages_per_node = []
-        self.node_degrees = []
+        self.hops = StreamingSummary()
+        self.latencies = StreamingSummary()
+        self.messages_per_node = StreamingSummary()
+        self.node_degrees = StreamingSummary()
 
     def record_hop(self, hop_count):
-        self.hops.append(hop_count)
+        self.hops.add(hop_count)
 
     def record_latency(self, latency):
-        self.latencies.append(latency)
+        self.latencies.add(latency)
 
     def record_messages_per_node(self, message_count):
-        self.messages_per_node.append(message_count)
+        self.messages_per_node.add(message_count)
 
     def record_node_degree(self, degree):
-        self.node_degrees.append(degree)
+        self.node_degrees.add(degree)
+
+    def merge(self, other):
+        """Combine the metrics recorded by another PerformanceMetrics (e.g. from another node)."""
+        self.hops.merge(other.hops)
+        self.latencies.merge(other.latencies)
+        self.messages_per_node.merge(other.messages_per_node)
+        self.node_degrees.merge(other.node_degrees)
 
     def calculate_metrics(self, data):
-        if not data:
-            return {"min": None, "max": None, "average": None, "std_dev": None}
-        return {
-            "min": min(data),
-            "max": max(data),
-            "average": sum(data) / len(data),
-            "std_dev": statistics.stdev(data) if len(data) > 1 else 0
-        }
+        # min, max, average, std_dev plus count and p50 / p99 / p999
+        return data.summary()
 
     def get_performance_summary(self):
         return {
@@ -63,12 +64,18 @@ def setup_nodes():
         nodes.append((node, connection))
 
 
-def generate_file():
+def generate_file(transfer_client):
     """Generate a file using the Flask API."""
-    response = requests.get(f"{FLASK_API_URL}/generate")
-    if response.status_code == 200:
-        return response.json()
-    raise RuntimeError(f"Failed to generate file. Status: {response.status_code}, Response: {response.text}")
+    return transfer_client.generate()
+
+
+def download_file(transfer_client, file_details):
+    """Download a generated file, verifying its SHA-256 while it streams in."""
+    result = transfer_client.download(file_details['file_name'], file_details['sha256_hash'],
+                                      expected_blocks=file_details.get('block_sha256'))
+    if not result.ok:
+        raise RuntimeError(f"Download of {result.name} failed: {result.error or 'SHA-256 mismatch'}")
+    return result
 
 
 def simulate_hops(node):
@@ -107,13 +114,18 @@ def query_file(node, file_name):
 
 
 def simulate_node_failure():
-    """Simulate node failures with graceful departure."""
-    for node, connection in nodes:  # Iterate over the nodes list
+    """
+    Simulate node failures with graceful departure.
+
+    Every node leaves at once; see churn_harness.py for crashes and departures while searches are running.
+    """
+    for node, connection in list(nodes):  # Iterate over a copy: departed nodes are removed from the list
         for neighbor in node.routing_table:
             try:
                 connection.send_leave_message(neighbor)
                 neighbor_connection = BootstrapServerConnection(node, neighbor)
-                neighbor_connection.update_routing_table_on_leave(node)
+                neighbor_connection.update_routing_table_on_leave((node.ip, node.port))
+                neighbor_connection.close()
             except Exception as e:
                 print(f"Failed to update routing table for {neighbor}: {e}")
 
@@ -134,8 +146,11 @@ def main():
     setup_nodes()
     print("Nodes registered with the bootstrap server.")
 
-    file_details = generate_file()
-    print(f"Generated file: {file_details}")
+    with TransferClient(FLASK_API_URL) as transfer_client:
+        file_details = generate_file(transfer_client)
+        print(f"Generated file: {file_details}")
+        transfer = download_file(transfer_client, file_details)
+    print(f"Downloaded and verified {transfer.name}: {transfer.bytes} bytes at {transfer.mb_per_second:.2f} MB/s")
 
     for node, _ in nodes:
         query_file(node, file_details['file_name'])
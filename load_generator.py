@@ -0,0 +1,298 @@
+"""
+Open-loop load generator for the bootstrap server.
+
+Requests are started on a fixed schedule (one every 1/rate seconds). The schedule does not wait for earlier
+requests to finish, and latency is measured from the time a request was due to be sent, not from when it was
+actually sent. A server that falls behind therefore shows up as rising latency instead of a silently lowered
+request rate (coordinated omission).
+
+The synthetic nodes registered by the generator use 127.0.0.1 and ports nobody listens on, so a SER forwarded by
+the bootstrap server fails fast instead of waiting on unreachable hosts.
+
+Every request comes from one source IP, so a server with admission control applies its per-source and per-command
+rate limits to the whole load, and the knee found is the rate limit rather than the server's capacity. Start the
+server with --no-admission-control to measure the server itself. Requests the server turns away with an ERROR reply
+are counted as "rejected", and the tool warns when there are any.
+
+Example:
+    python load_generator.py --port 5000 --rates 100,200,400,800,1600 --duration 10 --mix REG=4,UNREG=2,LEAVE=1,SER=1
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+from config.config import BOOTSTRAP_IP, BOOTSTRAP_PORT, BUFFER_SIZE
+from connections import codec
+from utils.streaming_stats import LogHistogram
+
+EXPECTED_REPLY = {"REG": "REGOK", "UNREG": "UNROK", "LEAVE": "LEAVEOK", "SER": "SEROK"}
+DEFAULT_MIX = {"REG": 4, "UNREG": 2, "LEAVE": 1, "SER": 1}
+
+
+class OperationStats:
+    """Latency histogram and outcome counters of one operation at one rate."""
+
+    __slots__ = ("histogram", "outcomes")
+
+    def __init__(self):
+        self.histogram = LogHistogram()
+        self.outcomes = Counter()  # ok, error, rejected, timeout, connection_error, no_identity
+
+    def to_dict(self):
+        latency = {f"p{label}": self.histogram.quantile(q)
+                   for label, q in (("50", 0.5), ("90", 0.9), ("99", 0.99), ("999", 0.999))}
+        return {"count": self.histogram.total, **dict(self.outcomes), **latency}
+
+
+class Identities:
+    """Pool of synthetic nodes; tracks which are registered so UNREG / LEAVE target registered ones."""
+
+    def __init__(self, size, base_port=40000, rng=None):
+        self.rng = rng or random.Random()
+        self.unregistered = [("127.0.0.1", base_port + i, f"load{i}") for i in range(size)]
+        self.registered = []
+
+    def take(self, op):
+        """Remove and return an identity suited to `op`, or None if every identity is in use."""
+        if op == "REG":
+            pool = self.unregistered or self.registered
+        else:
+            pool = self.registered or self.unregistered
+        if not pool:
+            return None
+        index = self.rng.randrange(len(pool))
+        pool[index], pool[-1] = pool[-1], pool[index]
+        return pool.pop()
+
+    def put(self, identity, registered):
+        (self.registered if registered else self.unregistered).append(identity)
+
+
+def build_message(op, identity, file_name, hops):
+    ip, port, name = identity
+    if op == "REG":
+        message = codec.Reg(ip, port, name)
+    elif op == "UNREG":
+        message = codec.Unreg(ip, port, name)
+    elif op == "LEAVE":
+        message = codec.Leave(ip, port)
+    else:
+        message = codec.Ser(ip, port, file_name, hops)
+    return message.encode().encode()
+
+
+def classify(op, response):
+    """Return "ok", "rejected" (an ERROR reply from admission control) or "error" for a bootstrap server response."""
+    try:
+        message = codec.decode(response)
+    except codec.ProtocolError:
+        return "error"
+    if message.command == "ERROR":
+        return "rejected"
+    return "ok" if message.command == EXPECTED_REPLY[op] and message.ok else "error"
+
+
+class LoadGenerator:
+    def __init__(self, ip=BOOTSTRAP_IP, port=BOOTSTRAP_PORT, mix=None, identities=1000, timeout=5.0,
+                 max_in_flight=1000, file_name="Lord", hops=1, seed=None, samples=None):
+        """
+        Args:
+            ip (str): Bootstrap server address.
+            port (int): Bootstrap server port.
+            mix (dict): Operation -> relative weight.
+            identities (int): Size of the pool of synthetic nodes; raised to `max_in_flight` so that every open
+                connection can use its own.
+            timeout (float): Seconds before a request counts as timed out.
+            max_in_flight (int): Connections open at once. Requests due while the cap is reached wait, and the
+                wait counts towards their latency.
+            file_name (str): File searched by SER requests.
+            hops (int): Hop count sent with SER requests.
+            samples (file): Optional file receiving one JSON line per request (rate, op, latency, outcome).
+        """
+        self.ip = ip
+        self.port = port
+        self.mix = mix or DEFAULT_MIX
+        self.rng = random.Random(seed)
+        self.identities = Identities(max(identities, max_in_flight), rng=self.rng)
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.file_name = file_name
+        self.hops = hops
+        self.samples = samples
+
+    async def request(self, op, slots):
+        async with slots:
+            # Taken only once a slot is free: requests waiting for a slot hold no identity
+            identity = self.identities.take(op)
+            if identity is None:
+                return "no_identity"
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(self.ip, self.port), self.timeout)
+            except asyncio.TimeoutError:
+                self.identities.put(identity, op == "REG")
+                return "timeout"
+            except OSError:
+                self.identities.put(identity, op == "REG")
+                return "connection_error"
+            try:
+                writer.write(build_message(op, identity, self.file_name, self.hops))
+                await writer.drain()
+                response = await asyncio.wait_for(reader.read(BUFFER_SIZE), self.timeout)
+                outcome = classify(op, response.decode())
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+            except OSError:
+                outcome = "connection_error"
+            finally:
+                writer.close()
+            if op == "REG":
+                self.identities.put(identity, outcome == "ok")
+            elif op in ("UNREG", "LEAVE"):
+                self.identities.put(identity, outcome != "ok")
+            else:
+                self.identities.put(identity, True)
+        return outcome
+
+    async def timed_request(self, op, intended, slots, stats, rate):
+        outcome = await self.request(op, slots)
+        latency = time.perf_counter() - intended  # From the scheduled send time: no coordinated omission
+        stats.histogram.add(latency)
+        stats.outcomes[outcome] += 1
+        if self.samples is not None:
+            self.samples.write(json.dumps({"rate": rate, "op": op, "latency": latency, "outcome": outcome}) + "\n")
+
+    async def run(self, rate, duration):
+        """
+        Drive the server at `rate` requests per second for `duration` seconds.
+
+        Returns:
+            dict: target rate, achieved throughput and per-operation statistics.
+        """
+        ops = list(self.mix)
+        weights = [self.mix[op] for op in ops]
+        stats = {op: OperationStats() for op in ops}
+        slots = asyncio.Semaphore(self.max_in_flight)
+        loop = asyncio.get_running_loop()
+        tasks = []
+        total = int(rate * duration)
+        start = time.perf_counter()
+        for i in range(total):
+            intended = start + i / rate
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            op = self.rng.choices(ops, weights)[0]
+            tasks.append(loop.create_task(self.timed_request(op, intended, slots, stats[op], rate)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+        completed = sum(s.outcomes["ok"] for s in stats.values())
+        overall = OperationStats()
+        for s in stats.values():
+            overall.histogram.merge(s.histogram)
+            overall.outcomes.update(s.outcomes)
+        return {"rate": rate, "requests": total, "throughput": completed / elapsed if elapsed else 0.0,
+                "overall": overall.to_dict(), "ops": {op: s.to_dict() for op, s in stats.items()}}
+
+    async def sweep(self, rates, duration, knee_factor=3.0):
+        """
+        Run each rate in turn and locate the knee of the latency curve.
+
+        Returns:
+            tuple: (list of per-rate results, highest rate below the knee or None)
+        """
+        results = []
+        for rate in rates:
+            result = await self.run(rate, duration)
+            results.append(result)
+            print_result(result)
+        return results, find_knee(results, knee_factor)
+
+
+def find_knee(results, knee_factor=3.0, min_throughput=0.9):
+    """
+    Return the highest rate the server sustained before the knee.
+
+    A rate is past the knee when its overall p99 exceeds `knee_factor` times the p99 at the lowest rate, when
+    fewer than `min_throughput` of the target requests per second succeeded, or when requests time out.
+    """
+    if not results:
+        return None
+    base_p99 = results[0]["overall"]["p99"] or 0.0
+    knee = None
+    for result in results:
+        overall = result["overall"]
+        if ((overall["p99"] or 0.0) > knee_factor * base_p99 or overall.get("timeout", 0)
+                or result["throughput"] < min_throughput * result["rate"]):
+            break
+        knee = result["rate"]
+    return knee
+
+
+def print_result(result):
+    overall = result["overall"]
+    print(f"rate {result['rate']:>8.0f}/s  throughput {result['throughput']:>8.1f}/s  "
+          f"p50 {(overall['p50'] or 0) * 1000:8.2f} ms  p99 {(overall['p99'] or 0) * 1000:8.2f} ms  "
+          f"p99.9 {(overall['p999'] or 0) * 1000:8.2f} ms  errors {overall.get('error', 0)}  "
+          f"rejected {overall.get('rejected', 0)}  "
+          f"timeouts {overall.get('timeout', 0)}  connection errors {overall.get('connection_error', 0)}")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        op, _, weight = part.partition("=")
+        op = op.strip().upper()
+        if op not in EXPECTED_REPLY:
+            raise argparse.ArgumentTypeError(f"Unknown operation {op}")
+        mix[op] = float(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Open-loop load generator for the bootstrap server.")
+    parser.add_argument("--ip", default=BOOTSTRAP_IP)
+    parser.add_argument("--port", type=int, default=BOOTSTRAP_PORT)
+    parser.add_argument("--rates", default="100,200,400,800",
+                        help="Comma-separated target rates (requests per second), swept in order.")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per rate.")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="e.g. REG=4,UNREG=2,LEAVE=1,SER=1")
+    parser.add_argument("--identities", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--hops", type=int, default=1)
+    parser.add_argument("--knee-factor", type=float, default=3.0)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="Write the per-rate results as JSON lines.")
+    parser.add_argument("--samples", help="Write one JSON line per request (input for benchmark_report.py).")
+    args = parser.parse_args(argv)
+
+    rates = [float(rate) for rate in args.rates.split(",")]
+    samples = open(args.samples, "w") if args.samples else None
+    try:
+        generator = LoadGenerator(args.ip, args.port, args.mix, args.identities, args.timeout, args.max_in_flight,
+                                  hops=args.hops, seed=args.seed, samples=samples)
+        results, knee = asyncio.run(generator.sweep(rates, args.duration, args.knee_factor))
+    finally:
+        if samples is not None:
+            samples.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+    rejected = sum(result["overall"].get("rejected", 0) for result in results)
+    if rejected:
+        print(f"Warning: the server rejected {rejected} requests with ERROR replies (admission control). The knee "
+              f"below reflects its rate limits; restart it with --no-admission-control to measure the server itself.")
+    if knee is None:
+        print("The latency knee is at or below the lowest rate.")
+    else:
+        print(f"Highest rate before the latency knee: {knee:.0f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
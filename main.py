@@ -1,11 +1,19 @@
+import argparse
 import logging
 import shlex
 import socket
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-from config.config import BOOTSTRAP_IP, BOOTSTRAP_PORT
+from config.config import BOOTSTRAP_IP, BOOTSTRAP_PORT, SEARCH_AGGREGATION_DEADLINE, SEARCH_AGGREGATION_TARGET
+from connections import codec
 from connections.bootstrap_server_connection import BootstrapServerConnection
 from node import Node
 from ttypes import Node as SimpleNode
+from utils.streaming_stats import StreamingSummary
 
 
 def parse_command_parts(parts):
@@ -17,95 +25,262 @@ def parse_command_parts(parts):
         raise ValueError("Invalid command format. Ensure the command includes <IP_address>, <port_no>, and <username>.")
 
 
-def main():
-    # Set up logging configuration at the entry point
-    logging.basicConfig(level=logging.INFO, format='\n%(asctime)s - %(levelname)s - %(message)s\n')
+class CommandSession:
+    """
+    Node and bootstrap server connection objects shared by the commands of one session.
 
-    # Bootstrap server details
-    bs_node = SimpleNode(ip=BOOTSTRAP_IP, port=BOOTSTRAP_PORT, name="BootstrapServer")
+    Every command used to build a fresh `node.Node` (binding a UDP socket that was never closed) and a fresh
+    `BootstrapServerConnection` (starting a maintenance thread). Objects are now created once per identity and
+    reused, and `close` releases them.
+    """
 
-    while True:
-        user_input = input("Enter command (e.g., 0036 REG 129.82.123.45 5001 1234abcd or exit): ").strip()
-        if user_input.lower() == "exit":
-            logging.info("Exiting...")
-            break
-
-        try:
-            # Parse the input command
-            parts = shlex.split(user_input)
-            if len(parts) == 5 and parts[1] == "REG":
-                ip, port, username = parse_command_parts(parts)
-                my_node = Node(ip=ip, port=port, name=username, file_list=[], peers=[(BOOTSTRAP_IP, BOOTSTRAP_PORT)],
-                               bs_ip=BOOTSTRAP_IP, bs_port=BOOTSTRAP_PORT)
+    def __init__(self, bs_node):
+        self.bs_node = bs_node
+        self.lock = threading.Lock()
+        self.nodes = {}  # (ip, port) -> node.Node; one UDP socket per address
+        self.connections = {}  # (ip, port, name, bound) -> BootstrapServerConnection
 
-                nodes = BootstrapServerConnection(bs=bs_node, me=my_node).connect_to_bs()
-                logging.info(f"Registration successful. Nodes received: {nodes}")
-                print('\n')
+    def node(self, ip, port, name):
+        """
+        Return the node bound to (ip, port), creating it on first use.
 
-            elif len(parts) == 5 and parts[1] == "UNREG":
-                ip, port, username = parse_command_parts(parts)
-                my_node = Node(ip=ip, port=port, name=username, file_list=[], peers=[(BOOTSTRAP_IP, BOOTSTRAP_PORT)],
+        Raises:
+            ValueError: If the address is already in use by a node with another name.
+        """
+        key = (ip, port)
+        with self.lock:
+            my_node = self.nodes.get(key)
+            if my_node is not None and my_node.name != name:
+                raise ValueError(f"{ip}:{port} is already used by {my_node.name}; cannot use it as {name}.")
+            if my_node is None:
+                my_node = Node(ip=ip, port=port, name=name, file_list=[], peers=[(BOOTSTRAP_IP, BOOTSTRAP_PORT)],
                                bs_ip=BOOTSTRAP_IP, bs_port=BOOTSTRAP_PORT)
+                self.nodes[key] = my_node
+            return my_node
 
-                response = BootstrapServerConnection(bs=bs_node, me=my_node).unreg_from_bs()
-                result = handle_unreg_response(response)
-                logging.info(result)
-                print('\n')
+    def connection(self, ip, port, name, bound=False):
+        """
+        Return the bootstrap server connection of an identity.
 
+        Args:
+            bound (bool): Act as a `node.Node` with its own UDP socket (REG / UNREG) rather than as a plain
+                address (JOIN / LEAVE / SER).
+        """
+        key = (ip, port, name, bound)
+        me = self.node(ip, port, name) if bound else None
+        with self.lock:
+            connection = self.connections.get(key)
+            if connection is None:
+                connection = BootstrapServerConnection(bs=self.bs_node, me=me or SimpleNode(ip=ip, port=port, name=name))
+                self.connections[key] = connection
+            return connection
 
-            elif len(parts) == 4 and parts[1] == "JOIN":
-                _, _, target_ip, target_port = parts
-                target_port = int(target_port)
+    def close(self):
+        with self.lock:
+            for connection in self.connections.values():
+                connection.close()
+            for my_node in self.nodes.values():
+                my_node.sock.close()
+            self.connections.clear()
+            self.nodes.clear()
 
-                # Dynamically get the local IP
-                local_ip = socket.gethostbyname(socket.gethostname())  # Replace with the actual port
 
-                my_node = SimpleNode(ip=local_ip, port=BOOTSTRAP_PORT, name="MyNode")  # Example node details
-                target_node = SimpleNode(ip=target_ip, port=target_port, name="TargetNode")
+def execute_command(parts, session):
+    """
+    Run one command.
 
-                response = BootstrapServerConnection(bs=bs_node, me=my_node).send_join_request(target_node=target_node)
-                result = handle_join_response(response)
-                logging.info(result)
-                print('\n')
-            elif len(parts) == 4 and parts[1] == "LEAVE":
-                _, _, ip, port = parts
-                port = int(port)
+    Args:
+        parts (list): The tokenized command, e.g. ["0036", "REG", "129.82.123.45", "5001", "1234abcd"].
+        session (CommandSession): Supplies the node and connection objects.
+
+    Returns:
+        str: A description of the outcome.
+
+    Raises:
+        ValueError: If the command is malformed.
+    """
+    if len(parts) == 5 and parts[1] == "REG":
+        ip, port, username = parse_command_parts(parts)
+        nodes = session.connection(ip, port, username, bound=True).connect_to_bs()
+        return f"Registration successful. Nodes received: {[(n.ip, n.port, n.name) for n in nodes]}"
+
+    elif len(parts) == 5 and parts[1] == "UNREG":
+        ip, port, username = parse_command_parts(parts)
+        response = session.connection(ip, port, username, bound=True).unreg_from_bs()
+        return handle_unreg_response(response)
+
+    elif len(parts) == 4 and parts[1] == "JOIN":
+        _, _, target_ip, target_port = parts
+        target_port = int(target_port)
+
+        # Dynamically get the local IP
+        local_ip = socket.gethostbyname(socket.gethostname())
+
+        target_node = SimpleNode(ip=target_ip, port=target_port, name="TargetNode")
+        response = session.connection(local_ip, BOOTSTRAP_PORT, "MyNode").send_join_request(target_node=target_node)
+        return handle_join_response(response)
+
+    elif len(parts) == 4 and parts[1] == "LEAVE":
+        _, _, ip, port = parts
+        port = int(port)
+
+        target_node = SimpleNode(ip=BOOTSTRAP_IP, port=BOOTSTRAP_PORT, name="BootstrapServer")
+        return session.connection(ip, port, "MyNode").send_leave_request(target_node=target_node)
+
+    elif len(parts) in (6, 7) and parts[1] == "SER" and parts[6:] in ([], ["all"]):
+        _, _, ip, port, file_name, hops = parts[:6]
+        port = int(port)
+        hops = int(hops)
+
+        # A trailing "all" collects every holder that answers in time instead of the first one
+        aggregate = (SEARCH_AGGREGATION_TARGET, SEARCH_AGGREGATION_DEADLINE) if len(parts) == 7 else None
+        return session.connection(ip, port, "MyNode").search_file(file_name=file_name.strip('"'), hops=hops,
+                                                                  aggregate=aggregate)
+
+    raise ValueError("Invalid command format. Use: <length> REG/UNREG <IP_address> <port_no> <username>")
+
+
+def command_identity(parts):
+    """Commands about the same (ip, port) must run in order; commands about different ones are independent."""
+    return tuple(parts[2:4]) if len(parts) >= 4 else tuple(parts)
+
+
+def read_batch(stream):
+    """
+    Read a batch of commands, one per line. Blank lines and lines starting with '#' are skipped.
+
+    Returns:
+        list: (line number, tokenized command) pairs.
+    """
+    commands = []
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if line and not line.startswith("#"):
+            commands.append((line_no, shlex.split(line)))
+    return commands
 
-                my_node = SimpleNode(ip=ip, port=port, name="MyNode")
-                target_node = SimpleNode(ip=BOOTSTRAP_IP, port=BOOTSTRAP_PORT, name="BootstrapServer")
 
-                response = BootstrapServerConnection(bs=bs_node, me=my_node).send_leave_request(target_node=target_node)
-                logging.info(response)
+def run_batch(commands, session, parallelism=8):
+    """
+    Run a batch of commands, with independent identities in parallel.
+
+    Commands are grouped by `command_identity`; each group runs sequentially in file order (so a REG still
+    precedes the UNREG of the same node) and up to `parallelism` groups run at the same time.
+
+    Returns:
+        list: (line number, command, latency in seconds, succeeded, outcome) tuples in file order.
+    """
+    groups = OrderedDict()
+    for line_no, parts in commands:
+        groups.setdefault(command_identity(parts), []).append((line_no, parts))
+
+    def run_group(group):
+        results = []
+        for line_no, parts in group:
+            command = parts[1] if len(parts) > 1 else "?"
+            start = time.perf_counter()
+            try:
+                outcome = execute_command(parts, session)
+                succeeded = not str(outcome).startswith("Error")
+            except Exception as e:
+                outcome, succeeded = str(e), False
+            results.append((line_no, command, time.perf_counter() - start, succeeded, outcome))
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, parallelism)) as executor:
+        results = [result for group in executor.map(run_group, groups.values()) for result in group]
+    return sorted(results, key=lambda result: result[0])
+
+
+def print_batch_report(results, elapsed):
+    """Print the latency of every command followed by a summary per command type."""
+    for line_no, command, latency, succeeded, outcome in results:
+        status = "ok" if succeeded else "FAILED"
+        print(f"{line_no:>6} {command:<6} {latency * 1000:10.2f} ms  {status:<6} {outcome}")
+
+    summaries = {}
+    failures = {}
+    for _, command, latency, succeeded, _ in results:
+        summaries.setdefault(command, StreamingSummary()).add(latency)
+        failures[command] = failures.get(command, 0) + (not succeeded)
+
+    print(f"\n{'command':<8}{'count':>7}{'failed':>8}{'avg ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for command, summary in sorted(summaries.items()):
+        s = summary.summary()
+        print(f"{command:<8}{s['count']:>7}{failures[command]:>8}{s['average'] * 1000:>10.2f}"
+              f"{s['p50'] * 1000:>10.2f}{s['p99'] * 1000:>10.2f}{s['max'] * 1000:>10.2f}")
+    throughput = len(results) / elapsed if elapsed > 0 else 0.0
+    print(f"\n{len(results)} commands in {elapsed:.2f} s ({throughput:.1f} commands/s), "
+          f"{sum(failures.values())} failed")
+
+
+def batch_main(source, parallelism):
+    bs_node = SimpleNode(ip=BOOTSTRAP_IP, port=BOOTSTRAP_PORT, name="BootstrapServer")
+    if source == "-":
+        commands = read_batch(sys.stdin)
+    else:
+        with open(source, "r") as f:
+            commands = read_batch(f)
+
+    session = CommandSession(bs_node)
+    start = time.perf_counter()
+    try:
+        results = run_batch(commands, session, parallelism)
+    finally:
+        session.close()
+    print_batch_report(results, time.perf_counter() - start)
+    return 0 if all(result[3] for result in results) else 1
+
+
+def interactive_main():
+    # Bootstrap server details
+    bs_node = SimpleNode(ip=BOOTSTRAP_IP, port=BOOTSTRAP_PORT, name="BootstrapServer")
+    session = CommandSession(bs_node)
+
+    try:
+        while True:
+            user_input = input("Enter command (e.g., 0036 REG 129.82.123.45 5001 1234abcd or exit): ").strip()
+            if user_input.lower() == "exit":
+                logging.info("Exiting...")
+                break
+
+            try:
+                # Parse and run the input command
+                logging.info(execute_command(shlex.split(user_input), session))
                 print('\n')
-            elif len(parts) == 6 and parts[1] == "SER":
-                _, _, ip, port, file_name, hops = parts
-                port = int(port)
-                hops = int(hops)
-
-                my_node = SimpleNode(ip=ip, port=port, name="MyNode")
-                response = BootstrapServerConnection(bs=bs_node, me=my_node).search_file(file_name=file_name.strip('"'),
-                                                                                         hops=hops)
-                logging.info(response)
+            except ValueError as e:
+                logging.warning(f"{e}\n")
                 print('\n')
-
-            else:
-                logging.warning("Invalid command format. Use: <length> REG/UNREG <IP_address> <port_no> <username>\n")
+            except Exception as e:
+                logging.error(e)
                 print('\n')
+    finally:
+        session.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send commands to the bootstrap server and peers.")
+    parser.add_argument("--batch", metavar="FILE", help="Run the commands in FILE ('-' for stdin) and exit.")
+    parser.add_argument("--parallelism", type=int, default=8,
+                        help="Number of independent identities handled at the same time in batch mode.")
+    args = parser.parse_args(argv)
+
+    # Set up logging configuration at the entry point
+    logging.basicConfig(level=logging.INFO, format='\n%(asctime)s - %(levelname)s - %(message)s\n')
 
-        except Exception as e:
-            logging.error(e)
-            print('\n')
+    if args.batch:
+        return batch_main(args.batch, args.parallelism)
+    interactive_main()
+    return 0
 
 
 def handle_unreg_response(response):
     try:
-        # Split the response into parts
-        parts = response.split()
-        if len(parts) != 3 or parts[1] != "UNROK":
+        message = codec.decode(response, strict=True)
+        if not isinstance(message, codec.UnrOk):
             raise ValueError("Invalid UNROK response format")
 
-        # Extract the value
-        value = int(parts[2])
+        value = message.value
         if value == 0:
             return "Unregistration successful."
         elif value == 9999:
@@ -118,11 +293,11 @@ def handle_unreg_response(response):
 
 def handle_join_response(response):
     try:
-        parts = response.split()
-        if len(parts) != 3 or parts[1] != "JOINOK":
+        message = codec.decode(response, strict=True)
+        if not isinstance(message, codec.JoinOk):
             raise ValueError("Invalid JOINOK response format")
 
-        value = int(parts[2])
+        value = message.value
         if value == 0:
             return "Join successful."
         elif value == 9999:
@@ -134,4 +309,4 @@ def handle_join_response(response):
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+Microbenchmarks for the per-message hot paths: framing, response parsing, the bootstrap server's request handling
+and the local file match of `search_file`.
+
+Only the standard library is used. Every benchmark reports:
+    ns/op      best of several timed repeats (time.perf_counter_ns), each long enough to be measurable
+    bytes/op   peak traced memory during one call (tracemalloc), i.e. the temporaries the call allocates
+    blocks/op  memory blocks still allocated per call when the results are kept (sys.getallocatedblocks)
+
+Example:
+    python microbenchmarks.py --save baseline.json
+    python microbenchmarks.py --compare baseline.json --threshold 0.25
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import sys
+import time
+import tracemalloc
+
+import main
+import network_node_manager
+from bootstrap_server import BootstrapServer
+from connections import codec
+from connections.bootstrap_server_connection import BootstrapServerConnection, parse_regok
+from peer_sampling import PeerSampler
+from ttypes import Node
+from utils.helpers import message_with_length
+
+CATALOG_SIZES = (10, 100, 1000, 10000)
+
+
+class FakeConnection:
+    """Stands in for the accepted socket handed to BootstrapServer.handle_client."""
+
+    __slots__ = ("data", "sent")
+
+    def __init__(self, data):
+        self.data = data
+        self.sent = None
+
+    def recv(self, size):
+        return self.data
+
+    def send(self, data):
+        self.sent = data
+
+    sendall = send
+
+    def close(self):
+        pass
+
+
+def time_per_op(func, min_time=0.05, repeat=5):
+    """Return the best time per call in nanoseconds."""
+    number = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter_ns() - start
+        if elapsed >= min_time * 1e9:
+            break
+        number *= 10
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter_ns() - start) / number)
+    return best
+
+
+def allocations_per_op(func, calls=1000):
+    """Return (peak bytes allocated during one call, blocks retained per call)."""
+    func()  # Warm up caches and interned strings
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+    results = [None] * calls
+    before = sys.getallocatedblocks()
+    for i in range(calls):
+        results[i] = func()
+    blocks = (sys.getallocatedblocks() - before) / calls
+    return peak, max(blocks, 0.0)
+
+
+def benchmark(name, func, min_time=0.05):
+    peak, blocks = allocations_per_op(func)
+    return {"name": name, "ns_per_op": time_per_op(func, min_time), "bytes_per_op": peak, "blocks_per_op": blocks}
+
+
+def build_benchmarks():
+    """
+    Return (name, callable) pairs for every hot path, plus a cleanup callable.
+
+    The bootstrap server and the connection are built once; nothing touches the network.
+    """
+    me = Node("127.0.0.1", 5001, "node1")
+    connection = BootstrapServerConnection(bs=Node("127.0.0.1", 5000, "BootstrapServer"), me=me)
+    server = BootstrapServer(ip="127.0.0.1", port=0)
+    sampler = PeerSampler(("127.0.0.1", 5001), send=lambda peer, message: None)
+    manager_node = network_node_manager.Node("node1", "127.0.0.1", 5001)
+
+    def handle_register_response():
+        manager_node.neighbors = []  # The handler appends to the node's neighbors
+        return manager_node.handle_register_response("REGOK 2 127.0.0.1 5002 127.0.0.1 5003")
+
+    regok = "0060 REGOK 2 127.0.0.1 5002 peer2 127.0.0.1 5003 peer3"
+    ser = "SER 127.0.0.1 5001 \"Lord of the Rings\" 3"
+    ser_message = codec.Ser("127.0.0.1", 5001, "Lord of the Rings", 3, {"trace": "4bf92f3577b34da6:00f067aa0ba902b7"})
+    serok_frame = codec.SerOk(2, "127.0.0.1", 5002, 1, ["Lord of the Rings", "Lord of War"]).encode()
+    dispatcher = codec.Dispatcher({"SER": lambda message: message.hops})
+    benchmarks = [
+        ("connection.message_with_length", lambda: connection.message_with_length(ser)),
+        ("helpers.message_with_length", lambda: message_with_length(ser)),
+        ("network_node_manager.format_message", lambda: manager_node.format_message(ser)),
+        ("peer_sampler.message_with_length", lambda: sampler.message_with_length(ser)),
+        ("parse_regok", lambda: parse_regok(regok)),
+        ("codec.encode SER", ser_message.encode),
+        ("codec.decode SER", lambda: codec.decode(ser_message.encode())),
+        ("codec.decode SEROK", lambda: codec.decode(serok_frame)),
+        ("codec.decode REGOK", lambda: codec.decode(regok)),
+        ("codec.dispatch SER", lambda: dispatcher.dispatch(codec.decode(ser))),
+        ("network_node_manager.handle_register_response", handle_register_response),
+        ("main.handle_unreg_response", lambda: main.handle_unreg_response("0012 UNROK 0")),
+        ("main.handle_join_response", lambda: main.handle_join_response("0013 JOINOK 0")),
+        ("bootstrap.handle_client UNREG",
+         lambda: server.handle_client(FakeConnection(b"0033 UNREG 127.0.0.1 5009 ghost"), ("127.0.0.1", 1))),
+        ("bootstrap.handle_client SER",
+         lambda: server.handle_client(FakeConnection(b"0036 SER 127.0.0.1 5001 \"Lord\" 0"), ("127.0.0.1", 1))),
+    ]
+
+    connections = [connection]
+    for size in CATALOG_SIZES:
+        catalog = Node("127.0.0.1", 5001, "node1")
+        catalog.file_list = [f"Catalog file {i:05d}" for i in range(size)]
+        searcher = BootstrapServerConnection(bs=Node("127.0.0.1", 5000, "BootstrapServer"), me=catalog)
+        searcher.me.max_hops = 0
+        connections.append(searcher)
+        benchmarks.append((f"search_file local match ({size} files)",
+                           lambda searcher=searcher, size=size: searcher.search_file(f"file {size - 1:05d}")))
+        benchmarks.append((f"search_file local miss ({size} files)",
+                           lambda searcher=searcher: searcher.search_file("missing")))
+
+    def cleanup():
+        for each in connections:
+            each.close()
+
+    return benchmarks, cleanup
+
+
+def run_suite(selected=None, min_time=0.05):
+    """
+    Run the benchmarks whose name contains one of `selected` (all by default).
+
+    Returns:
+        list: One result dict per benchmark.
+    """
+    benchmarks, cleanup = build_benchmarks()
+    results = []
+    # The handlers print and log every request; keep that out of the measurement
+    logging.disable(logging.CRITICAL)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for name, func in benchmarks:
+                if selected and not any(pattern in name for pattern in selected):
+                    continue
+                results.append(benchmark(name, func, min_time))
+    finally:
+        logging.disable(logging.NOTSET)
+        cleanup()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare with a saved run.
+
+    Returns:
+        list: (name, ratio of ns/op to the baseline) for the benchmarks slower than 1 + threshold.
+    """
+    previous = {result["name"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(result["name"])
+        if before and before["ns_per_op"] > 0:
+            ratio = result["ns_per_op"] / before["ns_per_op"]
+            result["change"] = ratio - 1
+            if ratio > 1 + threshold:
+                regressions.append((result["name"], ratio))
+    return regressions
+
+
+def print_results(results):
+    print(f"{'benchmark':<48}{'ns/op':>12}{'bytes/op':>10}{'blocks/op':>11}{'change':>9}")
+    for result in results:
+        change = f"{result['change']:+.0%}" if "change" in result else ""
+        print(f"{result['name']:<48}{result['ns_per_op']:>12.0f}{result['bytes_per_op']:>10}"
+              f"{result['blocks_per_op']:>11.1f}{change:>9}")
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the protocol hot paths.")
+    parser.add_argument("-k", action="append", dest="selected", help="Only run benchmarks containing this text.")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Minimum seconds per timed repeat.")
+    parser.add_argument("--save", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Baseline JSON file written by --save.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before failing.")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.selected, args.min_time)
+    regressions = []
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+    print_results(results)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    for name, ratio in regressions:
+        print(f"REGRESSION: {name} is {ratio:.2f}x slower than the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
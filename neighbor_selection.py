@@ -0,0 +1,103 @@
+import random
+
+
+class NeighborSelectionPolicy:
+    """
+    Base class for the strategies the bootstrap server uses to pick neighbors for a newly registered node.
+
+    Subclasses implement `select`, which receives the candidate nodes (every registered node except the one
+    registering) and returns at most `count` of them.
+    """
+
+    name = None
+    uses_latency = False  # Whether the bootstrap server should measure the round-trip time of registering nodes
+
+    def select(self, candidates, count, degrees, latencies):
+        """
+        Pick neighbors for a registering node.
+
+        Args:
+            candidates (list): Registered nodes that may become neighbors.
+            count (int): Maximum number of neighbors to return.
+            degrees (dict): Current overlay degree keyed by (ip, port).
+            latencies (dict): Smoothed round-trip time in seconds keyed by (ip, port).
+
+        Returns:
+            list: The selected nodes.
+        """
+        raise NotImplementedError
+
+
+class RandomPolicy(NeighborSelectionPolicy):
+    """Uniformly random neighbors, the same strategy `network_node_manager.Network` uses."""
+
+    name = "random"
+
+    def select(self, candidates, count, degrees, latencies):
+        return random.sample(candidates, min(count, len(candidates)))
+
+
+class LeastDegreePolicy(NeighborSelectionPolicy):
+    """Prefer the nodes with the fewest neighbors so the overlay stays close to regular."""
+
+    name = "least_degree"
+
+    def select(self, candidates, count, degrees, latencies):
+        # Shuffle first so ties are broken randomly instead of by registration order
+        shuffled = random.sample(candidates, len(candidates))
+        shuffled.sort(key=lambda n: degrees.get((n.ip, n.port), 0))
+        return shuffled[:count]
+
+
+class LatencyAwarePolicy(NeighborSelectionPolicy):
+    """
+    Prefer nodes with a low measured round-trip time, penalised by their current degree.
+
+    The bootstrap server probes every node when it registers (and on each heartbeat, if running). Nodes that have
+    not been probed yet are scored with `default_latency`. The degree penalty keeps the
+    fastest nodes from turning into hubs.
+    """
+
+    name = "latency"
+    uses_latency = True
+
+    def __init__(self, degree_weight=0.005, default_latency=0.05):
+        self.degree_weight = degree_weight
+        self.default_latency = default_latency
+
+    def score(self, node, degrees, latencies):
+        key = (node.ip, node.port)
+        return latencies.get(key, self.default_latency) + self.degree_weight * degrees.get(key, 0)
+
+    def select(self, candidates, count, degrees, latencies):
+        shuffled = random.sample(candidates, len(candidates))
+        shuffled.sort(key=lambda n: self.score(n, degrees, latencies))
+        return shuffled[:count]
+
+
+POLICIES = {
+    RandomPolicy.name: RandomPolicy,
+    LeastDegreePolicy.name: LeastDegreePolicy,
+    LatencyAwarePolicy.name: LatencyAwarePolicy,
+}
+
+
+def get_policy(policy):
+    """
+    Resolve a neighbor selection policy.
+
+    Args:
+        policy (str | NeighborSelectionPolicy): A policy instance or one of the names in `POLICIES`.
+
+    Returns:
+        NeighborSelectionPolicy: The policy instance.
+
+    Raises:
+        ValueError: If the name does not match a known policy.
+    """
+    if isinstance(policy, NeighborSelectionPolicy):
+        return policy
+    try:
+        return POLICIES[policy]()
+    except KeyError:
+        raise ValueError(f"Unknown neighbor selection policy '{policy}'. Choose one of: {', '.join(POLICIES)}")
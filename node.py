@@ -4,8 +4,15 @@ import logging
 import random
 
 from config.config import BUFFER_SIZE
+from connections import codec
 from connections.bootstrap_server_connection import BootstrapServerConnection
+from peer_sampling import PeerSampler
 from ttypes import Node as SimpleNode  # Import the simple Node class for the bootstrap server
+from utils import metrics
+
+QUERIES = metrics.REGISTRY.counter("node_queries", "Search queries received by nodes")
+LOCAL_HITS = metrics.REGISTRY.counter("node_query_local_hits", "Queries answered from the node's own files")
+FORWARDS = metrics.REGISTRY.counter("node_query_forwards", "Search queries forwarded to neighbors")
 
 
 class Node:
@@ -16,6 +23,7 @@ class Node:
         self.bs_ip = bs_ip
         self.bs_port = bs_port
         self.routing_table = []  # Initialize the routing table as an empty list
+        self.max_hops = 3  # Hops a SER is forwarded before giving up
 
         # Ensure sampling does not exceed the size of the file_list
         if not file_list:
@@ -28,11 +36,20 @@ class Node:
         self.sock.bind((self.ip, self.port))
         self.running = False  # Flag to control the thread
         self.thread = None  # Store the thread object
+        self.peer_sampler = PeerSampler((self.ip, self.port), self.send_datagram, on_change=self.update_routing_table)
+        self.dispatcher = codec.Dispatcher({
+            "QUERY": self.handle_query,
+            "FOUND": lambda found, addr: logging.info(f"{found.sender} at {addr} has {found.file_name}"),
+            "SHUFFLE": lambda message, addr: self.peer_sampler.handle_shuffle(message),
+            "SHUFFLEOK": lambda message, addr: self.peer_sampler.handle_shuffle_reply(message),
+        })
 
     def start(self):
         self.running = True
+        self.sock.settimeout(1.0)  # Wake up periodically so stop() can end the listener
         self.thread = threading.Thread(target=self.listen)
         self.thread.start()
+        self.peer_sampler.start()
         logging.info(f"Thread started: {self.thread.is_alive()}")
 
     def register(self):
@@ -40,6 +57,14 @@ class Node:
         bs_node = SimpleNode(self.bs_ip, self.bs_port, "BootstrapServer")
         with BootstrapServerConnection(bs_node, self) as conn:
             self.peers = conn.users
+        self.peer_sampler.add_peers([(peer.ip, peer.port) for peer in self.peers])
+
+    def send_datagram(self, peer, message):
+        self.sock.sendto(message.encode(), peer)
+
+    def update_routing_table(self, peers):
+        """Keep the routing table in line with the peer sampling view."""
+        self.routing_table = peers
 
     def search_file(self, file_name):
         # Flood search to peers
@@ -66,10 +91,11 @@ class Node:
         """
         Sends a query message to all peers to search for the specified file.
         """
-        query = f"QUERY:{file_name}:{self.name}"
+        query = codec.Query(file_name, self.name).encode()
         for peer in self.peers:
             try:
                 self.sock.sendto(query.encode(), peer)
+                FORWARDS.inc()
                 logging.info(f"Query sent to {peer}: {query}")
             except Exception as e:
                 logging.error(f"Failed to send query to {peer}: {e}")
@@ -79,24 +105,25 @@ class Node:
         Handles incoming messages from peers.
         """
         logging.info(f"Received message from {addr}: {message}")
-        if message.startswith("QUERY:"):
-            parts = message.split(":")
-            if len(parts) != 3:
-                logging.warning(f"Malformed QUERY message from {addr}: {message}")
-                return
-            _, file_name, sender_name = parts
-            if file_name in self.file_list:
-                response = f"FOUND:{file_name}:{self.name}"
-                try:
-                    self.sock.sendto(response.encode(), addr)
-                    logging.info(f"Response sent to {addr}: {response}")
-                except Exception as e:
-                    logging.error(f"Failed to send response to {addr}: {e}")
-        else:
-            logging.warning(f"Unknown message format: {message}")
+        try:
+            self.dispatcher.dispatch(codec.decode(message), addr)
+        except codec.ProtocolError as e:
+            logging.warning(f"Unknown message format from {addr}: {message} ({e})")
+
+    def handle_query(self, query, addr):
+        QUERIES.inc()
+        if query.file_name in self.file_list:
+            LOCAL_HITS.inc()
+            response = codec.Found(query.file_name, self.name).encode()
+            try:
+                self.sock.sendto(response.encode(), addr)
+                logging.info(f"Response sent to {addr}: {response}")
+            except Exception as e:
+                logging.error(f"Failed to send response to {addr}: {e}")
 
     def stop(self):
         self.running = False
+        self.peer_sampler.stop()
         if self.thread:
             self.thread.join()  # Wait for the thread to finish
             logging.info(f"Thread stopped: {not self.thread.is_alive()}")
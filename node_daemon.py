@@ -0,0 +1,505 @@
+"""
+Long-running node daemon.
+
+Runs one `node.Node` (UDP listener and peer sampling) together with a TCP listener on the same port that answers
+the SER / JOIN / LEAVE / PING messages other nodes send, and a local control socket through which clients issue
+commands to the warm process:
+
+    REG                     Register with the bootstrap server and JOIN the neighbors it returns
+    UNREG                   Unregister from the bootstrap server
+    JOIN <ip> <port>        Join a node and add it to the routing table
+    SER <file name> [hops]  Search the network for a file
+    SERALL <file name> [hops] [target]
+                            Collect every holder of a file that answers within SEARCH_AGGREGATION_DEADLINE
+    LEAVE                   Tell the neighbors and the bootstrap server that this node leaves
+    DOWNLOAD <url> [name]   Download a file from another node's API into the download cache
+    STATS                   Report the node's files, routing table and counters
+    SHUTDOWN                Stop the daemon
+
+The control protocol is line based: one command per line, one JSON reply per line ({"ok": true, "result": ...}
+or {"ok": false, "error": "..."}). A client may send any number of commands over one connection.
+
+Example:
+    python node_daemon.py run --ip 127.0.0.1 --port 5001 --name node1
+    python node_daemon.py ctl --control 127.0.0.1:6001 REG "SER Lord 0" STATS
+"""
+import argparse
+import json
+import logging
+import os
+import shlex
+import socket
+import socketserver
+import threading
+import time
+from collections import Counter
+
+from config.config import (BOOTSTRAP_SERVERS, BUFFER_SIZE, DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_QUOTA,
+                           NODE_CONTROL_PORT_OFFSET, NODE_FILE_NAMES_PATH, NODE_STORAGE_QUOTA,
+                           ROUTING_MAINTENANCE_INTERVAL, SEARCH_AGGREGATION_DEADLINE, SEARCH_AGGREGATION_TARGET)
+from connections import codec
+from connections.bootstrap_server_connection import BootstrapServerConnection
+from download_cache import DownloadCache
+from node import Node
+from search_aggregation import parse_aggregate
+from search_deadline import SearchDeadline
+from ttypes import Node as SimpleNode
+from utils import metrics
+from utils.file_reader import read_file_names
+
+PEER_REQUESTS = metrics.REGISTRY.counter("node_peer_requests", "Messages received from other nodes", ["command"])
+CONTROL_COMMANDS = metrics.REGISTRY.counter("node_control_commands", "Commands received on the control socket",
+                                            ["command"])
+
+QSTAT_QUERY_LIMIT = 20  # Most searched names reported per QSTAT
+
+
+def parse_control_address(text):
+    """
+    Parse a control socket address: "unix:/path/to/socket" or "host:port".
+
+    Returns:
+        str or tuple: A Unix socket path or a (host, port) tuple.
+    """
+    if text.startswith("unix:"):
+        return text[len("unix:"):]
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+class ControlServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class UnixControlServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:
+    UnixControlServer = None
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    """Runs the commands of one control connection, one line at a time."""
+
+    def handle(self):
+        for line in self.rfile:
+            line = line.decode().strip()
+            if not line:
+                continue
+            reply = self.server.node_daemon.execute(line)
+            self.wfile.write((json.dumps(reply) + "\n").encode())
+            self.wfile.flush()
+
+
+class NodeDaemon:
+    def __init__(self, ip, port, name, file_list, bootstrap_servers=None, control_address=None,
+                 storage_quota=NODE_STORAGE_QUOTA, cache_dir=None, cache_quota=DOWNLOAD_CACHE_QUOTA,
+                 maintenance_interval=ROUTING_MAINTENANCE_INTERVAL):
+        """
+        Args:
+            ip (str): Address the node listens on (UDP and TCP).
+            port (int): Port the node listens on; 0 picks a free one.
+            name (str): Name registered with the bootstrap server.
+            file_list (list): Candidate file names; the node keeps a random sample, as `node.Node` does.
+            bootstrap_servers (list): (ip, port) of the bootstrap servers. Defaults to BOOTSTRAP_SERVERS.
+            control_address (str or tuple): Unix socket path or (host, port) of the control socket. Defaults to
+                127.0.0.1 at the node port plus NODE_CONTROL_PORT_OFFSET.
+            storage_quota (int): Files the node holds at most; REPLICATE requests beyond it are refused.
+            cache_dir (str): Directory keeping the files this node downloads (DOWNLOAD); they are searchable while
+                cached. None disables the cache.
+            cache_quota (int): Bytes the download cache may hold.
+            maintenance_interval (float): Seconds between pings that drop unreachable neighbors.
+        """
+        bootstrap_servers = [SimpleNode(bs_ip, bs_port, "BootstrapServer")
+                             for bs_ip, bs_port in (bootstrap_servers or BOOTSTRAP_SERVERS)]
+        # Bind TCP first: with port 0 the free port is picked here and the UDP socket takes the same number
+        self.peer_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.peer_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            self.peer_socket.bind((ip, port))
+            self.node = Node(ip=ip, port=self.peer_socket.getsockname()[1], name=name, file_list=file_list,
+                             peers=[], bs_ip=bootstrap_servers[0].ip, bs_port=bootstrap_servers[0].port)
+        except OSError:
+            self.peer_socket.close()
+            raise
+        self.connection = BootstrapServerConnection(bs=bootstrap_servers, me=self.node,
+                                                    maintenance_interval=maintenance_interval)
+        if control_address is None:
+            control_address = ("127.0.0.1", self.node.port + NODE_CONTROL_PORT_OFFSET)
+        self.control_address = control_address
+        self.storage_quota = storage_quota
+        self.cache_only = set()  # Names advertised only because they are in the download cache
+        self.files_lock = threading.Lock()  # Serializes changes of the file list (peer and control threads)
+        self.cache = None
+        if cache_dir is not None:
+            self.cache = DownloadCache(cache_dir, cache_quota, on_add=self.advertise_cached,
+                                       on_evict=self.withdraw_cached)
+            for cached in self.cache.names():
+                self.advertise_cached(cached)
+        self.control_server = None
+        self.running = False
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self.started_at = None
+        self.routing_lock = threading.Lock()
+        self.commands = Counter()
+        self.peer_requests = Counter()
+        self.peer_dispatcher = codec.Dispatcher({
+            "PING": self.handle_ping,
+            "SER": self.handle_ser,
+            "JOIN": self.handle_join,
+            "LEAVE": self.handle_leave,
+            "QSTAT": self.handle_qstat,
+            "REPLICATE": self.handle_replicate,
+            "DROP": self.handle_drop,
+        }, default=lambda message: codec.Error("unknown_command").encode())
+        self.handlers = {
+            "REG": self.register,
+            "UNREG": self.unregister,
+            "JOIN": self.join,
+            "SER": self.search,
+            "SERALL": self.search_all,
+            "LEAVE": self.leave,
+            "STATS": self.stats,
+            "DOWNLOAD": self.download,
+            "SHUTDOWN": self.shutdown,
+        }
+
+    def start(self):
+        """Start the node, the peer listener and the control socket; returns once they accept connections."""
+        self.running = True
+        self.started_at = time.monotonic()
+        self.node.start()
+
+        self.peer_socket.listen()
+        self.peer_socket.settimeout(0.5)  # Wake up periodically so stop() can end the loop
+        threading.Thread(target=self.serve_peers, args=(self.peer_socket,), daemon=True).start()
+
+        if isinstance(self.control_address, str):
+            if UnixControlServer is None:
+                raise ValueError("Unix control sockets are not supported on this platform")
+            if os.path.exists(self.control_address):
+                os.unlink(self.control_address)
+            self.control_server = UnixControlServer(self.control_address, ControlHandler)
+        else:
+            self.control_server = ControlServer(self.control_address, ControlHandler)
+            self.control_address = self.control_server.server_address
+        self.control_server.node_daemon = self
+        threading.Thread(target=self.control_server.serve_forever, daemon=True).start()
+        self.ready.set()
+        logging.info(f"Node {self.node.name} listening on {self.node.ip}:{self.node.port}, "
+                     f"control socket {self.control_address}")
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        if self.control_server is not None:
+            self.control_server.shutdown()
+            self.control_server.server_close()
+            if isinstance(self.control_address, str) and os.path.exists(self.control_address):
+                os.unlink(self.control_address)
+        self.connection.close()
+        self.node.stop()
+        self.stopped.set()
+
+    def wait(self):
+        """Block until the daemon is stopped (by SHUTDOWN or `stop`)."""
+        while not self.stopped.wait(1.0):
+            pass
+
+    # Peer traffic
+
+    def serve_peers(self, peer_socket):
+        with peer_socket:
+            while self.running:
+                try:
+                    conn, addr = peer_socket.accept()
+                except socket.timeout:
+                    continue
+                threading.Thread(target=self.handle_peer, args=(conn, addr), daemon=True).start()
+
+    def handle_peer(self, conn, addr):
+        """Answer one message from another node on the connection it arrived on."""
+        with conn:
+            try:
+                data = conn.recv(BUFFER_SIZE).decode()
+                conn.sendall(self.handle_peer_message(data).encode())
+            except Exception as e:
+                logging.error(f"Error handling message from {addr}: {e}")
+
+    def handle_peer_message(self, data):
+        """
+        Handle a message sent by another node.
+
+        Args:
+            data (str): The received frame (the length prefix is optional).
+
+        Returns:
+            str: The response to send back.
+        """
+        try:
+            message = codec.decode(data)
+        except codec.ProtocolError:
+            message = None
+        command = message.command if message is not None else "invalid"
+        self.peer_requests[command] += 1
+        PEER_REQUESTS.labels(command).inc()
+        if message is None:
+            return codec.Error("malformed").encode()
+        return self.peer_dispatcher.dispatch(message)
+
+    def handle_ping(self, message):
+        return "PONG"
+
+    def handle_ser(self, message):
+        return self.connection.search_file(message.file_name, hops=message.hops, trace_context=message.trace_context,
+                                           aggregate=parse_aggregate(message.fields),
+                                           deadline=SearchDeadline.from_fields(message.fields))
+
+    def handle_join(self, message):
+        self.add_neighbor((message.ip, message.port))
+        return codec.JoinOk(0).encode()
+
+    def handle_leave(self, message):
+        with self.routing_lock:
+            self.connection.update_routing_table_on_leave((message.ip, message.port))
+        return codec.LeaveOk(0).encode()
+
+    def handle_qstat(self, message):
+        """Report the searches started here since the previous QSTAT, and the files held."""
+        reply = codec.QStatOk(self.connection.queries.drain(QSTAT_QUERY_LIMIT), sorted(self.node.file_list))
+        while reply.counts and len(reply.encode()) > BUFFER_SIZE:
+            reply.counts.popitem()  # Least searched last
+        return reply.encode()
+
+    def handle_replicate(self, message):
+        with self.files_lock:
+            files = self.node.file_list
+            if message.file_name in files:
+                self.cache_only.discard(message.file_name)  # Now held as a replica, kept when evicted from the cache
+                return codec.ReplicateOk(0).encode()
+            if len(files - self.cache_only) >= self.storage_quota:  # Cached downloads do not use the quota
+                return codec.ReplicateOk(9998).encode()
+            self.set_files(files | {message.file_name})
+        return codec.ReplicateOk(0).encode()
+
+    def handle_drop(self, message):
+        with self.files_lock:
+            files = self.node.file_list
+            if message.file_name not in files:
+                return codec.DropOk(9999).encode()
+            self.set_files(files - {message.file_name})
+        return codec.DropOk(0).encode()
+
+    def advertise_cached(self, name):
+        with self.files_lock:
+            if name not in self.node.file_list:
+                self.cache_only.add(name)
+                self.set_files(self.node.file_list | {name})
+
+    def withdraw_cached(self, name):
+        with self.files_lock:
+            if name in self.cache_only:
+                self.cache_only.discard(name)
+                self.set_files(self.node.file_list - {name})
+
+    def set_files(self, files):
+        """
+        Replace the file list, never change it in place: searches iterate it without a lock. Callers changing the
+        list hold `files_lock`, so concurrent updates cannot lose one another.
+        """
+        self.node.file_list = files
+        self.connection.file_index.sync(files)  # Update the search index now rather than on the next search
+
+    def add_neighbor(self, peer):
+        with self.routing_lock:
+            if peer not in self.node.routing_table:
+                self.node.routing_table.append(peer)
+        self.node.peer_sampler.add_peers([peer])
+
+    # Control commands
+
+    def execute(self, line):
+        """
+        Run one control command.
+
+        Returns:
+            dict: {"ok": True, "result": ...} or {"ok": False, "error": "..."}
+        """
+        try:
+            toks = shlex.split(line)
+        except ValueError as e:
+            return {"ok": False, "error": f"Malformed command: {e}"}
+        command = toks[0].upper()
+        handler = self.handlers.get(command)
+        if handler is None:
+            return {"ok": False, "error": f"Unknown command {toks[0]}"}
+        self.commands[command] += 1
+        CONTROL_COMMANDS.labels(command).inc()
+        try:
+            return {"ok": True, "result": handler(*toks[1:])}
+        except Exception as e:
+            logging.error(f"{command} failed: {e}")
+            return {"ok": False, "error": str(e)}
+
+    def register(self):
+        neighbors = self.connection.connect_to_bs()
+        self.node.peers = neighbors
+        joined = {}
+        for neighbor in neighbors:
+            self.add_neighbor((neighbor.ip, int(neighbor.port)))
+            joined[f"{neighbor.ip}:{neighbor.port}"] = self.connection.send_join_request(neighbor)
+        return {"neighbors": [[n.ip, int(n.port), n.name] for n in neighbors], "joined": joined}
+
+    def unregister(self):
+        return {"response": self.connection.unreg_from_bs()}
+
+    def join(self, ip, port):
+        target = SimpleNode(ip, int(port), "TargetNode")
+        response = self.connection.send_join_request(target)
+        try:
+            joined = codec.decode(response) == codec.JoinOk(0)
+        except codec.ProtocolError:
+            joined = False
+        if joined:
+            self.add_neighbor((ip, int(port)))
+        return {"response": response}
+
+    def search(self, file_name, hops="0"):
+        start = time.perf_counter()
+        response = self.connection.search_file(file_name, hops=int(hops))
+        return {"response": response, "hit": self.connection.is_search_hit(response),
+                "seconds": time.perf_counter() - start}
+
+    def search_all(self, file_name, hops="0", target=str(SEARCH_AGGREGATION_TARGET)):
+        start = time.perf_counter()
+        response = self.connection.search_file(file_name, hops=int(hops),
+                                               aggregate=(int(target), SEARCH_AGGREGATION_DEADLINE))
+        results = [{"ip": ip, "port": port, "hops": hops, "rtt": rtt, "file": name}
+                   for ip, port, hops, rtt, name in codec.decode(response).entries]
+        return {"results": results, "seconds": time.perf_counter() - start}
+
+    def download(self, url, name=None):
+        """Download a file from another node's API into the download cache, which makes it searchable here."""
+        if self.cache is None:
+            raise ValueError("The download cache is disabled")
+        start = time.perf_counter()
+        path = self.cache.fetch(url, name)
+        return {"path": path, "cached": path is not None, "seconds": time.perf_counter() - start}
+
+    def leave(self):
+        responses = {}
+        with self.routing_lock:
+            neighbors = list(self.node.routing_table)
+        for ip, port in neighbors:
+            responses[f"{ip}:{port}"] = self.connection.send_leave_message(SimpleNode(ip, port, "Neighbor"))
+        responses["bootstrap"] = self.connection.leave_network()
+        with self.routing_lock:
+            self.node.routing_table = []
+        return {"responses": responses}
+
+    def stats(self):
+        return {
+            "name": self.node.name,
+            "address": [self.node.ip, self.node.port],
+            "files": sorted(self.node.file_list),
+            "routing_table": [list(peer) for peer in self.node.routing_table],
+            "peer_view": [list(peer) for peer in self.node.peer_sampler.peers()],
+            "uptime_seconds": time.monotonic() - self.started_at if self.started_at else 0.0,
+            "commands": dict(self.commands),
+            "peer_requests": dict(self.peer_requests),
+            "search_index": self.connection.file_index.stats(),
+            "cache": {"files": self.cache.names(), "bytes": self.cache.size, "quota": self.cache.quota}
+            if self.cache is not None else None,
+        }
+
+    def shutdown(self):
+        # Reply first; stopping joins the control server, which is serving this very request
+        threading.Thread(target=self.stop, daemon=True).start()
+        return {"stopping": True}
+
+
+class ControlClient:
+    """Client of a node daemon's control socket; keeps one connection open for any number of commands."""
+
+    def __init__(self, address, timeout=30):
+        if isinstance(address, str):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(address)
+        self.reader = self.sock.makefile("rb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def request(self, command):
+        """Send one command and return the decoded reply."""
+        self.sock.sendall((command.strip() + "\n").encode())
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Control socket closed")
+        return json.loads(line)
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a node daemon or send it commands.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    run = subparsers.add_parser("run", help="Run the daemon.")
+    run.add_argument("--ip", default="127.0.0.1")
+    run.add_argument("--port", type=int, required=True)
+    run.add_argument("--name", required=True)
+    run.add_argument("--files", default=NODE_FILE_NAMES_PATH, help="File with one candidate file name per line.")
+    run.add_argument("--bootstrap", action="append", default=[], metavar="IP:PORT",
+                     help="Bootstrap server (repeatable). Defaults to BOOTSTRAP_SERVERS.")
+    run.add_argument("--control", help="Control socket: unix:/path or host:port.")
+    run.add_argument("--register", action="store_true", help="Register with the bootstrap server on start.")
+    run.add_argument("--metrics-port", type=int, default=0, help="Port of a Prometheus /metrics listener.")
+    run.add_argument("--cache-dir", default=DOWNLOAD_CACHE_DIR, help="Download cache directory ('' disables it).")
+    run.add_argument("--cache-quota", type=int, default=DOWNLOAD_CACHE_QUOTA, help="Download cache size in bytes.")
+
+    ctl = subparsers.add_parser("ctl", help="Send commands to a running daemon.")
+    ctl.add_argument("--control", required=True, help="Control socket: unix:/path or host:port.")
+    ctl.add_argument("commands", nargs="+", help="Commands, e.g. REG \"SER Lord 0\" STATS")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.mode == "ctl":
+        failed = False
+        with ControlClient(parse_control_address(args.control)) as client:
+            for command in args.commands:
+                reply = client.request(command)
+                failed = failed or not reply["ok"]
+                print(json.dumps(reply, indent=2))
+        return 1 if failed else 0
+
+    servers = [(bs.rsplit(":", 1)[0], int(bs.rsplit(":", 1)[1])) for bs in args.bootstrap] or None
+    control = parse_control_address(args.control) if args.control else None
+    daemon = NodeDaemon(args.ip, args.port, args.name, read_file_names(args.files), servers, control,
+                        cache_dir=args.cache_dir or None, cache_quota=args.cache_quota)
+    daemon.start()
+    if args.metrics_port:
+        metrics.start_http_server(args.metrics_port)
+    if args.register:
+        print(json.dumps(daemon.execute("REG")))
+    try:
+        daemon.wait()
+    except KeyboardInterrupt:
+        daemon.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,319 @@
+"""
+Multi-tenant node host.
+
+Runs hundreds of virtual nodes in one process on a single asyncio event loop. Every virtual node listens on its
+own TCP port and has its own routing table and file list, and speaks the same SER / JOIN / LEAVE / PING protocol as
+`node_daemon.py`, so hosted nodes and daemons can be mixed in one overlay. Everything that does not have to be per
+node is shared: the file catalog (a node stores indices into it), the routing table maintenance timer, the event
+loop and the metrics registry.
+
+Example:
+    python node_host.py --nodes 1000 --base-port 7000 --degree 3
+"""
+import argparse
+import asyncio
+import functools
+import logging
+import random
+import tracemalloc
+
+from config.config import BOOTSTRAP_IP, BOOTSTRAP_PORT, BUFFER_SIZE, NODE_FILE_NAMES_PATH
+from connections import codec
+from connections.codec import frame, is_search_hit
+from search_deadline import SearchDeadline, drop_if_expired
+from utils import metrics
+from utils.file_reader import read_file_names
+
+QUERIES = metrics.REGISTRY.counter("node_queries", "Search queries received by nodes")
+LOCAL_HITS = metrics.REGISTRY.counter("node_query_local_hits", "Queries answered from the node's own files")
+FORWARDS = metrics.REGISTRY.counter("node_query_forwards", "Search queries forwarded to neighbors")
+HOSTED_NODES = metrics.REGISTRY.gauge("host_nodes", "Virtual nodes running in this process")
+
+
+async def read_frame(reader):
+    """Read one length-prefixed message and return it without the prefix."""
+    prefix = await reader.readexactly(4)
+    if not prefix.isdigit():
+        raise ValueError(f"Invalid length prefix {prefix!r}")
+    return (await reader.readexactly(int(prefix) - 4)).decode().strip()
+
+
+class VirtualNode:
+    """Per-node state; everything else lives in the NodeHost."""
+
+    __slots__ = ("ip", "port", "name", "file_ids", "routing_table", "server")
+
+    def __init__(self, ip, port, name, file_ids):
+        self.ip = ip
+        self.port = port
+        self.name = name
+        self.file_ids = file_ids  # Tuple of indices into the host's catalog
+        self.routing_table = []  # (ip, port) of the neighbors
+        self.server = None
+
+    def files(self, catalog):
+        return [catalog[i] for i in self.file_ids]
+
+
+class NodeHost:
+    def __init__(self, ip="127.0.0.1", catalog=(), max_hops=3, maintenance_interval=30, request_timeout=5.0):
+        """
+        Args:
+            ip (str): Address all virtual nodes listen on.
+            catalog (list): File names the nodes' files are drawn from.
+            max_hops (int): Hops a SER is forwarded before giving up.
+            maintenance_interval (float): Seconds between routing table clean-ups (one timer for all nodes).
+            request_timeout (float): Seconds to wait for another node's answer.
+        """
+        self.ip = ip
+        self.catalog = tuple(catalog)
+        self.catalog_lower = tuple(name.lower() for name in self.catalog)
+        self.max_hops = max_hops
+        self.maintenance_interval = maintenance_interval
+        self.request_timeout = request_timeout
+        self.nodes = {}  # port -> VirtualNode
+        self.dispatcher = codec.Dispatcher({
+            "PING": self.handle_ping,
+            "SER": self.handle_ser,
+            "JOIN": self.handle_join,
+            "LEAVE": self.handle_leave,
+        }, default=self.handle_unknown)
+        self.maintenance_task = None
+        self.memory_baseline = None
+
+    async def start(self):
+        if tracemalloc.is_tracing():
+            self.memory_baseline = tracemalloc.get_traced_memory()[0]
+        self.maintenance_task = asyncio.ensure_future(self.maintain())
+
+    async def stop(self):
+        if self.maintenance_task is not None:
+            self.maintenance_task.cancel()
+        for node in list(self.nodes.values()):
+            node.server.close()
+            await node.server.wait_closed()
+        self.nodes.clear()
+
+    async def add_node(self, port, name, file_ids=None, file_count=None):
+        """
+        Start a virtual node.
+
+        Args:
+            port (int): Port to listen on; 0 picks a free one.
+            name (str): Node name.
+            file_ids (tuple): Indices of the node's files in the catalog. By default 3 to 5 random ones are
+                picked, like `node.Node` samples its files.
+
+        Returns:
+            VirtualNode: The running node.
+        """
+        if file_ids is None and self.catalog:
+            count = file_count or min(len(self.catalog), random.randint(3, 5))
+            file_ids = tuple(random.sample(range(len(self.catalog)), count))
+        node = VirtualNode(self.ip, port, name, tuple(file_ids or ()))
+        node.server = await asyncio.start_server(functools.partial(self.handle_connection, node), self.ip, port)
+        node.port = node.server.sockets[0].getsockname()[1]
+        self.nodes[node.port] = node
+        return node
+
+    async def remove_node(self, port):
+        node = self.nodes.pop(port)
+        node.server.close()
+        await node.server.wait_closed()
+
+    def wire(self, degree, rng=random):
+        """Connect every hosted node to `degree` random other hosted nodes (links are symmetric)."""
+        nodes = list(self.nodes.values())
+        for node in nodes:
+            others = [other for other in nodes if other is not node]
+            for other in rng.sample(others, min(degree, len(others))):
+                for a, b in ((node, other), (other, node)):
+                    if (b.ip, b.port) not in a.routing_table:
+                        a.routing_table.append((b.ip, b.port))
+
+    # Wire protocol
+
+    async def handle_connection(self, node, reader, writer):
+        try:
+            message = await read_frame(reader)
+            response = await self.handle_message(node, message)
+            writer.write(response.encode())
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            logging.debug(f"Dropped connection to {node.name}: {e}")
+        finally:
+            writer.close()
+
+    async def handle_message(self, node, message):
+        try:
+            decoded = codec.decode(message)
+        except codec.ProtocolError:
+            return codec.Error("unknown_command").encode()
+        return await self.dispatcher.dispatch(decoded, node)
+
+    async def handle_ping(self, message, node):
+        return "PONG"
+
+    async def handle_ser(self, message, node):
+        deadline = SearchDeadline.from_fields(message.fields)
+        if drop_if_expired(deadline, "received"):
+            return codec.SerOk(0, node.ip, node.port, message.hops + 1).encode()
+        return await self.search(node, message.file_name, message.hops, message.fields, deadline)
+
+    async def handle_join(self, message, node):
+        peer = (message.ip, message.port)
+        if peer not in node.routing_table:
+            node.routing_table.append(peer)
+        return codec.JoinOk(0).encode()
+
+    async def handle_leave(self, message, node):
+        departing = (message.ip, message.port)
+        node.routing_table = [peer for peer in node.routing_table if peer != departing]
+        return codec.LeaveOk(0).encode()
+
+    async def handle_unknown(self, message, node):
+        return codec.Error("unknown_command").encode()
+
+    async def search(self, node, file_name, hops=0, fields=None, deadline=None):
+        """
+        Search `node`'s files, then forward the SER to its neighbors one after the other until one has the file.
+        With a `deadline`, forwarding stops when it passes and each neighbor receives the time left.
+
+        Returns:
+            str: The length-prefixed SEROK response.
+        """
+        QUERIES.inc()
+        needle = file_name.lower()
+        matches = [self.catalog[i] for i in node.file_ids if needle in self.catalog_lower[i]]
+        if matches:
+            LOCAL_HITS.inc()
+            return codec.SerOk(len(matches), node.ip, node.port, hops + 1, matches, fields).encode()
+
+        if hops < self.max_hops:
+            message = codec.Ser(node.ip, node.port, file_name, hops + 1, fields).body()
+            for ip, port in list(node.routing_table):
+                if drop_if_expired(deadline, "forward"):
+                    break
+                timeout = None
+                if deadline is not None:
+                    message = codec.Ser(node.ip, node.port, file_name, hops + 1,
+                                        deadline.forwarded_fields(fields)).body()
+                    timeout = deadline.timeout(self.request_timeout)
+                FORWARDS.inc()
+                response = await self.request(ip, port, message, timeout)
+                if is_search_hit(response):
+                    return response
+        return codec.SerOk(0, node.ip, node.port, hops + 1, fields=fields).encode()
+
+    async def request(self, ip, port, message, timeout=None):
+        """Send one message to a node and return its answer (an "Error ..." string if it cannot be reached)."""
+        timeout = self.request_timeout if timeout is None else timeout
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            return f"Error while sending message: {e}"
+        try:
+            writer.write(frame(message).encode())
+            await writer.drain()
+            return (await asyncio.wait_for(reader.read(BUFFER_SIZE), timeout)).decode()
+        except (OSError, asyncio.TimeoutError) as e:
+            return f"Error while sending message: {e}"
+        finally:
+            writer.close()
+
+    async def register(self, node, bs_ip=BOOTSTRAP_IP, bs_port=BOOTSTRAP_PORT):
+        """Register `node` with the bootstrap server and JOIN the neighbors it returns."""
+        response = await self.request(bs_ip, bs_port, codec.Reg(node.ip, node.port, node.name).body())
+        try:
+            reply = codec.decode(response, strict=True)
+        except codec.ProtocolError:
+            reply = None
+        if not isinstance(reply, codec.RegOk) or not reply.ok:
+            raise RuntimeError(f"Registration of {node.name} failed: {response}")
+        for ip, port, _ in reply.nodes:
+            peer = (ip, port)
+            if peer not in node.routing_table:
+                node.routing_table.append(peer)
+            await self.request(peer[0], peer[1], codec.Join(node.ip, node.port).body())
+
+    # Shared timer
+
+    async def maintain(self):
+        """Drop unreachable neighbors from every routing table; each remote peer is pinged once per round."""
+        while True:
+            await asyncio.sleep(self.maintenance_interval)
+            alive = {}
+            for node in list(self.nodes.values()):
+                for peer in node.routing_table:
+                    if peer not in alive:
+                        alive[peer] = await self.is_alive(peer)
+                node.routing_table = [peer for peer in node.routing_table if alive[peer]]
+
+    async def is_alive(self, peer):
+        if peer[0] == self.ip and peer[1] in self.nodes:
+            return True
+        return await self.request(peer[0], peer[1], "PING") == "PONG"
+
+    def memory_report(self):
+        """
+        Return the memory traced since `start` (requires tracemalloc to be tracing before `start`).
+
+        Returns:
+            dict: nodes, traced_bytes and bytes_per_node, or None if tracemalloc is not tracing.
+        """
+        if self.memory_baseline is None or not tracemalloc.is_tracing():
+            return None
+        traced = tracemalloc.get_traced_memory()[0] - self.memory_baseline
+        return {"nodes": len(self.nodes), "traced_bytes": traced,
+                "bytes_per_node": traced / len(self.nodes) if self.nodes else 0.0}
+
+
+async def run_host(args):
+    if args.trace_memory:
+        tracemalloc.start()
+    host = NodeHost(args.ip, read_file_names(args.files), maintenance_interval=args.maintenance_interval)
+    HOSTED_NODES.set_function(lambda: len(host.nodes))  # The gauge is process-wide: bind it to this process' host
+    await host.start()
+    for i in range(args.nodes):
+        await host.add_node(args.base_port + i if args.base_port else 0, f"{args.name_prefix}{i}")
+    if args.register:
+        for node in list(host.nodes.values()):
+            await host.register(node)
+    else:
+        host.wire(args.degree)
+    print(f"Hosting {len(host.nodes)} nodes on {args.ip}")
+    report = host.memory_report()
+    if report:
+        print(f"Traced memory: {report['traced_bytes'] / 1024:.0f} KiB, "
+              f"{report['bytes_per_node'] / 1024:.2f} KiB per node")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await host.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host many virtual nodes in one process.")
+    parser.add_argument("--ip", default="127.0.0.1")
+    parser.add_argument("--nodes", type=int, default=100)
+    parser.add_argument("--base-port", type=int, default=0, help="Port of the first node (0 picks free ports).")
+    parser.add_argument("--name-prefix", default="vnode")
+    parser.add_argument("--files", default=NODE_FILE_NAMES_PATH)
+    parser.add_argument("--degree", type=int, default=3, help="Random neighbors per node when not registering.")
+    parser.add_argument("--register", action="store_true", help="Get neighbors from the bootstrap server instead.")
+    parser.add_argument("--maintenance-interval", type=float, default=30)
+    parser.add_argument("--metrics-port", type=int, default=0, help="Port of a Prometheus /metrics listener.")
+    parser.add_argument("--trace-memory", action="store_true", help="Report the memory used per node.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.metrics_port:
+        metrics.start_http_server(args.metrics_port)
+    try:
+        asyncio.run(run_host(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
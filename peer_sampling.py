@@ -0,0 +1,177 @@
+import logging
+import random
+import threading
+import time
+
+from config.config import PEER_SAMPLING_VIEW_SIZE, SHUFFLE_INTERVAL, SHUFFLE_LENGTH
+from connections import codec
+
+
+class PeerSampler:
+    """
+    Cyclon-style peer sampling service.
+
+    Every node keeps a partial view of at most `view_size` peers, each tagged with an age. Once per `interval`
+    the node ages its view, removes the oldest peer Q and sends Q a SHUFFLE carrying itself (age 0) plus
+    `shuffle_length - 1` random entries. Q answers with SHUFFLEOK carrying a random subset of its own view and
+    both sides merge what they received, replacing the entries they gave away.
+
+    A dead peer is dropped when it becomes the oldest entry and never answers, and a departing peer is dropped
+    on LEAVE, after which a shuffle is started immediately to refill the view. Neither needs the bootstrap
+    server.
+
+    Messages use the length-prefixed format of the rest of the protocol:
+        SHUFFLE <ip> <port> <count> <ip1> <port1> <age1> ...
+        SHUFFLEOK <ip> <port> <count> <ip1> <port1> <age1> ...
+    """
+
+    def __init__(self, address, send, view_size=PEER_SAMPLING_VIEW_SIZE, shuffle_length=SHUFFLE_LENGTH,
+                 interval=SHUFFLE_INTERVAL, on_change=None):
+        """
+        Args:
+            address (tuple): This node's (ip, port).
+            send (callable): send(peer, message) delivering a formatted message to a (ip, port) peer.
+            view_size (int): Target number of neighbors to keep.
+            shuffle_length (int): Number of entries exchanged per shuffle.
+            interval (float): Seconds between shuffles.
+            on_change (callable): Optional callback receiving the new list of peers whenever the view changes.
+        """
+        self.address = address
+        self.send = send
+        self.view_size = view_size
+        self.shuffle_length = shuffle_length
+        self.interval = interval
+        self.on_change = on_change
+        self.view = {}  # (ip, port) -> age in shuffle rounds
+        self.pending = {}  # (ip, port) -> (entries sent, time sent)
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+    def message_with_length(self, message):
+        return codec.frame(message)
+
+    def encode(self, command, entries):
+        return codec.MESSAGES[command](self.address, entries).encode()
+
+    @staticmethod
+    def decode(message):
+        """
+        Read a SHUFFLE / SHUFFLEOK message.
+
+        Args:
+            message: A decoded codec.Shuffle / codec.ShuffleOk, or the message's tokens (length prefix included).
+
+        Returns:
+            tuple: The sender's (ip, port) and a list of ((ip, port), age) entries.
+        """
+        if not isinstance(message, codec.Shuffle):
+            message = codec.decode_tokens(message[1:])
+        return message.sender, message.entries
+
+    def peers(self):
+        """Return the current view as a list of (ip, port) tuples."""
+        with self.lock:
+            return list(self.view)
+
+    def add_peers(self, peers):
+        """Seed the view, e.g. with the neighbors returned by the bootstrap server."""
+        with self.lock:
+            for peer in peers:
+                peer = (peer[0], int(peer[1]))
+                if peer != self.address and len(self.view) < self.view_size:
+                    self.view.setdefault(peer, 0)
+        self.notify()
+
+    def remove_peer(self, peer):
+        """Drop a departed or dead peer and start a shuffle right away to find a replacement."""
+        with self.lock:
+            removed = self.view.pop((peer[0], int(peer[1])), None) is not None
+        if removed:
+            self.notify()
+            self.shuffle()
+
+    def shuffle(self):
+        """Run one active shuffle round. Returns the peer contacted, or None if the view is empty."""
+        with self.lock:
+            self.expire_pending()
+            if not self.view:
+                return None
+            for peer in self.view:
+                self.view[peer] += 1
+            target = max(self.view, key=self.view.get)
+            del self.view[target]
+            others = random.sample(list(self.view.items()), min(self.shuffle_length - 1, len(self.view)))
+            sent = [(self.address, 0)] + others
+            self.pending[target] = (sent, time.monotonic())
+
+        self.notify()
+        try:
+            self.send(target, self.encode("SHUFFLE", sent))
+        except Exception as e:
+            logging.error(f"Failed to send SHUFFLE to {target}: {e}")
+        return target
+
+    def handle_shuffle(self, message):
+        """Answer a SHUFFLE from another node and merge the entries it sent."""
+        sender, received = self.decode(message)
+        with self.lock:
+            candidates = [entry for entry in self.view.items() if entry[0] != sender]
+            reply = random.sample(candidates, min(self.shuffle_length, len(candidates)))
+            self.merge(received, [peer for peer, _ in reply])
+
+        self.notify()
+        try:
+            self.send(sender, self.encode("SHUFFLEOK", reply))
+        except Exception as e:
+            logging.error(f"Failed to send SHUFFLEOK to {sender}: {e}")
+
+    def handle_shuffle_reply(self, message):
+        """Merge the entries returned by the peer contacted in the last shuffle."""
+        sender, received = self.decode(message)
+        with self.lock:
+            sent, _ = self.pending.pop(sender, ([], None))
+            self.merge(received, [peer for peer, _ in sent])
+        self.notify()
+
+    def merge(self, received, replaceable):
+        """
+        Merge received entries into the view. Must hold `self.lock`.
+
+        Empty slots are filled first; after that, entries we just handed to the other side are replaced.
+        """
+        replaceable = [peer for peer in replaceable if peer in self.view]
+        for peer, age in received:
+            if peer == self.address:
+                continue
+            if peer in self.view:
+                self.view[peer] = min(self.view[peer], age)
+            elif len(self.view) < self.view_size:
+                self.view[peer] = age
+            elif replaceable:
+                del self.view[replaceable.pop()]
+                self.view[peer] = age
+
+    def expire_pending(self):
+        """Forget shuffles that were never answered. Must hold `self.lock`."""
+        cutoff = time.monotonic() - 2 * self.interval
+        for peer in [p for p, (_, sent_at) in self.pending.items() if sent_at < cutoff]:
+            del self.pending[peer]
+
+    def notify(self):
+        if self.on_change:
+            self.on_change(self.peers())
+
+    def run(self):
+        while self.running:
+            time.sleep(self.interval)
+            if self.running:
+                self.shuffle()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
@@ -1,62 +1,139 @@
+import os
 import time
-import statistics
-import matplotlib.pyplot as plt
-import numpy as np
 from collections import defaultdict
 
-# Performance metrics
+from tracing import critical_path, load_spans
+from utils.plotting import is_interactive, load_pyplot
+from utils.streaming_stats import StreamingSummary
+
+# Performance metrics, kept as constant-memory streaming summaries
 metrics = {
-    'hops': [],
-    'latency': [],
+    'hops': StreamingSummary(),
+    'latency': StreamingSummary(),
     'messages_per_node': defaultdict(int),
-    'routing_table_sizes': [],
+    'routing_table_sizes': StreamingSummary(),
 }
 
 
-def plot_cdf(data, title, xlabel):
-    """Plot CDF for the given data."""
-    if not data:
+def plot_cdf(data, title, xlabel, output_path=None):
+    """
+    Plot CDF for the given data (a list of samples or a StreamingSummary).
+
+    The plot is saved to `output_path` when given (PNG or SVG, from the extension). Otherwise it is shown in a
+    window if a display is available; on headless machines pass `output_path` instead.
+    """
+    if not len(data):
         print(f"Warning: No data available to plot for {title}.")
         return
-    sorted_data = np.sort(data)
-    cdf = np.arange(1, len(sorted_data) + 1) / len(sorted_data)
+    if isinstance(data, StreamingSummary):
+        sorted_data, cdf = data.histogram.cdf()
+    else:
+        sorted_data = sorted(data)
+        cdf = [i / len(sorted_data) for i in range(1, len(sorted_data) + 1)]
+
+    plt = load_pyplot()  # matplotlib is only imported when something is plotted
+    figure = plt.figure()
     plt.plot(sorted_data, cdf, marker='.', linestyle='none')
     plt.title(title)
     plt.xlabel(xlabel)
     plt.ylabel('CDF')
     plt.grid()
-    plt.show()
+    if output_path:
+        figure.savefig(output_path)
+        plt.close(figure)
+        print(f"Saved {title} to {output_path}")
+    elif is_interactive(plt):
+        plt.show()
+    else:
+        plt.close(figure)
+        print(f"Warning: No display available to show {title}; pass an output directory to save it.")
 
 
 def log_query_performance(start_time, hops, messages, routing_table_size):
     """Log performance metrics for a single query."""
     latency = time.time() - start_time
-    metrics['hops'].append(hops)
-    metrics['latency'].append(latency)
+    metrics['hops'].add(hops)
+    metrics['latency'].add(latency)
     metrics['messages_per_node'][messages['node_id']] += messages['count']
-    metrics['routing_table_sizes'].append(routing_table_size)
+    metrics['routing_table_sizes'].add(routing_table_size)
+
+
+def format_summary(summary, unit=""):
+    """One-line description of a StreamingSummary."""
+    s = summary.summary()
+    return (f"Min: {s['min']}{unit}, Max: {s['max']}{unit}, Avg: {s['average']:.6g}{unit}, "
+            f"p50: {s['p50']:.6g}{unit}, p99: {s['p99']:.6g}{unit}, p99.9: {s['p999']:.6g}{unit} "
+            f"({s['count']} samples)")
+
+
+def merge_metrics(other):
+    """Fold metrics collected elsewhere (another node or process, e.g. via `export_metrics`) into `metrics`."""
+    for key in ('hops', 'latency', 'routing_table_sizes'):
+        metrics[key].merge(StreamingSummary.from_dict(other[key]))
+    for node_id, count in other['messages_per_node'].items():
+        metrics['messages_per_node'][node_id] += count
+
 
+def export_metrics():
+    """Return `metrics` as plain data (JSON serialisable) so it can be merged by another process."""
+    return {
+        'hops': metrics['hops'].to_dict(),
+        'latency': metrics['latency'].to_dict(),
+        'routing_table_sizes': metrics['routing_table_sizes'].to_dict(),
+        'messages_per_node': dict(metrics['messages_per_node']),
+    }
 
-def plot_graphs():
-    """Analyze and print performance metrics."""
+
+def plot_graphs(output_dir=None):
+    """Analyze and print performance metrics, saving the CDF plots to `output_dir` if given."""
     print("Performance Analysis:")
-    
-    if metrics['hops']:
-        print(
-            f"Min Hops: {min(metrics['hops'])}, Max Hops: {max(metrics['hops'])}, Avg Hops: {statistics.mean(metrics['hops'])}")
-        plot_cdf(metrics['hops'], "CDF of Hops", "Hops")
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    if len(metrics['hops']):
+        print(f"Hops - {format_summary(metrics['hops'])}")
+        plot_cdf(metrics['hops'], "CDF of Hops", "Hops",
+                 output_path=os.path.join(output_dir, 'hops_cdf.png') if output_dir else None)
     else:
         print("No data available for Hops.")
-    
-    if metrics['latency']:
-        print(
-            f"Min Latency: {min(metrics['latency'])}, Max Latency: {max(metrics['latency'])}, Avg Latency: {statistics.mean(metrics['latency'])}")
-        plot_cdf(metrics['latency'], "CDF of Latency", "Latency (s)")
+
+    if len(metrics['latency']):
+        print(f"Latency - {format_summary(metrics['latency'], 's')}")
+        plot_cdf(metrics['latency'], "CDF of Latency", "Latency (s)",
+                 output_path=os.path.join(output_dir, 'latency_cdf.png') if output_dir else None)
     else:
         print("No data available for Latency.")
-    
+
     print(f"Messages per Node: {dict(metrics['messages_per_node'])}")
-    if metrics['routing_table_sizes']:
-        print(f"Routing Table Sizes: {metrics['routing_table_sizes']}")
+    if len(metrics['routing_table_sizes']):
+        print(f"Routing Table Sizes - {format_summary(metrics['routing_table_sizes'])}")
     else:
         print("No data available for Routing Table Sizes.")
+
+
+def analyze_traces(paths):
+    """
+    Rebuild the critical path of every traced query in the given span files and print per-hop latencies.
+
+    Args:
+        paths (list): JSON-lines span files written by the bootstrap server and the nodes (TRACE_LOG_PATH).
+
+    Returns:
+        dict: Trace id -> critical path breakdown (see `tracing.critical_path`).
+    """
+    traces = load_spans(paths)
+    paths_by_trace = {trace_id: critical_path(spans) for trace_id, spans in traces.items()}
+    per_hop = defaultdict(StreamingSummary)
+
+    for trace_id, path in paths_by_trace.items():
+        print(f"Trace {trace_id}: {len(path)} hop(s), outcome {path[-1]['outcome']}, "
+              f"total {path[0]['total_seconds'] * 1000:.2f} ms")
+        for index, hop in enumerate(path):
+            per_hop[index].add(hop['self_seconds'])
+            print(f"  hop {index} {hop['node']}: local search {hop['local_search_seconds'] * 1000:.2f} ms, "
+                  f"waiting on next hop {hop['forward_seconds'] * 1000:.2f} ms, "
+                  f"own time {hop['self_seconds'] * 1000:.2f} ms")
+
+    for index, samples in sorted(per_hop.items()):
+        print(f"Hop {index} own time - {format_summary(samples, 's')}")
+    return paths_by_trace
@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from config.config import REGISTRY_FSYNC_INTERVAL, REGISTRY_FSYNC_POLICY, REGISTRY_SNAPSHOT_EVERY
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+class RegistryStore:
+    """
+    Durable storage for the bootstrap server registry.
+
+    Every REG / UNREG / LEAVE is appended to a JSON-lines write-ahead log. After `snapshot_every` events the
+    full registry is written to a compact snapshot (atomically, through a temporary file) and the log is
+    truncated. On restart `load` reads the snapshot and replays the log on top of it.
+
+    The fsync policy trades durability for throughput:
+        always   - fsync after every event; nothing acknowledged is lost, even on power failure.
+        interval - fsync at most every `fsync_interval` seconds from a background thread.
+        never    - leave it to the OS; survives a process crash but not a machine crash.
+    Events are always flushed to the OS before `append` returns.
+    """
+
+    def __init__(self, directory, fsync_policy=REGISTRY_FSYNC_POLICY, fsync_interval=REGISTRY_FSYNC_INTERVAL,
+                 snapshot_every=REGISTRY_SNAPSHOT_EVERY):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync_policy}'. Choose one of: {', '.join(FSYNC_POLICIES)}")
+        os.makedirs(directory, exist_ok=True)
+        self.log_path = os.path.join(directory, "registry.log")
+        self.snapshot_path = os.path.join(directory, "registry.snapshot")
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self.events_since_snapshot = 0
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.log = None
+        self.flusher = None
+        self.closed = threading.Event()  # Ends the background fsync thread
+
+    def load(self):
+        """
+        Rebuild the registry from the snapshot and the log, then open the log for appending.
+
+        Returns:
+            dict: {"nodes": {(ip, port): {"ip", "port", "name", "files"}}, "adjacency": {(ip, port): set}}
+        """
+        state = {"nodes": {}, "adjacency": {}}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r") as f:
+                snapshot = json.load(f)
+            for node in snapshot["nodes"]:
+                state["nodes"][(node["ip"], node["port"])] = node
+            for ip, port, neighbors in snapshot["adjacency"]:
+                state["adjacency"][(ip, port)] = {(n_ip, n_port) for n_ip, n_port in neighbors}
+
+        if os.path.exists(self.log_path):
+            self.replay_log(state)
+
+        self.open_log()
+        return state
+
+    def replay_log(self, state):
+        """
+        Apply the logged events to `state`.
+
+        A crash can tear only the last entry, which is dropped (and cut off the file, so the next append starts on a
+        line of its own). An unreadable entry anywhere else means the log is corrupt; replaying the events after it
+        would silently produce a wrong registry.
+
+        Raises:
+            ValueError: If an entry other than the last one cannot be read.
+        """
+        with open(self.log_path, "rb") as f:
+            lines = f.readlines()
+        offset = 0
+        for line_number, line in enumerate(lines, 1):
+            try:
+                event = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                if line_number < len(lines):
+                    raise ValueError(f"Registry log {self.log_path} is corrupt at line {line_number}")
+                logging.warning(f"Dropping the torn last entry of the registry log (line {line_number})")
+                with open(self.log_path, "r+b") as f:
+                    f.truncate(offset)
+                return
+            self.apply(state, event)
+            self.events_since_snapshot += 1
+            offset += len(line)
+        if lines and not lines[-1].endswith(b"\n"):
+            with open(self.log_path, "ab") as f:
+                f.write(b"\n")  # The last entry was complete but its newline was not written
+
+    @staticmethod
+    def apply(state, event):
+        """Apply a single logged event to a registry state."""
+        key = (event["ip"], event["port"])
+        adjacency = state["adjacency"]
+        if event["op"] == "REG":
+            state["nodes"].setdefault(key, {"ip": event["ip"], "port": event["port"], "name": event["name"],
+                                            "files": event["files"]})
+            neighbors = {(ip, port) for ip, port in event["neighbors"]}
+            adjacency[key] = neighbors
+            for neighbor in neighbors:
+                adjacency.setdefault(neighbor, set()).add(key)
+        elif event["op"] in ("UNREG", "LEAVE"):
+            state["nodes"].pop(key, None)
+            for neighbor in adjacency.pop(key, set()):
+                adjacency.get(neighbor, set()).discard(key)
+
+    def open_log(self):
+        self.log = open(self.log_path, "a")
+        self.closed.clear()
+        if self.fsync_policy == "interval" and (self.flusher is None or not self.flusher.is_alive()):
+            self.flusher = threading.Thread(target=self.flush_periodically, daemon=True)
+            self.flusher.start()
+
+    def append(self, op, ip, port, **fields):
+        """
+        Append an event to the log.
+
+        Args:
+            op (str): "REG", "UNREG" or "LEAVE".
+            ip (str): IP address of the node.
+            port (int): Port of the node.
+            **fields: Extra fields; REG events carry "name", "files" and "neighbors".
+        """
+        event = {"op": op, "ip": ip, "port": port, **fields}
+        with self.lock:
+            if self.log is None:
+                self.open_log()
+            self.log.write(json.dumps(event, separators=(",", ":")) + "\n")
+            self.log.flush()
+            if self.fsync_policy == "always":
+                os.fsync(self.log.fileno())
+            else:
+                self.dirty = True
+            self.events_since_snapshot += 1
+
+    def should_snapshot(self):
+        return self.events_since_snapshot >= self.snapshot_every
+
+    def snapshot(self, state):
+        """
+        Write a compact snapshot of `state` (same shape as returned by `load`) and truncate the log.
+
+        The caller must make sure no events are appended while the snapshot is taken.
+        """
+        snapshot = {
+            "taken_at": time.time(),
+            "nodes": list(state["nodes"].values()),
+            "adjacency": [[ip, port, sorted(neighbors)] for (ip, port), neighbors in state["adjacency"].items()],
+        }
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+
+        with self.lock:
+            if self.log is not None:
+                self.log.close()
+            self.log = open(self.log_path, "w")
+            self.events_since_snapshot = 0
+            self.dirty = False
+
+    def flush_periodically(self):
+        while not self.closed.wait(self.fsync_interval):
+            self.sync()
+
+    def sync(self):
+        with self.lock:
+            if self.dirty and self.log is not None:
+                os.fsync(self.log.fileno())
+                self.dirty = False
+
+    def close(self):
+        self.closed.set()
+        with self.lock:
+            if self.log is not None:
+                self.log.flush()
+                os.fsync(self.log.fileno())
+                self.log.close()
+                self.log = None
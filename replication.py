@@ -0,0 +1,237 @@
+"""
+Proactive replication of popular files.
+
+Nodes count the searches they start and the bootstrap server counts the SERs it forwards. Every replication round
+the bootstrap server collects the node counts (QSTAT), which also report the files each node holds. It then:
+
+1. spreads each query's count over the catalog files it matches, as `search_file` does (case-insensitive substring);
+2. gives every file a replica target proportional to the square root of its demand (square-root replication), using
+   the storage of all nodes (nodes x NODE_STORAGE_QUOTA) as the budget;
+3. drops surplus and over-quota replicas of cold files, then pushes copies of hot files to the least loaded nodes
+   (REPLICATE / DROP).
+
+Counts decay with QUERY_HALF_LIFE so that the targets follow the recent demand. A file always keeps at least
+REPLICATION_MIN_COPIES copies; the last copy of a file is never dropped.
+"""
+import logging
+import math
+import threading
+from collections import Counter
+
+from config.config import (NODE_STORAGE_QUOTA, QUERY_HALF_LIFE, REPLICATION_INTERVAL, REPLICATION_MIN_COPIES)
+from connections import codec
+from utils import metrics
+
+REPLICATION_ACTIONS = metrics.REGISTRY.counter("replication_actions", "Replicas pushed or dropped", ["op", "outcome"])
+TRACKED_QUERIES = metrics.REGISTRY.gauge("replication_tracked_queries", "Distinct queries tracked for replication")
+
+
+class QueryTracker:
+    """Thread-safe counts of searched file names."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def record(self, query, count=1):
+        query = query.strip().lower()
+        if query:
+            with self.lock:
+                self.counts[query] += count
+
+    def merge(self, counts):
+        for query, count in counts.items():
+            self.record(query, count)
+
+    def drain(self, limit=None):
+        """Return the counts (the `limit` most common ones) and start counting again from zero."""
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+        return dict(counts.most_common(limit))
+
+    def decay(self, factor):
+        """Scale every count by `factor`, forgetting queries that are no longer searched."""
+        with self.lock:
+            self.counts = Counter({query: count * factor for query, count in self.counts.items()
+                                   if count * factor >= 0.01})
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counts)
+
+
+def file_demand(query_counts, catalog):
+    """
+    Spread the count of each query evenly over the catalog files it matches.
+
+    Returns:
+        dict: File name -> demand, for every catalog file (0 if never matched).
+    """
+    lowered = [(name, name.lower()) for name in catalog]
+    demand = dict.fromkeys(catalog, 0.0)
+    for query, count in query_counts.items():
+        matches = [name for name, lower in lowered if query in lower]
+        for name in matches:
+            demand[name] += count / len(matches)
+    return demand
+
+
+def replica_targets(demand, node_count, quota=NODE_STORAGE_QUOTA, min_copies=REPLICATION_MIN_COPIES):
+    """
+    Square-root replication: after `min_copies` per file, the rest of the storage budget goes to files in proportion
+    to the square root of their demand.
+
+    Returns:
+        dict: File name -> number of copies wanted, at most `node_count`. Empty while nothing has been searched.
+    """
+    total = sum(math.sqrt(d) for d in demand.values())
+    if node_count == 0 or total == 0:
+        return {}
+    base = min(min_copies, node_count)
+    spare = max(node_count * quota - base * len(demand), 0)
+    return {name: min(base + int(spare * math.sqrt(d) / total), node_count) for name, d in demand.items()}
+
+
+def plan_replication(holdings, targets, quota=NODE_STORAGE_QUOTA):
+    """
+    Work out the replicas to drop and to push.
+
+    Args:
+        holdings (dict): Node -> set of files it holds.
+        targets (dict): File name -> copies wanted (see `replica_targets`).
+        quota (int): Files a node may hold.
+
+    Returns:
+        list: ("DROP" or "REPLICATE", node, file name) actions, drops first.
+    """
+    load = {node: len(files) for node, files in holdings.items()}
+    holders = {}
+    for node, files in holdings.items():
+        for name in files:
+            holders.setdefault(name, set()).add(node)
+    actions = []
+
+    def drop(node, name):
+        actions.append(("DROP", node, name))
+        holders[name].discard(node)
+        load[node] -= 1
+
+    # Surplus copies of files whose demand went down, from the most loaded holders
+    for name, target in targets.items():
+        current = holders.get(name, set())
+        surplus = len(current) - max(target, 1)
+        for node in sorted(current, key=lambda n: -load[n])[:max(surplus, 0)]:
+            drop(node, name)
+
+    # Nodes over their quota give up their coldest files that have another copy
+    for node, files in holdings.items():
+        for name in sorted(files, key=lambda f: targets.get(f, 0)):
+            if load[node] <= quota:
+                break
+            if node in holders[name] and len(holders[name]) > 1:
+                drop(node, name)
+
+    # Copies of the hottest files go to the least loaded nodes
+    for name in sorted(targets, key=lambda f: -targets[f]):
+        current = holders.setdefault(name, set())
+        missing = targets[name] - len(current)
+        candidates = sorted((n for n in holdings if n not in current and load[n] < quota), key=lambda n: load[n])
+        for node in candidates[:max(missing, 0)]:
+            actions.append(("REPLICATE", node, name))
+            current.add(node)
+            load[node] += 1
+    return actions
+
+
+class ReplicationManager:
+    def __init__(self, server, interval=REPLICATION_INTERVAL, quota=NODE_STORAGE_QUOTA,
+                 min_copies=REPLICATION_MIN_COPIES, half_life=QUERY_HALF_LIFE, catalog=None, timeout=2.0):
+        """
+        Args:
+            server (BootstrapServer): Supplies the registered nodes, `query_node` and the SER counts (`queries`).
+            interval (float): Seconds between replication rounds.
+            quota (int): Files a node may hold.
+            min_copies (int): Copies kept of every file.
+            half_life (float): Seconds after which an observed query counts half.
+            catalog (list): File names to replicate. Defaults to the server's file list.
+            timeout (float): Seconds to wait for a node's answer.
+        """
+        self.server = server
+        self.interval = interval
+        self.quota = quota
+        self.min_copies = min_copies
+        self.decay = 0.5 ** (interval / half_life) if half_life else 1.0
+        self.catalog = catalog
+        self.timeout = timeout
+        self.tracker = server.queries
+        self.stopped = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"Replication round failed: {e}")
+
+    def request(self, node, message):
+        try:
+            return codec.decode(self.server.query_node(node, message.encode(), self.timeout))
+        except codec.ProtocolError:
+            return None
+
+    def collect(self):
+        """
+        Ask every registered node for its query counts and files.
+
+        Returns:
+            dict: (ip, port) -> registered node, for the nodes that answered. Their `files` are updated.
+        """
+        reachable = {}
+        for node in list(self.server.nodes):
+            reply = self.request(node, codec.QStat())
+            if isinstance(reply, codec.QStatOk):
+                self.tracker.merge(reply.counts)
+                node.files = list(reply.files)
+                reachable[(node.ip, node.port)] = node
+        return reachable
+
+    def run_once(self):
+        """
+        Run one replication round.
+
+        Returns:
+            list: The actions carried out, as returned by `plan_replication`.
+        """
+        nodes = self.collect()
+        holdings = {key: set(node.files) for key, node in nodes.items()}
+        held = set().union(*holdings.values())
+        # Only files some node holds can be copied
+        catalog = [name for name in self.catalog or self.server.get_files() if name in held]
+        demand = file_demand(self.tracker.snapshot(), catalog)
+        targets = replica_targets(demand, len(nodes), self.quota, self.min_copies)
+        actions = plan_replication(holdings, targets, self.quota)
+
+        done = []
+        for op, key, name in actions:
+            node = nodes[key]
+            message = codec.Drop(name) if op == "DROP" else codec.Replicate(name)
+            reply = self.request(node, message)
+            if reply is not None and reply.ok:
+                if op == "DROP":
+                    node.files = [f for f in node.files if f != name]
+                else:
+                    node.files = node.files + [name]
+                done.append((op, key, name))
+            REPLICATION_ACTIONS.labels(op, "ok" if reply is not None and reply.ok else "failed").inc()
+
+        self.tracker.decay(self.decay)
+        TRACKED_QUERIES.set(len(self.tracker.counts))
+        if done:
+            logging.info(f"Replication round: {len(done)} of {len(actions)} actions applied")
+        return done
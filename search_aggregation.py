@@ -0,0 +1,137 @@
+"""
+Aggregated search: collect the SEROK hits of every reachable holder instead of stopping at the first one.
+
+A SER carrying the optional field agg=<target>:<deadline ms> asks the receiving node (or bootstrap server) to query
+all of its neighbors concurrently and to answer, once `target` distinct (holder, file) results are known or the
+deadline passes, with one SERAGG listing them. Results are deduplicated by holder and file and ranked by hop count,
+then by the round-trip time measured by the node that merged them. Neighbors receive a share of the remaining
+deadline so that their answers arrive before it.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config.config import BUFFER_SIZE, SEARCH_AGGREGATION_WORKERS
+from connections import codec
+
+AGGREGATE_FIELD = "agg"
+DEADLINE_SHARE = 0.8  # Part of the remaining deadline handed on to the next hop
+
+codec.register_field(AGGREGATE_FIELD)
+
+
+def format_aggregate(target, deadline):
+    """Return the value of the agg field for a result target and a deadline in seconds."""
+    return f"{target}:{max(int(deadline * 1000), 1)}"
+
+
+def parse_aggregate(fields):
+    """
+    Read the agg field of a decoded SER.
+
+    Returns:
+        tuple: (result target, deadline in seconds), or None for a regular first-hit search (also when the field
+            is malformed).
+    """
+    value = fields.get(AGGREGATE_FIELD) if fields else None
+    target, _, deadline = (value or "").partition(":")
+    if not (target.isdigit() and deadline.isdigit()) or int(target) == 0:
+        return None
+    return int(target), int(deadline) / 1000
+
+
+class ResultAggregator:
+    def __init__(self, target, deadline):
+        """
+        Args:
+            target (int): Stop once this many distinct (holder, file) results are known.
+            deadline (float): Seconds from now after which the results collected so far are returned.
+        """
+        self.target = target
+        self.deadline = time.monotonic() + deadline
+        self.best = {}  # (ip, port, file name) -> (hops, rtt)
+
+    def add(self, ip, port, hops, rtt, file_name):
+        key = (ip, port, file_name)
+        previous = self.best.get(key)
+        if previous is None or (hops, rtt) < previous:
+            self.best[key] = (hops, rtt)
+
+    def add_local(self, ip, port, hops, files):
+        for file_name in files:
+            self.add(ip, port, hops, 0.0, file_name)
+
+    def add_response(self, response, rtt):
+        """
+        Merge a neighbor's answer; unreachable neighbors and malformed answers add nothing.
+
+        Args:
+            response (str): The SEROK or SERAGG frame received.
+            rtt (float): Seconds between sending the request and receiving `response`.
+        """
+        try:
+            message = codec.decode(response)
+        except codec.ProtocolError:
+            return
+        if isinstance(message, codec.SerOk) and message.hit and message.ip is not None:
+            for file_name in message.files:
+                self.add(message.ip, message.port, message.hops, rtt, file_name)
+        elif isinstance(message, codec.SerAgg):
+            for ip, port, hops, _, file_name in message.entries:
+                self.add(ip, port, hops, rtt, file_name)
+
+    @property
+    def done(self):
+        return len(self.best) >= self.target
+
+    def remaining(self):
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def results(self):
+        """Return the (ip, port, hops, rtt, file name) results, best first."""
+        ranked = sorted(self.best.items(), key=lambda item: item[1])
+        return [(ip, port, hops, rtt, file_name) for (ip, port, file_name), (hops, rtt) in ranked]
+
+    def message(self, fields=None, max_bytes=BUFFER_SIZE):
+        """
+        Return the merged SERAGG, keeping the best `target` results that fit in one receive buffer.
+        """
+        merged = codec.SerAgg(self.results()[:self.target], fields)
+        while merged.entries and len(merged.encode()) > max_bytes:
+            merged.entries.pop()
+        return merged
+
+    def gather(self, targets, send, max_workers=SEARCH_AGGREGATION_WORKERS):
+        """
+        Query `targets` concurrently until the target is reached or the deadline passes.
+
+        Args:
+            targets (list): The nodes to query, in any form `send` accepts.
+            send (callable): send(target, timeout) -> response frame.
+        """
+        if not targets or self.done:
+            return
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(targets)))
+
+        def timed_send(target):
+            start = time.monotonic()
+            response = send(target, max(self.remaining(), 0.001))
+            return response, time.monotonic() - start
+
+        try:
+            pending = {executor.submit(timed_send, target) for target in targets}
+            while pending and not self.done:
+                timeout = self.remaining()
+                if timeout <= 0:
+                    break
+                finished, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    self.add_response(*future.result())
+        finally:
+            # Late answers are dropped; their sockets time out at the deadline
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def forwarded_fields(self, fields):
+        """Return the fields of the SER sent on to the next hop, with its share of the remaining deadline."""
+        forwarded = dict(fields or {})
+        forwarded[AGGREGATE_FIELD] = format_aggregate(self.target, self.remaining() * DEADLINE_SHARE)
+        return forwarded
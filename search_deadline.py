@@ -0,0 +1,83 @@
+"""
+Time budget of a search, carried hop by hop.
+
+A SER may carry the optional field ttl=<remaining ms>. A node receiving it turns the budget into a local deadline,
+drops the query without searching or forwarding if nothing is left, stops forwarding once the deadline passes, and
+hands each neighbor whatever remains at the moment it forwards, so every hop subtracts the time it spent. Budgets are
+relative rather than absolute times, so the nodes' clocks need not agree; the network transit time of a hop is not
+subtracted, which errs on the side of a query living slightly too long.
+
+Dropped queries are counted in the search_expired metric, labelled by the stage at which they were dropped.
+"""
+import time
+
+from connections import codec
+from utils import metrics
+
+TTL_FIELD = "ttl"
+
+EXPIRED = metrics.REGISTRY.counter("search_expired", "SER queries dropped because their deadline had passed", ["stage"])
+
+codec.register_field(TTL_FIELD)
+
+
+def format_ttl(seconds):
+    """Return the value of the ttl field for a remaining budget in seconds."""
+    return str(max(int(seconds * 1000), 0))
+
+
+def parse_ttl(fields):
+    """
+    Read the ttl field of a decoded SER.
+
+    Returns:
+        float: The remaining budget in seconds, or None if the SER has no (well-formed) budget.
+    """
+    value = fields.get(TTL_FIELD) if fields else None
+    if value is None or not value.isdigit():
+        return None
+    return int(value) / 1000
+
+
+class SearchDeadline:
+    __slots__ = ("expires_at",)
+
+    def __init__(self, budget):
+        """
+        Args:
+            budget (float): Seconds from now until the search is abandoned.
+        """
+        self.expires_at = time.monotonic() + budget
+
+    @classmethod
+    def from_fields(cls, fields):
+        """Return the deadline of a received SER, or None if it carries no budget."""
+        budget = parse_ttl(fields)
+        return cls(budget) if budget is not None else None
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self):
+        return self.remaining() * 1000 < 1  # A budget below the field's resolution cannot be handed on
+
+    def timeout(self, limit=None):
+        """Return the seconds a network operation may take: what is left, capped at `limit`."""
+        return self.remaining() if limit is None else min(self.remaining(), limit)
+
+    def forwarded_fields(self, fields):
+        """Return the fields of the SER sent on to the next hop, with the budget that is left now."""
+        forwarded = dict(fields or {})
+        forwarded[TTL_FIELD] = format_ttl(self.remaining())
+        return forwarded
+
+
+def drop_if_expired(deadline, stage):
+    """
+    Return True, counting the drop, if the search has run out of time.
+    """
+    if deadline is not None and deadline.expired:
+        EXPIRED.labels(stage).inc()
+        return True
+    return False
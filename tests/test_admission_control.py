@@ -0,0 +1,143 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from admission_control import AdmissionController, TokenBucket
+from bootstrap_server import BootstrapServer
+from config.config import RATE_LIMIT_PER_COMMAND, RATE_LIMIT_PER_SOURCE
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_then_refill(self):
+        """
+        Test that a bucket allows its burst immediately and then refills at its rate.
+        """
+        bucket = TokenBucket(rate=2, burst=3, now=0.0)
+        self.assertEqual([bucket.take(0.0) for _ in range(4)], [True, True, True, False])
+        self.assertTrue(bucket.take(0.5))
+        self.assertFalse(bucket.take(0.5))
+
+
+class TestAdmissionController(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.admission = AdmissionController(per_source=(1, 2), per_command={"SER": (1, 1)}, max_concurrent=2,
+                                             max_sources=2, clock=self.clock)
+
+    def test_per_source_limit_is_isolated(self):
+        """
+        Test that a noisy source is throttled while other sources are still admitted.
+        """
+        results = []
+        for _ in range(3):
+            results.append(self.admission.acquire("10.0.0.1"))
+            if results[-1] is None:
+                self.admission.release()
+        self.assertEqual(results, [None, None, "source_rate"])
+        self.assertIsNone(self.admission.acquire("10.0.0.2"))
+        self.assertEqual(self.admission.stats()["rejected"], {"source_rate": 1})
+
+    def test_concurrency_cap(self):
+        """
+        Test that no more than `max_concurrent` handlers run at once.
+        """
+        self.assertIsNone(self.admission.acquire("10.0.0.1"))
+        self.assertIsNone(self.admission.acquire("10.0.0.2"))
+        self.assertEqual(self.admission.acquire("10.0.0.3"), "concurrency")
+        self.admission.release()
+        self.assertIsNone(self.admission.acquire("10.0.0.3"))
+
+    def test_source_table_is_bounded(self):
+        """
+        Test that the least recently seen sources are forgotten once the table is full.
+        """
+        for ip in ("10.0.0.1", "10.0.0.2", "10.0.0.3"):
+            self.admission.acquire(ip)
+            self.admission.release()
+        self.assertEqual(list(self.admission.source_buckets), ["10.0.0.2", "10.0.0.3"])
+
+    def test_check_frame(self):
+        """
+        Test early rejection of malformed frames, unknown commands and over-limit commands.
+        """
+        self.assertEqual(self.admission.check_frame("REG 127.0.0.1 5001 peer1"), (None, "malformed"))
+        self.assertEqual(self.admission.check_frame("0012 FOO bar"), ("FOO", "unknown_command"))
+        self.assertEqual(self.admission.check_frame("0030 REG 127.0.0.1 5001 peer1"), ("REG", None))
+        self.assertEqual(self.admission.check_frame("0030 SER 127.0.0.1 5001 \"a\" 3"), ("SER", None))
+        self.assertEqual(self.admission.check_frame("0030 SER 127.0.0.1 5001 \"a\" 3"), ("SER", "command_rate:SER"))
+        self.clock.now = 1.0
+        self.assertEqual(self.admission.check_frame("0030 SER 127.0.0.1 5001 \"a\" 3"), ("SER", None))
+        self.assertEqual(self.admission.stats()["admitted"], 3)
+
+    def test_command_limit_is_per_source(self):
+        """
+        Test that a source using up its SER tokens does not throttle SER from another source.
+        """
+        ser = "0030 SER 127.0.0.1 5001 \"a\" 3"
+        self.assertEqual(self.admission.check_frame(ser, "10.0.0.1"), ("SER", None))
+        self.assertEqual(self.admission.check_frame(ser, "10.0.0.1"), ("SER", "command_rate:SER"))
+        self.assertEqual(self.admission.check_frame(ser, "10.0.0.2"), ("SER", None))
+        self.assertEqual(self.admission.check_frame(ser, "10.0.0.1"), ("SER", "command_rate:SER"))
+
+        self.admission.check_frame(ser, "10.0.0.3")
+        self.assertEqual(list(self.admission.command_buckets), [("10.0.0.1", "SER"), ("10.0.0.3", "SER")])
+
+    def test_cluster_peers_skip_the_source_limit(self):
+        """
+        Test that an exempt source (another bootstrap server) is not throttled by the per-source limit, while its
+        per-command limits still apply.
+        """
+        admission = AdmissionController(per_source=(1, 1), per_command={"REPL": (1, 2)}, clock=self.clock,
+                                        exempt_sources={"10.0.0.9"})
+        results = []
+        for _ in range(3):
+            results.append(admission.acquire("10.0.0.9"))
+            if results[-1] is None:
+                admission.release()
+        self.assertEqual(results, [None, None, None])
+        repl = "0025 REPL UNREG 10.0.0.1 5001"
+        self.assertEqual([admission.check_frame(repl, "10.0.0.9")[1] for _ in range(3)],
+                         [None, None, "command_rate:REPL"])
+
+    def test_default_command_limits_are_below_the_source_limit(self):
+        """
+        Test that every default per-command limit for clients can bind before the per-source limit does.
+        """
+        for command, limit in RATE_LIMIT_PER_COMMAND.items():
+            if command != "REPL":  # Sent by exempt cluster peers
+                self.assertLess(limit[0], RATE_LIMIT_PER_SOURCE[0], command)
+                self.assertLess(limit[1], RATE_LIMIT_PER_SOURCE[1], command)
+
+
+class TestBootstrapServerAdmission(unittest.TestCase):
+
+    def test_rejected_frame_gets_error_and_is_not_handled(self):
+        """
+        Test that the server answers a rejected frame with ERROR and never registers the node.
+        """
+        server = BootstrapServer(ip="127.0.0.1", port=5000,
+                                 admission=AdmissionController(per_command={"REG": (1, 1)}, clock=FakeClock()))
+        with patch.object(server, "get_files", return_value=[f"file{i}" for i in range(10)]):
+            responses = []
+            for port in (6000, 6001):
+                conn = MagicMock()
+                conn.recv.return_value = f"0030 REG 127.0.0.1 {port} peer".encode()
+                server.handle_client(conn, ("127.0.0.1", 40000))
+                responses.append(conn.send.call_args[0][0].decode())
+
+        self.assertIn("REGOK", responses[0])
+        self.assertEqual(responses[1], "0027 ERROR command_rate:REG")
+        self.assertEqual([n.port for n in server.nodes], [6000])
+
+
+if __name__ == "__main__":
+    unittest.main()
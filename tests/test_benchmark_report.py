@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipUnless(numpy, "numpy is not installed")
+class TestBenchmarkReport(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write_jsonl(self, name, rows):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        return path
+
+    def test_summary_and_cdf(self):
+        """
+        Test percentiles and the empirical CDF of a known sample.
+        """
+        from benchmark_report import empirical_cdf, summarize
+
+        summary = summarize(numpy.arange(1, 101, dtype=float))
+        self.assertEqual(summary["count"], 100)
+        self.assertAlmostEqual(summary["mean"], 50.5)
+        self.assertAlmostEqual(summary["p50"], 50.5)
+        self.assertEqual((summary["min"], summary["max"]), (1.0, 100.0))
+
+        x, y = empirical_cdf(numpy.array([3.0, 1.0, 2.0]))
+        self.assertEqual(list(x), [1.0, 2.0, 3.0])
+        self.assertAlmostEqual(y[-1], 1.0)
+
+    def test_report_flags_regressions(self):
+        """
+        Test that a run whose p99 grew beyond the threshold is reported, and both tables are written.
+        """
+        from benchmark_report import generate_report
+
+        baseline = self.write_jsonl("baseline.jsonl", [{"latency": i / 100, "node": "a"} for i in range(100)])
+        slower = self.write_jsonl("slower.jsonl", [{"latency": i / 50, "node": "a"} for i in range(100)])
+        output_dir = os.path.join(self.directory.name, "report")
+
+        text, regressions = generate_report([baseline, slower], output_dir=output_dir, threshold=0.1, plot=False)
+        self.assertIn("### latency", text)
+        self.assertNotIn("### node", text)
+        self.assertEqual([row["run"] for row in regressions], ["slower"])
+        self.assertTrue(os.path.exists(os.path.join(output_dir, "summary.csv")))
+        self.assertTrue(os.path.exists(os.path.join(output_dir, "summary.md")))
+
+
+if __name__ == "__main__":
+    unittest.main()
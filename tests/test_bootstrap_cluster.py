@@ -0,0 +1,202 @@
+import socket
+import threading
+import time
+import unittest
+from collections import Counter
+from unittest.mock import patch
+
+from bootstrap_cluster import BootstrapCluster, HashRing
+from bootstrap_server import BootstrapServer
+from connections.bootstrap_server_connection import BootstrapServerConnection
+from ttypes import Node
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class TestHashRing(unittest.TestCase):
+
+    def setUp(self):
+        self.servers = [("127.0.0.1", 5000), ("127.0.0.1", 5100), ("127.0.0.1", 5200)]
+        self.ring = HashRing(self.servers)
+
+    def test_preference_list_covers_every_server(self):
+        """
+        Test that the failover order lists each bootstrap server exactly once, owner first.
+        """
+        order = self.ring.preference_list("127.0.0.1", 6001)
+        self.assertEqual(sorted(order), sorted(self.servers))
+        self.assertEqual(order[0], self.ring.owner("127.0.0.1", 6001))
+        self.assertEqual(order, HashRing(list(reversed(self.servers))).preference_list("127.0.0.1", 6001))
+
+    def test_keys_are_spread_across_servers(self):
+        """
+        Test that node registrations are split roughly evenly between the bootstrap servers.
+        """
+        owners = Counter(self.ring.owner("10.0.0.1", port) for port in range(6000, 9000))
+        self.assertEqual(set(owners), set(self.servers))
+        self.assertGreater(min(owners.values()), 3000 * 0.2)
+
+
+class TestBootstrapClusterOnLocalhost(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.object(BootstrapServer, "get_files", return_value=[f"file{i}" for i in range(10)])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        BootstrapServerConnection.unreachable_servers.clear()
+
+        addresses = [("127.0.0.1", free_port()) for _ in range(3)]
+        self.servers = {}
+        self.threads = {}
+        for address in addresses:
+            server = BootstrapServer(ip=address[0], port=address[1], cluster=BootstrapCluster(address, addresses))
+            thread = threading.Thread(target=server.start, daemon=True)
+            thread.start()
+            server.ready.wait(2)
+            self.servers[address] = server
+            self.threads[address] = thread
+            self.addCleanup(server.stop)
+        self.bs_nodes = [Node(ip, port, "BootstrapServer") for ip, port in addresses]
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if condition():
+                return True
+            time.sleep(0.05)
+        return False
+
+    def test_registrations_are_replicated(self):
+        """
+        Test that every bootstrap server learns about registrations received by the others.
+        """
+        for i in range(6):
+            BootstrapServerConnection(self.bs_nodes, Node("127.0.0.1", 7000 + i, f"peer{i}")).connect_to_bs()
+
+        self.assertTrue(self.wait_for(lambda: all(len(s.nodes) == 6 for s in self.servers.values())))
+        adjacency = [s.adjacency for s in self.servers.values()]
+        self.assertTrue(self.wait_for(lambda: adjacency[0] == adjacency[1] == adjacency[2]))
+
+    def test_unregistration_is_replicated(self):
+        """
+        Test that an UNREG handled by one server removes the node everywhere.
+        """
+        me = Node("127.0.0.1", 7100, "peer")
+        BootstrapServerConnection(self.bs_nodes, me).connect_to_bs()
+        self.assertTrue(self.wait_for(lambda: all(len(s.nodes) == 1 for s in self.servers.values())))
+
+        BootstrapServerConnection(self.bs_nodes, me).unreg_from_bs()
+        self.assertTrue(self.wait_for(lambda: all(len(s.nodes) == 0 for s in self.servers.values())))
+
+    def test_client_fails_over_when_owner_is_down(self):
+        """
+        Test that a node registers through the next server on the ring when its owner is down.
+        """
+        me = Node("127.0.0.1", 7200, "peer")
+        connection = BootstrapServerConnection(self.bs_nodes, me)
+        owner = (connection.ordered_bootstrap_servers()[0].ip, connection.ordered_bootstrap_servers()[0].port)
+        self.servers[owner].stop()
+        self.threads[owner].join(2)
+
+        start = time.monotonic()
+        self.assertEqual(connection.connect_to_bs(), [])
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertNotEqual((connection.bs.ip, connection.bs.port), owner)
+        self.assertIn(owner, BootstrapServerConnection.unreachable_servers)
+
+        # The failed owner is now tried last
+        self.assertNotEqual((connection.ordered_bootstrap_servers()[0].ip,
+                             connection.ordered_bootstrap_servers()[0].port), owner)
+
+
+class TestReplicationDelivery(unittest.TestCase):
+
+    def test_rejected_messages_are_retried_and_a_hung_peer_delays_only_itself(self):
+        """
+        Test that a REPL the peer rejects is sent again until it is acknowledged, in order, while another peer that
+        never answers does not hold the messages back.
+        """
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(16)
+        self.addCleanup(listener.close)
+        received = []
+
+        def peer():
+            while len(received) < 3:
+                conn, _ = listener.accept()
+                with conn:
+                    received.append(conn.recv(1024).decode())
+                    conn.sendall(b"0023 ERROR rate_limited" if len(received) == 1 else b"0013 REPLOK 0")
+
+        threading.Thread(target=peer, daemon=True).start()
+        hung = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # Accepts (in the kernel backlog), never answers
+        hung.bind(("127.0.0.1", 0))
+        hung.listen(16)
+        self.addCleanup(hung.close)
+        me = ("127.0.0.1", 5000)
+        cluster = BootstrapCluster(me, [me, listener.getsockname(), hung.getsockname()], timeout=5, backoff=0.05)
+        self.addCleanup(cluster.stop)
+
+        start = time.monotonic()
+        cluster.replicate("REPL UNREG 127.0.0.1 7000")
+        cluster.replicate("REPL UNREG 127.0.0.1 7001")
+        deadline = start + 2
+        while len(received) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual([frame.split()[-1] for frame in received], ["7000", "7000", "7001"])
+
+
+class TestFailoverFromHungServer(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.object(BootstrapServer, "get_files", return_value=[f"file{i}" for i in range(10)])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        BootstrapServerConnection.unreachable_servers.clear()
+
+        # Accepts connections (in the kernel backlog) but never answers
+        self.hung = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.hung.bind(("127.0.0.1", 0))
+        self.hung.listen(16)
+        self.addCleanup(self.hung.close)
+        self.server = BootstrapServer(ip="127.0.0.1", port=0)
+        threading.Thread(target=self.server.start, daemon=True).start()
+        self.server.ready.wait(2)
+        self.addCleanup(self.server.stop)
+        self.bs_nodes = [Node("127.0.0.1", self.hung.getsockname()[1], "Hung"),
+                         Node("127.0.0.1", self.server.port, "BootstrapServer")]
+
+    def connection_owned_by_hung_server(self):
+        """Return a connection whose first choice is the hung server."""
+        for port in range(7300, 7400):
+            connection = BootstrapServerConnection(self.bs_nodes, Node("127.0.0.1", port, f"peer{port}"))
+            self.addCleanup(connection.close)
+            if connection.ordered_bootstrap_servers()[0].name == "Hung":
+                connection.reply_timeout = 0.2
+                return connection
+        self.fail("No node hashes to the hung server")
+
+    def test_reg_and_leave_fail_over_when_the_owner_never_answers(self):
+        """
+        Test that REG and LEAVE move on to the next server once the owner has not answered within the reply timeout.
+        """
+        connection = self.connection_owned_by_hung_server()
+        start = time.monotonic()
+        self.assertEqual(connection.connect_to_bs(), [])
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(connection.bs.name, "BootstrapServer")
+        self.assertEqual(len(self.server.nodes), 1)
+
+        BootstrapServerConnection.unreachable_servers.clear()  # Make the hung server the first choice again
+        self.assertIn("LEAVEOK 0", connection.leave_network())
+        self.assertEqual(self.server.nodes, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
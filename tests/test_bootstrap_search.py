@@ -0,0 +1,106 @@
+import socket
+import socketserver
+import threading
+import time
+import unittest
+
+from bootstrap_server import BootstrapServer, Node
+from connections import codec
+
+
+class FakeNode(socketserver.ThreadingTCPServer):
+    """Answers every request after `delay` seconds with a SEROK, a hit when `files` is not empty."""
+    daemon_threads = True
+
+    def __init__(self, files=(), delay=0.0):
+        self.files = list(files)
+        self.delay = delay
+        self.requests = 0
+        super().__init__(("127.0.0.1", 0), FakeNodeHandler)
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeNodeHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.request.recv(1024)
+        self.server.requests += 1
+        time.sleep(self.server.delay)
+        reply = codec.SerOk(len(self.server.files), "127.0.0.1", self.server.port, 1, self.server.files)
+        try:
+            self.request.sendall(reply.encode().encode())
+        except OSError:
+            pass  # The bootstrap server gave up on this node
+
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class TestBootstrapSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.server = BootstrapServer(ip="127.0.0.1", port=0)
+        self.server.search_deadline = 1.0
+
+    def add_node(self, name, port):
+        self.server.nodes.append(Node("127.0.0.1", port, name, [], files=[]))
+
+    def fake_node(self, files=(), delay=0.0):
+        node = FakeNode(files, delay)
+        self.addCleanup(node.close)
+        return node
+
+    def search(self, file_name="Cars"):
+        return self.server.forward_request(codec.Ser("127.0.0.1", 5001, file_name, 2).encode(), 2)
+
+    def test_first_hit_returns_before_slow_nodes(self):
+        """
+        Test that the SER fans out at once and returns the first hit without waiting for slower nodes.
+        """
+        for i in range(4):
+            self.add_node(f"slow{i}", self.fake_node(delay=0.8).port)
+        holder = self.fake_node(["Cars"], delay=0.1)
+        self.add_node("holder", holder.port)
+
+        start = time.monotonic()
+        response = codec.decode(self.search())
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual((response.port, response.files), (holder.port, ["Cars"]))
+
+    def test_deadline_and_unreachable_nodes(self):
+        """
+        Test that a miss ends at the deadline, and that nodes refusing connections are skipped by later searches.
+        """
+        dead_port = closed_port()
+        self.add_node("dead", dead_port)
+        self.add_node("stuck", self.fake_node(delay=3.0).port)
+        self.server.search_workers = 1  # The dead node is tried before the stuck one
+
+        start = time.monotonic()
+        self.assertFalse(codec.decode(self.search()).hit)
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertIn(("127.0.0.1", dead_port), self.server.failed_nodes)
+        self.assertEqual([node.name for node in self.server.search_targets()], ["stuck"])
+
+        self.server.remove_node("127.0.0.1", dead_port, op="LEAVE", replicate=False)
+        self.assertEqual(self.server.failed_nodes, {})
+
+    def test_hops_exhausted(self):
+        node = self.fake_node(["Cars"])
+        self.add_node("holder", node.port)
+        self.assertFalse(codec.decode(self.server.forward_request("", 0)).hit)
+        self.assertEqual(node.requests, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
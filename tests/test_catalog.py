@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+from utils.catalog import FileCatalog, get_catalog, iter_names
+from utils.file_reader import read_file_names
+
+
+class TestFileCatalog(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, "File Names.txt")
+        self.write("Happy Feet\r\n\nKung Fu Panda\nWindows 8")
+
+    def write(self, text, mtime=None):
+        with open(self.path, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_iter_names(self):
+        self.assertEqual(list(iter_names(self.path)), ["Happy Feet", "Kung Fu Panda", "Windows 8"])
+        self.write("")
+        self.assertEqual(list(iter_names(self.path)), [])
+
+    def test_reloads_only_when_the_file_changes(self):
+        """
+        Test that the names are loaded once, reloaded after the file changes and kept when it disappears.
+        """
+        catalog = FileCatalog(self.path, check_interval=0)
+        names = catalog.get()
+        self.assertEqual(names, ("Happy Feet", "Kung Fu Panda", "Windows 8"))
+        self.assertFalse(catalog.refresh())
+        self.assertIs(catalog.get(), names)
+        catalog.refresher.join()
+
+        self.write("Twilight\n", mtime=1_000_000)
+        catalog.get()  # Checks in the background and keeps answering with the loaded names meanwhile
+        catalog.refresher.join()
+        self.assertEqual((catalog.get(), catalog.loads), (("Twilight",), 2))
+
+        os.unlink(self.path)
+        with self.assertLogs(level="ERROR"):
+            self.assertFalse(catalog.refresh())
+        self.assertEqual(catalog.get(), ("Twilight",))
+
+    def test_shared_per_path(self):
+        self.assertIs(get_catalog(self.path), get_catalog(os.path.join(os.path.dirname(self.path), ".",
+                                                                       "File Names.txt")))
+        self.assertEqual(read_file_names(self.path), ["Happy Feet", "Kung Fu Panda", "Windows 8"])
+        with self.assertLogs(level="ERROR"):
+            self.assertEqual(read_file_names(self.path + ".missing"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import random
+import unittest
+from types import SimpleNamespace
+
+from churn_harness import ChurnHarness, session_sampler
+from connections.bootstrap_server_connection import BootstrapServerConnection
+from ttypes import Node
+
+CATALOG = [f"Movie {i}" for i in range(20)]
+
+
+class TestSessionSampler(unittest.TestCase):
+
+    def test_means(self):
+        rng = random.Random(7)
+        for kind in ("exponential", "pareto"):
+            sample = session_sampler(kind, 10.0, rng)
+            sessions = [sample() for _ in range(20000)]
+            self.assertAlmostEqual(sum(sessions) / len(sessions), 10.0, delta=1.5)
+        self.assertGreaterEqual(min(session_sampler("pareto", 9.0, rng)() for _ in range(1000)), 3.0)
+        self.assertEqual(session_sampler("fixed", 4.0, rng)(), 4.0)
+        with self.assertRaises(ValueError):
+            session_sampler("uniform", 1.0, rng)
+
+
+class TestRoutingTableMaintenance(unittest.TestCase):
+
+    def test_unreachable_tuple_entries_are_dropped(self):
+        me = Node("127.0.0.1", 5001, "me")
+        me.routing_table = [("127.0.0.1", 1)]
+        connection = BootstrapServerConnection(Node("127.0.0.1", 5000, "bootstrap"), me, maintenance_interval=0.05)
+        self.addCleanup(connection.close)
+        self.assertFalse(connection.ping_node(("127.0.0.1", 1)))
+        connection.closed.wait(0.3)
+        self.assertEqual(me.routing_table, [])
+
+
+class TestChurnHarness(unittest.TestCase):
+
+    def test_searches_do_not_draw_from_the_schedule(self):
+        """
+        Test that the searches draw their choices from their own seeded source: the same seed picks the same
+        searches, and the schedule's source is left alone.
+        """
+        def picks(harness):
+            searched = []
+            for i, files in enumerate([{"Movie 1"}, {"Movie 2", "Movie 3"}, {"Movie 4"}]):
+                harness.live[("127.0.0.1", i)] = SimpleNamespace(
+                    node=SimpleNamespace(name=f"n{i}", file_list=files),
+                    search=lambda file_name, i=i: searched.append((i, file_name)) or {"hit": True, "seconds": 0.0})
+            schedule = harness.rng.getstate()
+            for _ in range(20):
+                harness.query(harness.query_rng.random())
+            self.assertEqual(harness.rng.getstate(), schedule)
+            return searched
+
+        harnesses = [ChurnHarness(CATALOG, seed=5) for _ in range(2)]
+        for harness in harnesses:
+            self.addCleanup(harness.executor.shutdown)
+        first = picks(harnesses[0])
+        self.assertEqual(first, picks(harnesses[1]))
+        self.assertGreater(len(set(first)), 1)
+
+    def test_searches_and_recovery_under_departures(self):
+        """
+        Test that searches keep running while one node crashes and another leaves, and that the overlay forgets
+        both: the leave through LEAVE, the crash through the maintenance pings.
+        """
+        harness = ChurnHarness(CATALOG, initial=5, arrival_rate=0, session="fixed", mean_session=1000,
+                               query_rate=30, maintenance_interval=0.2, shuffle_interval=60, poll_interval=0.02,
+                               seed=3)
+        self.addCleanup(harness.stop)
+        harness.start()
+        crashed, left = list(harness.live)[:2]
+        harness.depart(crashed, crash=True)
+        harness.depart(left, crash=False)
+        harness.run(1.0, settle=2.0)
+
+        report = harness.report()
+        self.assertEqual(report["nodes"], {"initial": 5, "live": 3, "started": 5, "crash": 1, "leave": 1})
+        self.assertGreater(report["queries"]["hit"], 0)
+        self.assertEqual(report["queries"].get("error", 0), 0)
+        self.assertEqual(report["latency"]["count"], report["queries"]["hit"] + report["queries"].get("miss", 0))
+        for kind in ("crash", "leave"):
+            self.assertEqual((report["recovery"][kind]["count"], report["recovery"][kind]["unrecovered"]), (1, 0))
+        for daemon in harness.live.values():
+            self.assertNotIn(crashed, daemon.node.routing_table)
+            self.assertNotIn(left, daemon.node.routing_table)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from connections import codec
+
+
+class TestCodec(unittest.TestCase):
+
+    def test_round_trip(self):
+        """
+        Test that every message kind decodes back to an equal message, quoted names included.
+        """
+        messages = [
+            codec.Reg("127.0.0.1", 5001, "node1"),
+            codec.Unreg("127.0.0.1", 5001, "node1"),
+            codec.Join("127.0.0.1", 5001),
+            codec.RegOk(2, [("127.0.0.1", 5002, "peer2"), ("127.0.0.1", 5003, "peer3")]),
+            codec.JoinOk(0),
+            codec.Ser("127.0.0.1", 5001, 'Say "Hello" \\ Goodbye', 2, {"trace": "abcd:1234"}),
+            codec.SerOk(2, "127.0.0.1", 5002, 1, ["Lord of the Rings", "Cars"]),
+            codec.Query("Happy Feet", "node1"),
+            codec.Drop("Happy Feet"),
+            codec.QStatOk({"happy feet": 3}, ["Happy Feet", "Cars"]),
+        ]
+        for message in messages:
+            frame = message.encode()
+            self.assertEqual(int(frame[:4]), len(frame))
+            self.assertEqual(codec.decode(frame), message)
+
+    def test_legacy_formats(self):
+        """
+        Test that unquoted names, colon-separated queries and bare responses of older peers still decode.
+        """
+        ser = codec.decode("SER 127.0.0.1 5001 Lord of the Rings 3")
+        self.assertEqual((ser.file_name, ser.hops, ser.trace_context), ("Lord of the Rings", 3, None))
+        ser = codec.decode('0054 SER 127.0.0.1 5001 "Happy Feet" 2 trace=abcd:1234')
+        self.assertEqual((ser.file_name, ser.hops, ser.trace_context), ("Happy Feet", 2, ("abcd", "1234")))
+        self.assertEqual(codec.decode("0025 REGOK 1 127.0.0.1 5002 peer2").nodes, [("127.0.0.1", 5002, "peer2")])
+        self.assertEqual(codec.decode("QUERY:Lord: of the Rings:node1"), codec.Query("Lord: of the Rings", "node1"))
+        self.assertFalse(codec.decode("0012 SEROK 0").hit)
+        self.assertEqual(codec.decode("SEROK 1 127.0.0.1 5002 1 Happy Feet").files, ["Happy Feet"])
+
+    def test_status_codes(self):
+        self.assertNotEqual(codec.JoinOk(9999), codec.JoinOk(0))  # Compared on the slots of the base class
+        self.assertFalse(codec.decode("0015 REGOK 9998").ok)
+        self.assertEqual(codec.decode("0015 REGOK 9998").nodes, [])
+        self.assertFalse(codec.decode("0014 UNROK 9999").ok)
+        self.assertTrue(codec.is_search_hit(codec.SerOk(1, "127.0.0.1", 5002, 1, ["Cars"]).encode()))
+        self.assertFalse(codec.is_search_hit("Error while sending message: refused"))
+
+    def test_malformed_frames(self):
+        with self.assertRaises(codec.ProtocolError):
+            codec.decode("0012 BOGUS 1")
+        with self.assertRaises(codec.ProtocolError):
+            codec.decode("REGOK 0", strict=True)
+        with self.assertRaises(codec.ProtocolError):
+            codec.decode("0025 REGOK 2 127.0.0.1 5002 peer2")
+        with self.assertRaises(codec.ProtocolError):
+            codec.decode("")
+
+    def test_dispatcher(self):
+        """
+        Test that messages are routed by command and that unknown commands reach the default handler.
+        """
+        dispatcher = codec.Dispatcher({"JOIN": lambda message, source: (source, message.port)},
+                                      default=lambda message, source: message.command)
+        self.assertEqual(dispatcher.dispatch(codec.decode("0027 JOIN 127.0.0.1 5001"), "peer"), ("peer", 5001))
+        self.assertEqual(dispatcher.dispatch(codec.Ping(), "peer"), "PING")
+        with self.assertRaises(codec.ProtocolError):
+            codec.Dispatcher().dispatch(codec.Ping())
+
+
+if __name__ == "__main__":
+    unittest.main()
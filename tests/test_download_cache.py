@@ -0,0 +1,139 @@
+import functools
+import http.server
+import os
+import tempfile
+import threading
+import unittest
+
+from connections import codec
+from download_cache import DownloadCache, safe_name
+from node_daemon import NodeDaemon
+
+
+class TestDownloadCache(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.directory = temp_dir.name
+
+    def test_lru_eviction_within_quota(self):
+        """
+        Test that storing past the quota evicts the least recently used files and reports them.
+        """
+        added, evicted = [], []
+        cache = DownloadCache(self.directory, quota=250, on_add=added.append, on_evict=evicted.append)
+        cache.put("a.bin", [b"a" * 100])
+        cache.put("b.bin", [b"b" * 100])
+        self.assertIsNotNone(cache.get("a.bin"))  # "b.bin" is now the least recently used
+        cache.put("c.bin", [b"c" * 100])
+
+        self.assertEqual(cache.names(), ["a.bin", "c.bin"])
+        self.assertEqual((added, evicted), (["a.bin", "b.bin", "c.bin"], ["b.bin"]))
+        self.assertEqual(cache.size, 200)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "b.bin")))
+        self.assertIsNone(cache.put("huge.bin", [b"x" * 200, b"x" * 200]))
+        self.assertEqual(sorted(os.listdir(self.directory)), ["a.bin", "c.bin"])
+
+    def test_order_survives_restart(self):
+        cache = DownloadCache(self.directory, quota=1000)
+        for name in ("a.bin", "b.bin"):
+            path = cache.put(name, [b"x" * 10])
+            os.utime(path, (1000, 1000 if name == "b.bin" else 2000))
+        self.assertEqual(DownloadCache(self.directory, quota=1000).names(), ["b.bin", "a.bin"])
+
+    def test_files_stored_by_another_instance_are_served(self):
+        """
+        Test that a file stored through one instance (the node daemon) is found by another on the same directory
+        (app.py), which then tracks it within its own quota.
+        """
+        writer = DownloadCache(self.directory, quota=1000)
+        added = []
+        reader = DownloadCache(self.directory, quota=1000, on_add=added.append)
+        path = writer.put("late.bin", [b"x" * 10])
+
+        self.assertEqual(reader.get("late.bin"), path)
+        self.assertEqual((reader.names(), reader.size, added), (["late.bin"], 10, ["late.bin"]))
+        self.assertIsNone(reader.get("missing.bin"))
+
+    def test_names_stay_inside_the_directory(self):
+        self.assertEqual(safe_name("../../etc/passwd"), "passwd")
+        with self.assertRaises(ValueError):
+            safe_name("..")
+
+
+class TestDaemonCache(unittest.TestCase):
+
+    def test_downloaded_file_is_searchable_until_evicted(self):
+        """
+        Test that a file downloaded over HTTP joins the node's file list and leaves it when evicted.
+        """
+        source = tempfile.TemporaryDirectory()
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(cache_dir.cleanup)
+        for name in ("Happy Feet", "Cars"):
+            with open(os.path.join(source.name, name), "wb") as f:
+                f.write(os.urandom(600))
+
+        handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=source.name)
+        handler.log_message = lambda *args: None
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        daemon = NodeDaemon("127.0.0.1", 0, "node", ["Twilight"], [("127.0.0.1", 1)], ("127.0.0.1", 0),
+                            cache_dir=cache_dir.name, cache_quota=1000)
+        daemon.start()
+        self.addCleanup(daemon.stop)
+        daemon.node.file_list = {"Twilight"}
+
+        result = daemon.execute(f"DOWNLOAD {base_url}/Happy%20Feet")
+        self.assertTrue(result["result"]["cached"], result)
+        self.assertEqual(daemon.node.file_list, {"Twilight", "Happy Feet"})
+        self.assertTrue(daemon.connection.is_search_hit(daemon.connection.search_file("Happy")))
+
+        daemon.execute(f'DOWNLOAD {base_url}/Cars')
+        self.assertEqual(daemon.node.file_list, {"Twilight", "Cars"})
+        self.assertEqual(daemon.stats()["cache"]["files"], ["Cars"])
+
+
+    def test_cached_files_do_not_use_the_replica_quota(self):
+        """
+        Test that a full download cache does not make the node refuse REPLICATE, and that concurrent updates of the
+        file list from peer and cache threads are all kept.
+        """
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        daemon = NodeDaemon("127.0.0.1", 0, "node", ["Twilight"], [("127.0.0.1", 1)], ("127.0.0.1", 0),
+                            storage_quota=2, cache_dir=cache_dir.name)
+        self.addCleanup(daemon.peer_socket.close)
+        self.addCleanup(daemon.node.sock.close)
+        self.addCleanup(daemon.connection.close)
+        daemon.set_files({"Twilight"})
+        daemon.advertise_cached("Cars")
+        daemon.advertise_cached("Up")
+
+        self.assertIn("REPLICATEOK 0", daemon.handle_replicate(codec.Replicate("Happy Feet")))
+        self.assertIn("REPLICATEOK 9998", daemon.handle_replicate(codec.Replicate("Frozen")))
+        self.assertIn("REPLICATEOK 0", daemon.handle_replicate(codec.Replicate("Cars")))  # Now held as a replica
+        daemon.withdraw_cached("Cars")
+        self.assertEqual(daemon.node.file_list, {"Twilight", "Up", "Happy Feet", "Cars"})
+
+        daemon.storage_quota = 1000
+        names = [f"file{i}" for i in range(200)]
+        threads = [threading.Thread(target=daemon.handle_replicate, args=(codec.Replicate(name),))
+                   for name in names[::2]]
+        threads += [threading.Thread(target=daemon.advertise_cached, args=(name,)) for name in names[1::2]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(set(names), daemon.node.file_list)
+        self.assertEqual(daemon.connection.file_index.stats()["names"], len(daemon.node.file_list))
+
+
+if __name__ == "__main__":
+    unittest.main()
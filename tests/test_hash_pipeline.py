@@ -0,0 +1,59 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from utils.hash_pipeline import HashPipeline, hash_file
+
+
+class TestHashPipeline(unittest.TestCase):
+
+    def test_digests_do_not_depend_on_chunking(self):
+        """
+        Test that the whole-file and per-block digests match hashlib however the producer splits the data.
+        """
+        data = os.urandom(10_000)
+        expected_blocks = [hashlib.sha256(data[i:i + 4096]).hexdigest() for i in range(0, len(data), 4096)]
+        for chunk_size in (1, 999, 4096, 10_000):
+            with HashPipeline(block_size=4096, depth=2) as pipeline:
+                for i in range(0, len(data), chunk_size):
+                    pipeline.feed(bytearray(data[i:i + chunk_size]))
+            self.assertEqual(pipeline.hexdigest(), hashlib.sha256(data).hexdigest())
+            self.assertEqual(pipeline.block_hexdigests(), expected_blocks)
+            self.assertEqual(pipeline.bytes, len(data))
+
+        with self.assertRaises(ValueError):
+            pipeline.feed(b"late")
+
+    def test_bounded_queue_applies_backpressure(self):
+        """
+        Test that a producer outrunning the hasher waits instead of queueing without limit.
+        """
+        pipeline = HashPipeline(depth=1, block_digests=False)
+        release = threading.Event()
+        hash_chunk = pipeline.hash
+        pipeline.hash = lambda chunk: (release.wait(), hash_chunk(chunk))
+
+        producer = threading.Thread(target=lambda: [pipeline.feed(b"x") for _ in range(4)])
+        producer.start()
+        time.sleep(0.1)
+        self.assertTrue(producer.is_alive())  # One chunk in the worker, one queued, the third blocks
+        release.set()
+        producer.join(1)
+        self.assertEqual(pipeline.hexdigest(), hashlib.sha256(b"xxxx").hexdigest())
+
+    def test_hash_file(self):
+        data = os.urandom(3 * 1024 + 1)
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(data)
+        self.addCleanup(os.unlink, f.name)
+        digest, blocks = hash_file(f.name, block_size=1024, read_size=700)
+        self.assertEqual(digest, hashlib.sha256(data).hexdigest())
+        self.assertEqual(len(blocks), 4)
+        self.assertEqual(blocks[-1], hashlib.sha256(data[-1:]).hexdigest())
+
+
+if __name__ == "__main__":
+    unittest.main()
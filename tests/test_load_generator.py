@@ -0,0 +1,76 @@
+import asyncio
+import socket
+import threading
+import unittest
+from unittest.mock import patch
+
+from bootstrap_server import BootstrapServer
+from load_generator import Identities, LoadGenerator, classify, find_knee
+
+
+def result(rate, p99, throughput=None, timeouts=0):
+    return {"rate": rate, "throughput": rate if throughput is None else throughput,
+            "overall": {"p99": p99, "timeout": timeouts}}
+
+
+class TestLoadGenerator(unittest.TestCase):
+
+    def test_classify(self):
+        self.assertEqual(classify("REG", "0031 REGOK 1 127.0.0.1 5001 a"), "ok")
+        self.assertEqual(classify("REG", "0015 REGOK 9999"), "error")
+        self.assertEqual(classify("LEAVE", "0017 LEAVEOK 9999"), "error")
+        self.assertEqual(classify("SER", "0027 ERROR command_rate:SER"), "rejected")
+
+    def test_find_knee(self):
+        """
+        Test that the knee is the last rate before latency explodes, throughput falls behind or requests time out.
+        """
+        self.assertEqual(find_knee([result(100, 0.001), result(200, 0.002), result(400, 0.010)]), 200)
+        self.assertEqual(find_knee([result(100, 0.001), result(200, 0.001, throughput=150)]), 100)
+        self.assertEqual(find_knee([result(100, 0.001), result(200, 0.001, timeouts=1)]), 100)
+        self.assertIsNone(find_knee([result(100, 0.001, timeouts=3)]))
+
+    def test_run_against_local_bootstrap_server(self):
+        """
+        Test an open-loop run against a bootstrap server on localhost.
+        """
+        patcher = patch.object(BootstrapServer, "get_files", return_value=[f"file{i}" for i in range(10)])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        server = BootstrapServer(ip="127.0.0.1", port=0)
+        threading.Thread(target=server.start, daemon=True).start()
+        server.ready.wait(2)
+        self.addCleanup(server.stop)
+
+        generator = LoadGenerator("127.0.0.1", server.port, mix={"REG": 2, "UNREG": 1}, identities=50, seed=1)
+        stats = asyncio.run(generator.run(rate=100, duration=0.5))
+
+        self.assertEqual(stats["requests"], 50)
+        self.assertEqual(stats["overall"]["count"], 50)
+        self.assertEqual(stats["overall"].get("ok"), 50)
+        self.assertGreater(stats["throughput"], 0)
+        self.assertEqual(set(stats["ops"]), {"REG", "UNREG"})
+
+    def test_overload_beyond_identity_pool(self):
+        """
+        Test that a server that never answers times requests out instead of the run failing once more requests are
+        in flight than the generator has identities.
+        """
+        silent = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        silent.bind(("127.0.0.1", 0))
+        silent.listen(128)  # Connections complete in the backlog; nothing is ever read or answered
+        self.addCleanup(silent.close)
+
+        generator = LoadGenerator("127.0.0.1", silent.getsockname()[1], mix={"REG": 1, "SER": 1}, identities=5,
+                                  timeout=0.3, max_in_flight=40, seed=1)
+        stats = asyncio.run(generator.run(rate=50, duration=0.5))
+        self.assertEqual(stats["overall"]["count"], 25)
+        self.assertEqual(stats["overall"].get("timeout"), 25)
+
+        identities = Identities(1)
+        self.assertIsNotNone(identities.take("REG"))
+        self.assertIsNone(identities.take("SER"))
+
+
+if __name__ == "__main__":
+    unittest.main()
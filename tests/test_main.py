@@ -0,0 +1,95 @@
+import io
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import main
+from ttypes import Node as SimpleNode
+
+
+class TestBatchMode(unittest.TestCase):
+
+    def setUp(self):
+        self.session = main.CommandSession(SimpleNode("127.0.0.1", 5000, "BootstrapServer"))
+
+    def test_read_batch_skips_blanks_and_comments(self):
+        """
+        Test that a batch file is tokenized line by line and keeps its line numbers.
+        """
+        batch = io.StringIO('# setup\n0036 REG 127.0.0.1 5001 a\n\n0036 SER 127.0.0.1 5001 "Lord of the Rings" 2\n')
+        self.assertEqual(main.read_batch(batch), [
+            (2, ["0036", "REG", "127.0.0.1", "5001", "a"]),
+            (4, ["0036", "SER", "127.0.0.1", "5001", "Lord of the Rings", "2"]),
+        ])
+
+    @patch("main.BootstrapServerConnection")
+    @patch("main.Node")
+    def test_objects_are_reused_per_identity(self, mock_node, mock_connection):
+        """
+        Test that REG and UNREG of the same node share one node and one connection, and that close releases them.
+        """
+        mock_node.return_value.name = "a"
+        mock_connection.return_value.connect_to_bs.return_value = []
+        mock_connection.return_value.unreg_from_bs.return_value = "0012 UNROK 0"
+
+        main.execute_command(["0036", "REG", "127.0.0.1", "5001", "a"], self.session)
+        self.assertEqual(main.execute_command(["0036", "UNREG", "127.0.0.1", "5001", "a"], self.session),
+                         "Unregistration successful.")
+        self.assertEqual(mock_node.call_count, 1)
+        self.assertEqual(mock_connection.call_count, 1)
+
+        self.session.close()
+        mock_connection.return_value.close.assert_called_once()
+        mock_node.return_value.sock.close.assert_called_once()
+
+    @patch("main.BootstrapServerConnection")
+    @patch("main.Node")
+    def test_address_is_not_bound_twice(self, mock_node, mock_connection):
+        """
+        Test that a second name on the same address is refused instead of binding its UDP port again.
+        """
+        mock_node.return_value.name = "a"
+        mock_connection.return_value.connect_to_bs.return_value = []
+        main.execute_command(["0036", "REG", "127.0.0.1", "5001", "a"], self.session)
+        with self.assertRaises(ValueError):
+            main.execute_command(["0036", "REG", "127.0.0.1", "5001", "b"], self.session)
+        self.assertEqual(mock_node.call_count, 1)
+
+    def test_run_batch_keeps_order_per_identity(self):
+        """
+        Test that commands of one identity run in file order while different identities run concurrently.
+        """
+        running = set()
+        overlapped = threading.Event()
+        executed = []
+
+        def fake_execute(parts, session):
+            if parts[1] == "BAD":
+                raise ValueError("Invalid command format.")
+            running.add(parts[4])
+            if len(running) > 1:
+                overlapped.set()
+            time.sleep(0.02)
+            executed.append((parts[4], parts[1]))
+            running.discard(parts[4])
+            return "ok"
+
+        commands = [
+            (1, ["0036", "REG", "127.0.0.1", "5001", "a"]),
+            (2, ["0036", "REG", "127.0.0.1", "5002", "b"]),
+            (3, ["0036", "UNREG", "127.0.0.1", "5001", "a"]),
+            (4, ["0036", "UNREG", "127.0.0.1", "5002", "b"]),
+            (5, ["0036", "BAD"]),
+        ]
+        with patch("main.execute_command", side_effect=fake_execute):
+            results = main.run_batch(commands, self.session, parallelism=4)
+
+        self.assertTrue(overlapped.is_set())
+        self.assertLess(executed.index(("a", "REG")), executed.index(("a", "UNREG")))
+        self.assertEqual([result[0] for result in results], [1, 2, 3, 4, 5])
+        self.assertEqual([result[3] for result in results], [True, True, True, True, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import urllib.request
+
+from bootstrap_server import REGISTERED_NODES, BootstrapServer
+from node_host import HOSTED_NODES, NodeHost
+from utils.metrics import MetricsRegistry, start_http_server
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter_and_labels(self):
+        """
+        Test that counters render with the _total suffix, one sample per label value.
+        """
+        counter = self.registry.counter("bs_removals", "Nodes removed", ["op"])
+        counter.labels("UNREG").inc()
+        counter.labels("LEAVE").inc(2)
+        counter.labels("UNREG").inc()
+
+        text = self.registry.render()
+        self.assertIn("# TYPE bs_removals counter", text)
+        self.assertIn('bs_removals_total{op="LEAVE"} 2', text)
+        self.assertIn('bs_removals_total{op="UNREG"} 2', text)
+
+    def test_register_is_idempotent(self):
+        """
+        Test that declaring the same metric twice returns the existing one, and that type clashes are refused.
+        """
+        first = self.registry.counter("node_queries", "Queries")
+        self.assertIs(self.registry.counter("node_queries", "Queries"), first)
+        with self.assertRaises(ValueError):
+            self.registry.gauge("node_queries", "Queries")
+
+    def test_gauge_function(self):
+        """
+        Test that a callback gauge is evaluated when rendering.
+        """
+        nodes = [1, 2, 3]
+        self.registry.gauge("bs_registered_nodes", "Nodes").set_function(lambda: len(nodes))
+        self.assertIn("bs_registered_nodes 3", self.registry.render())
+        nodes.append(4)
+        self.assertIn("bs_registered_nodes 4", self.registry.render())
+
+    def test_instances_do_not_rebind_process_gauges(self):
+        """
+        Test that constructing further servers or hosts (as tests and the churn harness do) leaves the process-wide
+        gauges bound to whatever the entry point bound them to.
+        """
+        previous = REGISTERED_NODES.function, HOSTED_NODES.function
+        self.addCleanup(REGISTERED_NODES.set_function, previous[0])
+        self.addCleanup(HOSTED_NODES.set_function, previous[1])
+        REGISTERED_NODES.set_function(lambda: 7)
+        HOSTED_NODES.set_function(lambda: 9)
+        BootstrapServer(ip="127.0.0.1", port=0)
+        NodeHost()
+        self.assertEqual((REGISTERED_NODES.function(), HOSTED_NODES.function()), (7, 9))
+
+    def test_histogram_buckets_are_cumulative(self):
+        """
+        Test histogram rendering: cumulative buckets, +Inf, sum and count.
+        """
+        histogram = self.registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            histogram.observe(value)
+
+        text = self.registry.render()
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{le="1.0"} 3', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 4', text)
+        self.assertIn("latency_seconds_sum 4.25", text)
+        self.assertIn("latency_seconds_count 4", text)
+
+    def test_http_listener(self):
+        """
+        Test that the standalone listener serves the registry on /metrics.
+        """
+        self.registry.counter("bs_registrations", "Registrations").inc()
+        server = start_http_server(0, addr="127.0.0.1", registry=self.registry)
+        self.addCleanup(server.shutdown)
+
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+            self.assertIn("bs_registrations_total 1", response.read().decode())
+
+
+if __name__ == "__main__":
+    unittest.main()
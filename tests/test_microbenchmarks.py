@@ -0,0 +1,41 @@
+import unittest
+
+from connections.bootstrap_server_connection import parse_regok
+from microbenchmarks import compare, run_suite
+
+
+class TestParseRegok(unittest.TestCase):
+
+    def test_neighbors_are_parsed(self):
+        nodes = parse_regok("0060 REGOK 2 127.0.0.1 5002 peer2 127.0.0.1 5003 peer3")
+        self.assertEqual([(n.ip, n.port, n.name) for n in nodes],
+                         [("127.0.0.1", 5002, "peer2"), ("127.0.0.1", 5003, "peer3")])
+        self.assertEqual(parse_regok("0012 REGOK 0"), [])
+
+    def test_failures_raise(self):
+        with self.assertRaises(RuntimeError):
+            parse_regok("0015 REGOK -1")
+        with self.assertRaises(RuntimeError):
+            parse_regok("0012 UNROK 0")
+
+
+class TestMicrobenchmarks(unittest.TestCase):
+
+    def test_suite_reports_time_and_allocations(self):
+        """
+        Test that selected benchmarks report ns/op and allocations, and that a slower run is flagged.
+        """
+        results = run_suite(["parse_regok", "local match (10 files)"], min_time=0.001)
+        self.assertEqual([result["name"] for result in results],
+                         ["parse_regok", "search_file local match (10 files)"])
+        for result in results:
+            self.assertGreater(result["ns_per_op"], 0)
+            self.assertGreater(result["bytes_per_op"], 0)
+
+        baseline = [dict(result, ns_per_op=result["ns_per_op"] / 2) for result in results]
+        regressions = compare(results, baseline, threshold=0.5)
+        self.assertEqual([name for name, _ in regressions], ["parse_regok", "search_file local match (10 files)"])
+
+
+if __name__ == "__main__":
+    unittest.main()
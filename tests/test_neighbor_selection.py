@@ -0,0 +1,146 @@
+import time
+import unittest
+from collections import Counter
+from unittest.mock import MagicMock, patch
+
+from bootstrap_server import BootstrapServer
+from connections import codec
+from neighbor_selection import LatencyAwarePolicy, LeastDegreePolicy, RandomPolicy, get_policy
+from ttypes import Node
+
+
+class TestNeighborSelectionPolicies(unittest.TestCase):
+
+    def setUp(self):
+        self.candidates = [Node("127.0.0.1", 5001 + i, f"peer{i + 1}") for i in range(4)]
+
+    def test_get_policy_by_name(self):
+        """
+        Test resolving policies by name and rejecting unknown names.
+        """
+        self.assertIsInstance(get_policy("random"), RandomPolicy)
+        self.assertIsInstance(get_policy("least_degree"), LeastDegreePolicy)
+        self.assertIsInstance(get_policy("latency"), LatencyAwarePolicy)
+        with self.assertRaises(ValueError):
+            get_policy("oldest")
+
+    def test_random_policy_respects_count(self):
+        """
+        Test that the random policy never returns more candidates than requested or available.
+        """
+        self.assertEqual(len(RandomPolicy().select(self.candidates, 2, {}, {})), 2)
+        self.assertEqual(len(RandomPolicy().select(self.candidates[:1], 2, {}, {})), 1)
+
+    def test_least_degree_prefers_unloaded_nodes(self):
+        """
+        Test that the least-degree policy picks the nodes with the fewest neighbors.
+        """
+        degrees = {("127.0.0.1", 5001): 5, ("127.0.0.1", 5002): 0, ("127.0.0.1", 5003): 4, ("127.0.0.1", 5004): 1}
+        selected = LeastDegreePolicy().select(self.candidates, 2, degrees, {})
+        self.assertEqual({n.port for n in selected}, {5002, 5004})
+
+    def test_latency_policy_penalises_degree(self):
+        """
+        Test that the latency-aware policy prefers fast nodes unless they are already heavily loaded.
+        """
+        latencies = {("127.0.0.1", 5001): 0.001, ("127.0.0.1", 5002): 0.010,
+                     ("127.0.0.1", 5003): 0.200, ("127.0.0.1", 5004): 0.200}
+        policy = LatencyAwarePolicy(degree_weight=0.005)
+        self.assertEqual(policy.select(self.candidates, 1, {}, latencies)[0].port, 5001)
+        degrees = {("127.0.0.1", 5001): 10}
+        self.assertEqual(policy.select(self.candidates, 1, degrees, latencies)[0].port, 5002)
+
+
+class TestBootstrapServerNeighborAssignment(unittest.TestCase):
+
+    def setUp(self):
+        self.server = BootstrapServer(ip="127.0.0.1", port=5000, neighbor_policy="least_degree")
+        patcher = patch.object(self.server, "get_files", return_value=[f"file{i}" for i in range(10)])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send(self, message):
+        conn = MagicMock()
+        conn.recv.return_value = message.encode()
+        self.server.handle_client(conn, ("127.0.0.1", 40000))
+        return conn.send.call_args[0][0].decode()
+
+    def test_reg_does_not_always_return_oldest_nodes(self):
+        """
+        Test that repeated registrations spread neighbors evenly instead of reusing the two oldest nodes.
+        """
+        for i in range(20):
+            self.send(f"0030 REG 127.0.0.1 {6000 + i} peer{i}")
+
+        degrees = [self.server.degree("127.0.0.1", 6000 + i) for i in range(20)]
+        self.assertLessEqual(max(degrees) - min(degrees), 2)
+        self.assertLessEqual(max(degrees), 4)
+
+    def test_reg_response_lists_assigned_neighbors(self):
+        """
+        Test that the REGOK response carries the neighbors recorded in the adjacency map.
+        """
+        self.send("0030 REG 127.0.0.1 6000 peer0")
+        self.send("0030 REG 127.0.0.1 6001 peer1")
+        response = self.send("0030 REG 127.0.0.1 6002 peer2")
+
+        toks = response.split()
+        self.assertEqual(toks[1:3], ["REGOK", "2"])
+        self.assertEqual(Counter(toks[4::3]), Counter(["6000", "6001"]))
+        self.assertEqual(self.server.degree("127.0.0.1", 6002), 2)
+
+    def test_unreg_releases_degree(self):
+        """
+        Test that unregistering a node removes it from its neighbors' degree counts.
+        """
+        self.send("0030 REG 127.0.0.1 6000 peer0")
+        self.send("0030 REG 127.0.0.1 6001 peer1")
+        self.assertEqual(self.server.degree("127.0.0.1", 6000), 1)
+
+        self.send("0032 UNREG 127.0.0.1 6001 peer1")
+        self.assertEqual(self.server.degree("127.0.0.1", 6000), 0)
+        self.assertEqual(len(self.server.nodes), 1)
+
+
+
+class TestLatencySamples(unittest.TestCase):
+
+    def test_reg_probes_and_latency_policy_prefers_fast_node(self):
+        """
+        Test that REG alone gives the latency policy its samples: without any heartbeat, a new node is handed the
+        neighbor that connects faster.
+        """
+        server = BootstrapServer(ip="127.0.0.1", port=5000, neighbor_policy="latency", neighbor_count=1)
+        connect_delay = {6000: 0.08, 6001: 0.0}  # The older node is the slow one
+
+        def create_connection(address, timeout=None):
+            time.sleep(connect_delay.get(address[1], 0.0))
+            return MagicMock()
+
+        with patch.object(server, "get_files", return_value=[f"file{i}" for i in range(10)]), \
+                patch("bootstrap_server.socket.create_connection", side_effect=create_connection):
+            for port in (6000, 6001):
+                server.handle_reg(codec.Reg("127.0.0.1", port, f"peer{port}"), None)
+            deadline = time.monotonic() + 2
+            while len(server.latencies) < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertLess(server.latencies[("127.0.0.1", 6001)], server.latencies[("127.0.0.1", 6000)])
+
+            reply = codec.decode(server.handle_reg(codec.Reg("127.0.0.1", 6002, "peer6002"), None))
+        self.assertEqual([port for _, port, _ in reply.nodes], [6001])
+
+    def test_late_probe_does_not_restore_removed_node(self):
+        """
+        Test that a probe finishing after the node unregistered leaves no latency entry behind.
+        """
+        server = BootstrapServer(ip="127.0.0.1", port=5000, neighbor_policy="latency", neighbor_count=1)
+        with patch.object(server, "get_files", return_value=[f"file{i}" for i in range(10)]), \
+                patch("bootstrap_server.socket.create_connection", return_value=MagicMock()):
+            server.handle_reg(codec.Reg("127.0.0.1", 6000, "peer0"), None)
+            server.handle_unreg(codec.Unreg("127.0.0.1", 6000, "peer0"), None)
+            self.assertTrue(server.check_node_availability(Node("127.0.0.1", 6000, "peer0")))  # As a late probe
+        self.assertEqual(server.latencies, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import socket
+import tempfile
+import unittest
+
+from node_daemon import ControlClient, NodeDaemon, parse_control_address
+
+
+class TestNodeDaemon(unittest.TestCase):
+
+    def start_daemon(self, name, files, control_address=("127.0.0.1", 0)):
+        daemon = NodeDaemon("127.0.0.1", 0, name, files, [("127.0.0.1", 1)], control_address)
+        daemon.start()
+        self.addCleanup(daemon.stop)
+        return daemon
+
+    def test_parse_control_address(self):
+        self.assertEqual(parse_control_address("unix:/tmp/node.sock"), "/tmp/node.sock")
+        self.assertEqual(parse_control_address("127.0.0.1:6001"), ("127.0.0.1", 6001))
+        self.assertEqual(parse_control_address(":6001"), ("127.0.0.1", 6001))
+
+    def test_join_and_search_through_control_socket(self):
+        """
+        Test that two daemons join over TCP and a search issued on one is answered by the other.
+        """
+        holder = self.start_daemon("holder", ["Lord of the Rings"])
+        seeker = self.start_daemon("seeker", ["Harry Potter"])
+
+        with ControlClient(seeker.control_address) as client:
+            reply = client.request(f"JOIN 127.0.0.1 {holder.node.port}")
+            self.assertTrue(reply["ok"], reply)
+
+            reply = client.request('SER "Lord of" 0')
+            self.assertTrue(reply["result"]["hit"], reply)
+            self.assertIn("Lord of the Rings", reply["result"]["response"])
+
+            stats = client.request("STATS")["result"]
+            self.assertEqual(stats["routing_table"], [["127.0.0.1", holder.node.port]])
+            self.assertEqual(stats["commands"], {"JOIN": 1, "SER": 1, "STATS": 1})
+
+            self.assertFalse(client.request("FROB")["ok"])
+
+        self.assertEqual(holder.stats()["routing_table"], [["127.0.0.1", seeker.node.port]])
+        self.assertEqual(holder.peer_requests["SER"], 1)
+
+    def test_peer_ping_and_leave(self):
+        """
+        Test the answers to PING and LEAVE sent by other nodes.
+        """
+        daemon = self.start_daemon("node", [])
+        daemon.add_neighbor(("127.0.0.1", 6500))
+        self.assertEqual(daemon.connection.send_message("127.0.0.1", daemon.node.port, "PING"), "PONG")
+        response = daemon.connection.send_message("127.0.0.1", daemon.node.port, "LEAVE 127.0.0.1 6500")
+        self.assertEqual(response, "0014 LEAVEOK 0")
+        self.assertEqual(daemon.node.routing_table, [])
+        self.assertEqual(daemon.node.peer_sampler.address, ("127.0.0.1", daemon.node.port))  # Not port 0
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix sockets are not available")
+    def test_unix_control_socket_and_shutdown(self):
+        """
+        Test a Unix control socket and that SHUTDOWN stops the daemon.
+        """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "node.sock")
+        daemon = self.start_daemon("node", [], control_address=path)
+
+        with ControlClient(path) as client:
+            self.assertEqual(client.request("STATS")["result"]["name"], "node")
+            self.assertTrue(client.request("SHUTDOWN")["ok"])
+        self.assertTrue(daemon.stopped.wait(5))
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
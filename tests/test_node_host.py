@@ -0,0 +1,64 @@
+import asyncio
+import tracemalloc
+import unittest
+
+from node_host import NodeHost, is_search_hit
+
+CATALOG = ["Adventures of Tintin", "Jack and Jill", "Glee", "The Vampire Diarie", "King Arthur", "Lord of the Rings"]
+
+
+class TestNodeHost(unittest.TestCase):
+
+    def test_search_is_forwarded_along_a_chain(self):
+        """
+        Test that a SER issued at one end of a chain of hosted nodes reaches the file within max_hops.
+        """
+        async def scenario():
+            host = NodeHost(catalog=CATALOG, max_hops=3)
+            await host.start()
+            try:
+                chain = [await host.add_node(0, f"n{i}", file_ids=(i,)) for i in range(4)]
+                for a, b in zip(chain, chain[1:]):
+                    a.routing_table.append((b.ip, b.port))
+
+                found = await host.search(chain[0], "vampire")
+                too_far = await host.search(chain[1], "vampire", hops=3)
+                joined = await host.request(chain[3].ip, chain[3].port, f"JOIN 127.0.0.1 {chain[0].port}")
+                return found, too_far, joined, chain[3].routing_table
+            finally:
+                await host.stop()
+
+        found, too_far, joined, routing_table = asyncio.run(scenario())
+        self.assertTrue(is_search_hit(found))
+        self.assertIn("The Vampire Diarie", found)
+        self.assertFalse(is_search_hit(too_far))
+        self.assertEqual(joined, "0013 JOINOK 0")
+        self.assertEqual(len(routing_table), 1)
+
+    def test_memory_per_node_is_small(self):
+        """
+        Test that 200 hosted nodes fit on one event loop and the memory report accounts for them.
+        """
+        async def scenario():
+            host = NodeHost(catalog=CATALOG)
+            await host.start()
+            try:
+                for i in range(200):
+                    await host.add_node(0, f"n{i}")
+                host.wire(3)
+                return host.memory_report(), min(len(node.routing_table) for node in host.nodes.values())
+            finally:
+                await host.stop()
+
+        tracemalloc.start()
+        try:
+            report, min_degree = asyncio.run(scenario())
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(report["nodes"], 200)
+        self.assertGreaterEqual(min_degree, 3)
+        self.assertLess(report["bytes_per_node"], 32 * 1024)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import random
+import unittest
+
+from peer_sampling import PeerSampler
+
+
+class InMemoryNetwork:
+    """Delivers messages between samplers synchronously; messages to dead nodes are dropped."""
+
+    def __init__(self):
+        self.samplers = {}
+        self.dead = set()
+
+    def add(self, address, **kwargs):
+        sampler = PeerSampler(address, self.send, **kwargs)
+        self.samplers[address] = sampler
+        return sampler
+
+    def send(self, peer, message):
+        if peer in self.dead or peer not in self.samplers:
+            return
+        toks = message.split()
+        if toks[1] == "SHUFFLE":
+            self.samplers[peer].handle_shuffle(toks)
+        else:
+            self.samplers[peer].handle_shuffle_reply(toks)
+
+    def run_rounds(self, rounds):
+        for _ in range(rounds):
+            for address, sampler in self.samplers.items():
+                if address not in self.dead:
+                    sampler.shuffle()
+
+
+class TestPeerSampler(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(7)
+        self.network = InMemoryNetwork()
+
+    def test_encode_decode_round_trip(self):
+        """
+        Test that SHUFFLE messages carry the sender and the entries with their ages.
+        """
+        sampler = self.network.add(("127.0.0.1", 5001))
+        message = sampler.encode("SHUFFLE", [(("127.0.0.1", 5002), 3), (("127.0.0.1", 5003), 0)])
+        self.assertEqual(message[:4], f"{len(message):04d}")
+
+        sender, entries = PeerSampler.decode(message.split())
+        self.assertEqual(sender, ("127.0.0.1", 5001))
+        self.assertEqual(entries, [(("127.0.0.1", 5002), 3), (("127.0.0.1", 5003), 0)])
+
+    def test_shuffle_grows_view_to_target_degree(self):
+        """
+        Test that nodes seeded with a single neighbor reach the target view size by gossiping.
+        """
+        addresses = [("127.0.0.1", 6000 + i) for i in range(20)]
+        for i, address in enumerate(addresses):
+            self.network.add(address, view_size=5, shuffle_length=3)
+        for i, address in enumerate(addresses):
+            self.network.samplers[address].add_peers([addresses[(i + 1) % len(addresses)]])
+
+        self.network.run_rounds(30)
+
+        sizes = [len(s.view) for s in self.network.samplers.values()]
+        self.assertGreaterEqual(min(sizes), 4)
+        self.assertTrue(all(address not in s.view for address, s in self.network.samplers.items()))
+
+    def test_dead_neighbors_are_replaced(self):
+        """
+        Test that entries pointing at crashed nodes disappear without contacting the bootstrap server.
+        """
+        addresses = [("127.0.0.1", 6000 + i) for i in range(30)]
+        for address in addresses:
+            self.network.add(address, view_size=5, shuffle_length=3)
+        for i, address in enumerate(addresses):
+            self.network.samplers[address].add_peers([addresses[(i + 1) % 30], addresses[(i + 2) % 30]])
+        self.network.run_rounds(20)
+
+        self.network.dead = set(addresses[:10])
+        self.network.run_rounds(40)
+
+        alive = [self.network.samplers[a] for a in addresses[10:]]
+        dead_entries = sum(1 for s in alive for peer in s.view if peer in self.network.dead)
+        self.assertEqual(dead_entries, 0)
+        self.assertGreaterEqual(sum(len(s.view) for s in alive) / len(alive), 4)
+
+    def test_remove_peer_triggers_refill(self):
+        """
+        Test that a LEAVE removes the neighbor and immediately gossips for a replacement.
+        """
+        a = self.network.add(("127.0.0.1", 7001), view_size=3)
+        b = self.network.add(("127.0.0.1", 7002), view_size=3)
+        c = self.network.add(("127.0.0.1", 7003), view_size=3)
+        d = self.network.add(("127.0.0.1", 7004), view_size=3)
+        a.add_peers([b.address, c.address])
+        b.add_peers([d.address])
+
+        changes = []
+        a.on_change = changes.append
+        a.remove_peer(c.address)
+
+        self.assertNotIn(c.address, a.view)
+        self.assertNotIn(b.address, a.view)  # b was contacted and handed our entry
+        self.assertIn(d.address, a.view)  # ...and returned d as a replacement
+        self.assertIn(a.address, b.view)
+        self.assertTrue(changes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from bootstrap_server import BootstrapServer
+from registry_store import RegistryStore
+
+
+class TestRegistryStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.files = [f"file{i}" for i in range(10)]
+
+    def make_server(self, **store_options):
+        store = RegistryStore(self.temp_dir.name, **store_options)
+        server = BootstrapServer(ip="127.0.0.1", port=5000, store=store)
+        patcher = patch.object(server, "get_files", return_value=self.files)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(store.close)
+        return server
+
+    def test_unknown_fsync_policy(self):
+        """
+        Test that a misspelled fsync policy is rejected up front.
+        """
+        with self.assertRaises(ValueError):
+            RegistryStore(self.temp_dir.name, fsync_policy="sometimes")
+
+    def test_restart_replays_log(self):
+        """
+        Test that registrations, unregistrations and LEAVEs survive a restart.
+        """
+        server = self.make_server(fsync_policy="always")
+        for i in range(5):
+            server.register("127.0.0.1", 6000 + i, f"peer{i}")
+        server.remove_node("127.0.0.1", 6001, "peer1")
+        server.handle_leave_request("127.0.0.1", 6002)
+        files_before = {(n.ip, n.port): n.files for n in server.nodes}
+        server.store.close()
+
+        restarted = self.make_server(fsync_policy="always")
+        self.assertEqual({(n.ip, n.port) for n in restarted.nodes},
+                         {("127.0.0.1", 6000), ("127.0.0.1", 6003), ("127.0.0.1", 6004)})
+        self.assertEqual({(n.ip, n.port): n.files for n in restarted.nodes}, files_before)
+        self.assertEqual(restarted.adjacency, server.adjacency)
+
+    def test_snapshot_compacts_log(self):
+        """
+        Test that the log is truncated after a snapshot and that snapshot plus log restore the registry.
+        """
+        server = self.make_server(fsync_policy="never", snapshot_every=4)
+        for i in range(6):
+            server.register("127.0.0.1", 6000 + i, f"peer{i}")
+        server.store.close()
+
+        self.assertTrue(os.path.exists(server.store.snapshot_path))
+        with open(server.store.log_path) as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+        restarted = self.make_server(fsync_policy="never", snapshot_every=4)
+        self.assertEqual(len(restarted.nodes), 6)
+        self.assertEqual(restarted.adjacency, server.adjacency)
+
+    def test_stop_ends_the_fsync_thread(self):
+        """
+        Test that stopping the server closes the store and ends the interval fsync thread.
+        """
+        server = self.make_server(fsync_policy="interval", fsync_interval=0.01)
+        server.register("127.0.0.1", 6000, "peer0")
+        flusher = server.store.flusher
+        self.assertTrue(flusher.is_alive())
+        server.stop()
+        flusher.join(1)
+        self.assertFalse(flusher.is_alive())
+        self.assertIsNone(server.store.log)
+
+    def test_torn_tail_is_ignored(self):
+        """
+        Test that a partially written last entry does not prevent recovery.
+        """
+        server = self.make_server()
+        server.register("127.0.0.1", 6000, "peer0")
+        server.store.close()
+        with open(server.store.log_path, "a") as f:
+            f.write('{"op":"REG","ip":"127.0.0.1","po')
+
+        with self.assertLogs(level="WARNING"):
+            restarted = self.make_server()
+        self.assertEqual([n.port for n in restarted.nodes], [6000])
+
+        # The torn entry was cut off, so events appended after the restart replay cleanly
+        restarted.register("127.0.0.1", 6001, "peer1")
+        restarted.store.close()
+        self.assertEqual(sorted(n.port for n in self.make_server().nodes), [6000, 6001])
+
+    def test_corrupt_middle_entry_is_an_error(self):
+        """
+        Test that an unreadable entry followed by more events stops the restore instead of being skipped.
+        """
+        server = self.make_server()
+        server.register("127.0.0.1", 6000, "peer0")
+        server.store.close()
+        with open(server.store.log_path, "a") as f:
+            f.write('{"op":"UNREG","ip":"127.0.0.1",\n')
+        server.register("127.0.0.1", 6001, "peer1")
+        server.store.close()
+
+        with self.assertRaises(ValueError):
+            self.make_server()
+
+
+if __name__ == "__main__":
+    unittest.main()
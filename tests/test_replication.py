@@ -0,0 +1,83 @@
+import unittest
+
+from bootstrap_server import BootstrapServer, Node
+from node_daemon import NodeDaemon
+from replication import (QueryTracker, ReplicationManager, file_demand, plan_replication, replica_targets)
+
+CATALOG = ["Happy Feet", "Super Mario", "Twilight", "Windows 8"]
+
+
+class TestReplicationPlan(unittest.TestCase):
+
+    def test_square_root_targets(self):
+        """
+        Test that copies grow with the square root of demand and that partial names share their count.
+        """
+        tracker = QueryTracker()
+        tracker.merge({"Happy Feet": 64, "super mario": 4})
+        tracker.record("w")  # Matches "Twilight" and "Windows 8"
+        demand = file_demand(tracker.snapshot(), CATALOG)
+        self.assertEqual(demand, {"Happy Feet": 64, "Super Mario": 4, "Twilight": 0.5, "Windows 8": 0.5})
+
+        # 96 spare copies split 8 : 2 : 0.71 : 0.71
+        targets = replica_targets(demand, node_count=100, quota=1)
+        self.assertEqual(targets, {"Happy Feet": 1 + 67, "Super Mario": 1 + 16, "Twilight": 1 + 5, "Windows 8": 1 + 5})
+        self.assertEqual(replica_targets(demand, node_count=40, quota=2)["Happy Feet"], 40)  # One copy per node
+        self.assertEqual(replica_targets(file_demand({}, CATALOG), node_count=40), {})
+
+    def test_plan_respects_quota_and_keeps_last_copy(self):
+        """
+        Test that cold surplus copies are dropped, hot copies are pushed, no node exceeds its quota and no file
+        loses its last copy.
+        """
+        holdings = {
+            "a": {"Super Mario", "Twilight"},
+            "b": {"Super Mario", "Windows 8"},
+            "c": {"Super Mario", "Happy Feet", "Twilight"},
+            "d": set(),
+        }
+        targets = {"Happy Feet": 3, "Super Mario": 1, "Twilight": 1, "Windows 8": 1}
+        actions = plan_replication(holdings, targets, quota=2)
+
+        for op, node, name in actions:
+            (holdings[node].discard if op == "DROP" else holdings[node].add)(name)
+        self.assertTrue(all(len(files) <= 2 for files in holdings.values()), holdings)
+        for name in CATALOG:
+            self.assertTrue(any(name in files for files in holdings.values()), name)
+        self.assertEqual(sum("Happy Feet" in files for files in holdings.values()), 3)
+        self.assertEqual(sum("Super Mario" in files for files in holdings.values()), 1)
+
+
+class TestReplicationManager(unittest.TestCase):
+
+    def test_round_pushes_hot_file_to_daemons(self):
+        """
+        Test a replication round against running node daemons: counts and files come from QSTAT, the hot file is
+        replicated with REPLICATE and the cold surplus copy is dropped with DROP.
+        """
+        server = BootstrapServer(ip="127.0.0.1", port=0)
+        daemons = []
+        nodes = [("holder", ["Happy Feet", "Twilight"]), ("other", ["Twilight", "Windows 8", "Super Mario"])]
+        for name, files in nodes:
+            daemon = NodeDaemon("127.0.0.1", 0, name, files, [("127.0.0.1", 1)], ("127.0.0.1", 0), storage_quota=3)
+            daemon.node.file_list = set(files)
+            daemon.start()
+            self.addCleanup(daemon.stop)
+            daemons.append(daemon)
+            server.nodes.append(Node("127.0.0.1", daemon.node.port, name, [], files=[]))
+
+        daemons[1].search("Happy Feet")  # Counted by the node, reported on QSTAT
+        server.queries.record("happy")
+        manager = ReplicationManager(server, catalog=CATALOG, quota=3)
+        actions = manager.run_once()
+
+        other = ("127.0.0.1", daemons[1].node.port)
+        self.assertEqual(actions, [("DROP", other, "Twilight"), ("REPLICATE", other, "Happy Feet")])
+        self.assertEqual(daemons[1].node.file_list, {"Happy Feet", "Super Mario", "Windows 8"})
+        self.assertEqual(daemons[0].node.file_list, {"Happy Feet", "Twilight"})
+        self.assertEqual(sorted(server.nodes[1].files), ["Happy Feet", "Super Mario", "Windows 8"])
+        self.assertEqual(manager.tracker.snapshot(), {"happy feet": 0.5 ** 0.1, "happy": 0.5 ** 0.1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import time
+import unittest
+from unittest.mock import patch
+
+from connections import codec
+from connections.bootstrap_server_connection import BootstrapServerConnection
+from search_aggregation import ResultAggregator, format_aggregate, parse_aggregate
+from ttypes import Node
+
+
+class TestResultAggregator(unittest.TestCase):
+
+    def test_deduplicates_and_ranks(self):
+        """
+        Test that each (holder, file) is kept once with its best route, ranked by hops and then RTT.
+        """
+        aggregator = ResultAggregator(target=10, deadline=1.0)
+        aggregator.add_response(codec.SerOk(1, "127.0.0.1", 5003, 3, ["Cars"]).encode(), rtt=0.010)
+        aggregator.add_response(codec.SerOk(1, "127.0.0.1", 5003, 2, ["Cars"]).encode(), rtt=0.050)
+        aggregator.add_response(codec.SerAgg([("127.0.0.1", 5004, 2, 0.001, "Cars 2")]).encode(), rtt=0.020)
+        aggregator.add_response("Error while sending message: refused", rtt=0.001)
+        aggregator.add_response(codec.SerOk(0, "127.0.0.1", 5005, 1).encode(), rtt=0.001)
+
+        self.assertEqual(aggregator.results(), [("127.0.0.1", 5004, 2, 0.020, "Cars 2"),
+                                                ("127.0.0.1", 5003, 2, 0.050, "Cars")])
+
+    def test_gather_stops_at_target_and_deadline(self):
+        """
+        Test that gathering returns once the target is reached, or at the deadline without waiting for slow nodes.
+        """
+        def send(port, timeout):
+            if port == 5009:
+                time.sleep(timeout)
+                return ""
+            return codec.SerOk(1, "127.0.0.1", port, 1, ["Cars"]).encode()
+
+        aggregator = ResultAggregator(target=2, deadline=5.0)
+        start = time.monotonic()
+        aggregator.gather([5002, 5009, 5003], send)
+        self.assertTrue(aggregator.done)
+        self.assertLess(time.monotonic() - start, 1.0)
+
+        aggregator = ResultAggregator(target=5, deadline=0.2)
+        aggregator.gather([5002, 5009], send)
+        self.assertEqual([port for _, port, _, _, _ in aggregator.results()], [5002])
+        self.assertLess(time.monotonic() - start, 1.0)
+
+    def test_message_fits_one_buffer(self):
+        aggregator = ResultAggregator(target=100, deadline=1.0)
+        aggregator.add_local("127.0.0.1", 5001, 1, [f"A fairly long file name number {i}" for i in range(100)])
+        self.assertLessEqual(len(aggregator.message(max_bytes=1024).encode()), 1024)
+
+    def test_field(self):
+        self.assertEqual(parse_aggregate({"agg": format_aggregate(5, 1.5)}), (5, 1.5))
+        self.assertIsNone(parse_aggregate({}))
+        self.assertIsNone(parse_aggregate({"agg": "many"}))
+
+
+class TestAggregatedSearch(unittest.TestCase):
+
+    def setUp(self):
+        bootstrap = Node("127.0.0.1", 5000, "bootstrap")
+        nodes = [Node("127.0.0.1", port, f"node{port}") for port in (5001, 5002, 5003, 5004)]
+        for node in nodes:
+            node.max_hops = 3
+        origin, first, second, third = nodes
+        origin.routing_table = [("127.0.0.1", 5002), ("127.0.0.1", 5003)]
+        first.routing_table = [("127.0.0.1", 5004)]
+        second.routing_table = [("127.0.0.1", 5004)]
+        first.file_list = ["Happy Feet"]
+        third.file_list = ["Happy Feet", "Feet of Clay"]
+        self.connections = {node.port: BootstrapServerConnection(bootstrap, node) for node in nodes}
+
+    def tearDown(self):
+        for connection in self.connections.values():
+            connection.close()
+
+    def deliver(self, target_ip, target_port, message, timeout=None):
+        """Hand a forwarded SER to the target node's search logic, as its listener would."""
+        ser = codec.decode(message)
+        return self.connections[target_port].search_file(ser.file_name, ser.hops, ser.trace_context,
+                                                         aggregate=parse_aggregate(ser.fields))
+
+    def test_all_holders_are_returned(self):
+        """
+        Test that an aggregated search returns every holder once, nearest first, where a regular one stops early.
+        """
+        with patch.object(BootstrapServerConnection, "send_message", side_effect=self.deliver):
+            first_hit = codec.decode(self.connections[5001].search_file("Feet"))
+            merged = codec.decode(self.connections[5001].search_file("Feet", aggregate=(10, 2.0)))
+
+        self.assertEqual((first_hit.port, first_hit.files), (5002, ["Happy Feet"]))
+        self.assertIsInstance(merged, codec.SerAgg)
+        entries = [(port, hops, name) for _, port, hops, _, name in merged.entries]
+        # node5004 is reached through both neighbors but listed once per file
+        self.assertEqual(entries[0], (5002, 2, "Happy Feet"))
+        self.assertEqual(sorted(entries[1:]), [(5004, 3, "Feet of Clay"), (5004, 3, "Happy Feet")])
+        self.assertTrue(codec.is_search_hit(merged.encode()))
+
+
+if __name__ == "__main__":
+    unittest.main()
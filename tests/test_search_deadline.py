@@ -0,0 +1,104 @@
+import time
+import unittest
+from unittest.mock import patch
+
+from bootstrap_server import BootstrapServer, Node as RegisteredNode
+from connections import codec
+from connections.bootstrap_server_connection import BootstrapServerConnection
+from search_deadline import EXPIRED, SearchDeadline, format_ttl, parse_ttl
+from ttypes import Node
+
+
+class TestSearchDeadline(unittest.TestCase):
+
+    def test_field(self):
+        self.assertEqual(parse_ttl({"ttl": format_ttl(1.5)}), 1.5)
+        self.assertEqual(format_ttl(-1), "0")
+        self.assertIsNone(parse_ttl({}))
+        self.assertIsNone(parse_ttl({"ttl": "soon"}))
+        ser = codec.decode(codec.Ser("127.0.0.1", 5001, "Happy Feet", 1, {"ttl": "250"}).encode())
+        self.assertLessEqual(SearchDeadline.from_fields(ser.fields).remaining(), 0.25)
+        self.assertTrue(SearchDeadline(0).expired)
+
+
+class TestDeadlinePropagation(unittest.TestCase):
+
+    def setUp(self):
+        bootstrap = Node("127.0.0.1", 5000, "bootstrap")
+        self.nodes = {port: Node("127.0.0.1", port, f"node{port}") for port in (5001, 5002, 5003)}
+        self.nodes[5001].routing_table = [("127.0.0.1", 5002)]
+        self.nodes[5002].routing_table = [("127.0.0.1", 5003)]
+        self.nodes[5003].file_list = ["Happy Feet"]
+        self.connections = {port: BootstrapServerConnection(bootstrap, node) for port, node in self.nodes.items()}
+        for connection in self.connections.values():
+            self.addCleanup(connection.close)
+        self.received = []  # (port, ttl in seconds) of every forwarded SER
+        self.hop_delay = 0.0
+
+    def deliver(self, target_ip, target_port, message, timeout=None):
+        """Hand a forwarded SER to the target node as its listener would, which is busy for `hop_delay` first."""
+        ser = codec.decode(message)
+        deadline = SearchDeadline.from_fields(ser.fields)  # The budget runs from receipt
+        self.received.append((target_port, parse_ttl(ser.fields)))
+        time.sleep(self.hop_delay)
+        return self.connections[target_port].search_file(ser.file_name, ser.hops, ser.trace_context,
+                                                         deadline=deadline)
+
+    def test_each_hop_subtracts_its_time(self):
+        """
+        Test that every forwarded SER carries the budget left after the time spent so far.
+        """
+        self.hop_delay = 0.05
+        with patch.object(BootstrapServerConnection, "send_message", side_effect=self.deliver):
+            response = self.connections[5001].search_file("Feet", deadline=SearchDeadline(1.0))
+        self.assertTrue(codec.is_search_hit(response))
+        (middle, middle_ttl), (holder, holder_ttl) = self.received
+        self.assertEqual((middle, holder), (5002, 5003))
+        self.assertLessEqual(middle_ttl, 1.0)
+        self.assertLessEqual(holder_ttl, middle_ttl - 0.05)  # The middle node was busy for 0.05 s
+
+    def test_expired_queries_are_dropped(self):
+        """
+        Test that a query is not searched once its budget is spent, whether on arrival or before forwarding.
+        """
+        received, forward = EXPIRED.labels("received").value, EXPIRED.labels("forward").value
+        response = self.connections[5003].search_file("Feet", hops=1, deadline=SearchDeadline(0))
+        self.assertFalse(codec.is_search_hit(response))  # Dropped although the holder has the file
+        self.assertEqual(EXPIRED.labels("received").value, received + 1)
+
+        # The middle node is busy past the budget, so it drops the query and the origin does not try the holder
+        self.nodes[5001].routing_table = [("127.0.0.1", 5002), ("127.0.0.1", 5003)]
+        self.hop_delay = 0.15
+        with patch.object(BootstrapServerConnection, "send_message", side_effect=self.deliver):
+            response = self.connections[5001].search_file("Feet", deadline=SearchDeadline(0.1))
+        self.assertFalse(codec.is_search_hit(response))
+        self.assertEqual([port for port, _ in self.received], [5002])
+        self.assertEqual(EXPIRED.labels("received").value, received + 2)
+        self.assertEqual(EXPIRED.labels("forward").value, forward + 1)
+
+    def test_bootstrap_server_caps_and_forwards_the_budget(self):
+        """
+        Test that the bootstrap server hands nodes the smaller of its own and the sender's budget, and drops
+        expired SERs without querying any node.
+        """
+        server = BootstrapServer(ip="127.0.0.1", port=0)
+        server.nodes.append(RegisteredNode("127.0.0.1", 5002, "node", [], files=[]))
+        frames = []
+
+        def query_node(node, message, timeout=5):
+            frames.append(codec.decode(message))
+            return codec.SerOk(1, node.ip, node.port, 1, ["Happy Feet"]).encode()
+
+        with patch.object(server, "query_node", side_effect=query_node):
+            self.assertFalse(codec.is_search_hit(server.handle_ser(codec.Ser("127.0.0.1", 5001, "Feet", 2,
+                                                                              {"ttl": "0"}), None)))
+            self.assertEqual(frames, [])
+            self.assertTrue(codec.is_search_hit(server.handle_ser(codec.Ser("127.0.0.1", 5001, "Feet", 2,
+                                                                             {"ttl": "800"}), None)))
+            self.assertLessEqual(parse_ttl(frames[0].fields), 0.8)
+            server.handle_ser(codec.Ser("127.0.0.1", 5001, "Feet", 2), None)
+            self.assertLessEqual(parse_ttl(frames[1].fields), server.search_deadline)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import random
+import statistics
+import unittest
+
+from utils.streaming_stats import LogHistogram, RunningStats, StreamingSummary
+
+
+class TestRunningStats(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(3)
+        self.samples = [random.expovariate(10) for _ in range(5000)]
+
+    def test_matches_statistics_module(self):
+        """
+        Test that Welford's mean and sample standard deviation match the exact computation.
+        """
+        stats = RunningStats()
+        for value in self.samples:
+            stats.add(value)
+        self.assertAlmostEqual(stats.mean, statistics.mean(self.samples), places=9)
+        self.assertAlmostEqual(stats.stdev, statistics.stdev(self.samples), places=9)
+        self.assertEqual((stats.min, stats.max), (min(self.samples), max(self.samples)))
+
+    def test_merge_equals_single_stream(self):
+        """
+        Test that merging partial results (e.g. from several nodes) gives the same answer as one stream.
+        """
+        parts = [RunningStats() for _ in range(3)]
+        for i, value in enumerate(self.samples):
+            parts[i % 3].add(value)
+        merged = RunningStats().merge(parts[0]).merge(parts[1]).merge(RunningStats.from_dict(parts[2].to_dict()))
+        self.assertEqual(merged.count, len(self.samples))
+        self.assertAlmostEqual(merged.mean, statistics.mean(self.samples), places=9)
+        self.assertAlmostEqual(merged.variance, statistics.variance(self.samples), places=9)
+
+
+class TestLogHistogram(unittest.TestCase):
+
+    def test_quantiles_within_relative_error(self):
+        """
+        Test that p50 / p99 / p999 are within the configured relative error of the exact quantiles.
+        """
+        random.seed(5)
+        samples = sorted(random.lognormvariate(-4, 1.5) for _ in range(20000))
+        histogram = LogHistogram(relative_error=0.01)
+        for value in samples:
+            histogram.add(value)
+
+        for q in (0.5, 0.99, 0.999):
+            exact = samples[int(q * len(samples)) - 1]
+            self.assertAlmostEqual(histogram.quantile(q) / exact, 1, delta=0.011)
+
+    def test_memory_is_bounded(self):
+        """
+        Test that the number of buckets does not grow with the number of samples.
+        """
+        histogram = LogHistogram(relative_error=0.01)
+        for i in range(100000):
+            histogram.add(0.001 + (i % 1000) * 0.001)
+        self.assertLess(len(histogram.counts), 800)
+        self.assertEqual(histogram.total, 100000)
+
+    def test_zero_and_negative_values(self):
+        """
+        Test that zero is kept exactly and negative values are refused.
+        """
+        histogram = LogHistogram()
+        histogram.add(0)
+        histogram.add(0)
+        histogram.add(5)
+        self.assertEqual(histogram.quantile(0.5), 0.0)
+        with self.assertRaises(ValueError):
+            histogram.add(-1)
+
+    def test_merge_round_trip(self):
+        """
+        Test that histograms serialised by another process merge into the same counts.
+        """
+        a, b = LogHistogram(), LogHistogram()
+        for i in range(1, 100):
+            a.add(i)
+            b.add(i * 10)
+        merged = LogHistogram().merge(a).merge(LogHistogram.from_dict(b.to_dict()))
+        self.assertEqual(merged.total, 198)
+        with self.assertRaises(ValueError):
+            merged.merge(LogHistogram(relative_error=0.05))
+
+
+class TestStreamingSummary(unittest.TestCase):
+
+    def test_summary_keys_and_clamping(self):
+        """
+        Test the summary dictionary and that quantiles never leave the observed range.
+        """
+        summary = StreamingSummary()
+        self.assertIsNone(summary.summary()["p99"])
+        for hops in (1, 2, 2, 3, 5):
+            summary.add(hops)
+
+        result = summary.summary()
+        self.assertEqual((result["min"], result["max"], result["count"]), (1, 5, 5))
+        self.assertAlmostEqual(result["average"], 2.6)
+        self.assertAlmostEqual(result["p50"], 2, delta=0.02)
+        self.assertLessEqual(result["p999"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
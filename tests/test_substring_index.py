@@ -0,0 +1,53 @@
+import random
+import unittest
+
+from utils.substring_index import SCAN_LIMIT, SubstringIndex
+
+NAMES = ["Adventures of Tintin", "Jack and Jill", "Glee", "The Vampire Diarie", "King Arthur", "Windows XP",
+         "Harry Potter", "Kung Fu Panda", "Lady Gaga", "Twilight", "Windows 8", "Mission Impossible", "Turn Up The Music",
+         "Super Mario", "American Pickers", "Microsoft Office 2010", "Happy Feet", "Modern Family",
+         "American Idol", "Hacking for Dummies"]
+
+
+class TestSubstringIndex(unittest.TestCase):
+
+    def test_matches_a_scan(self):
+        """
+        Test that substring queries return what a case-insensitive scan returns, in the same order, for catalogs
+        searched through the trigram postings and for short queries answered by a scan.
+        """
+        catalog = NAMES + [f"Catalog file {i:05d}" for i in range(SCAN_LIMIT * 4)]
+        index = SubstringIndex(catalog)
+        for query in ("Feet", "wINDOWS", "an", "a", "", "file 0012", "ame", "e 0", "Missing", "Happy Feet 2"):
+            self.assertEqual(index.search(query), [name for name in catalog if query.lower() in name.lower()], query)
+
+    def test_prefix(self):
+        index = SubstringIndex(NAMES)
+        self.assertEqual(index.prefix("ameri"), ["American Idol", "American Pickers"])
+        self.assertEqual(index.prefix("windows "), ["Windows 8", "Windows XP"])
+        self.assertEqual(index.prefix("zz"), [])
+
+    def test_sync_applies_changes(self):
+        """
+        Test that syncing to a replaced file list adds and removes names, including postings left empty.
+        """
+        files = set(random.sample(NAMES, 10))
+        index = SubstringIndex()
+        index.sync(files)
+        for _ in range(50):
+            files = (files - {random.choice(sorted(files))}) | {random.choice(NAMES)}
+            index.sync(files)
+            self.assertEqual(len(index), len(files))
+            self.assertEqual(sorted(index.prefix("")), sorted(files))
+        index.sync(set())
+        self.assertEqual(index.stats()["trigrams"], 0)
+        self.assertEqual(index.search("Feet"), [])
+
+    def test_stats(self):
+        stats = SubstringIndex(["Happy Feet"]).stats()
+        self.assertEqual((stats["names"], stats["trigrams"], stats["postings"]), (1, 8, 8))
+        self.assertGreater(stats["bytes"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
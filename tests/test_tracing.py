@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import tracing
+from connections import codec
+from connections.bootstrap_server_connection import BootstrapServerConnection
+from ttypes import Node
+
+
+class TestQueryTracing(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.trace_path = os.path.join(temp_dir.name, "spans.jsonl")
+        tracing.configure(self.trace_path)
+        self.addCleanup(tracing.configure, None)
+
+        bootstrap = Node("127.0.0.1", 5000, "bootstrap")
+        self.origin = Node("127.0.0.1", 5001, "origin")
+        self.middle = Node("127.0.0.1", 5002, "middle")
+        self.holder = Node("127.0.0.1", 5003, "holder")
+        self.origin.routing_table = [("127.0.0.1", 5002)]
+        self.middle.routing_table = [("127.0.0.1", 5003)]
+        self.holder.file_list = ["Happy Feet"]
+        self.connections = {
+            node.port: BootstrapServerConnection(bootstrap, node) for node in (self.origin, self.middle, self.holder)
+        }
+
+    def deliver(self, target_ip, target_port, message, timeout=None):
+        """Hand a forwarded SER to the target node's search logic, as its listener would."""
+        ser = codec.decode(message)
+        return self.connections[target_port].search_file(ser.file_name, ser.hops, trace_context=ser.trace_context)
+
+    def test_spans_rebuild_critical_path(self):
+        """
+        Test that every hop writes a span and that the critical path runs from the originator to the holder.
+        """
+        with patch.object(BootstrapServerConnection, "send_message", side_effect=self.deliver):
+            response = self.connections[5001].search_file("Feet")
+
+        self.assertIn("SEROK 1 127.0.0.1 5003", response)
+        self.assertIn("trace=", response)
+
+        with open(self.trace_path) as f:
+            spans = [json.loads(line) for line in f]
+        self.assertEqual(len(spans), 3)
+        self.assertEqual(len({span["trace_id"] for span in spans}), 1)
+
+        traces = tracing.load_spans([self.trace_path])
+        path = tracing.critical_path(next(iter(traces.values())))
+        self.assertEqual([hop["node"] for hop in path], ["127.0.0.1:5001", "127.0.0.1:5002", "127.0.0.1:5003"])
+        self.assertEqual([hop["outcome"] for hop in path], ["forwarded", "forwarded", "hit"])
+        for hop in path:
+            self.assertGreaterEqual(hop["self_seconds"], 0)
+            self.assertLessEqual(hop["self_seconds"], hop["total_seconds"])
+
+    def test_untraced_search_writes_nothing(self):
+        """
+        Test that searches are not traced when tracing is off and no context is received.
+        """
+        tracing.configure(None)
+        response = self.connections[5003].search_file("Feet")
+        self.assertNotIn("trace=", response)
+        self.assertEqual(os.path.getsize(self.trace_path), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
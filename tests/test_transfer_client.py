@@ -0,0 +1,103 @@
+import hashlib
+import http.server
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.parse
+
+try:
+    import requests
+    from transfer_client import TransferClient, summarize
+except ImportError:
+    requests = None
+
+FILES = {"file_1MB.bin": os.urandom(1024 * 1024), "file_5KB.bin": os.urandom(5 * 1024)}
+
+
+class StubApi(http.server.BaseHTTPRequestHandler):
+    """Serves /generate, /download/<name> and /upload like app.py."""
+    protocol_version = "HTTP/1.1"  # Keep-alive, as Flask behind a real server
+    uploads = {}
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urllib.parse.unquote(self.path)
+        if path == "/generate":
+            details = {"file_name": "file_1MB.bin", "file_size_mb": 1,
+                       "sha256_hash": hashlib.sha256(FILES["file_1MB.bin"]).hexdigest()}
+            self.reply(200, json.dumps(details).encode())
+        elif path.startswith("/download/") and path[len("/download/"):] in FILES:
+            self.reply(200, FILES[path[len("/download/"):]], "application/octet-stream")
+        else:
+            self.reply(404, b'{"error": "File not found"}')
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        StubApi.uploads[self.path] = StubApi.uploads.get(self.path, 0) + len(body)
+        self.reply(200, b'{"message": "File uploaded successfully"}')
+
+
+@unittest.skipUnless(requests, "requests is not installed")
+class TestTransferClient(unittest.TestCase):
+
+    def setUp(self):
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubApi)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        download_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(download_dir.cleanup)
+        self.client = TransferClient(f"http://127.0.0.1:{server.server_address[1]}", download_dir=download_dir.name)
+        self.addCleanup(self.client.close)
+
+    def test_download_is_verified_while_streaming(self):
+        """
+        Test that a generated file downloads with a matching SHA-256 and that a wrong digest or name fails.
+        """
+        details = self.client.generate()
+        result = self.client.download(details["file_name"], details["sha256_hash"])
+        self.assertTrue(result.ok)
+        self.assertEqual((result.bytes, result.verified), (1024 * 1024, True))
+
+        mismatch = self.client.download("file_5KB.bin", details["sha256_hash"])
+        self.assertEqual((mismatch.verified, mismatch.ok), (False, False))
+        blocks = [hashlib.sha256(FILES["file_1MB.bin"]).hexdigest()]
+        corrupt = self.client.download("file_5KB.bin", details["sha256_hash"], expected_blocks=blocks)
+        self.assertEqual(corrupt.error, "SHA-256 mismatch from block 0")
+        missing = self.client.download("missing.bin")
+        self.assertFalse(missing.ok)
+        self.assertIn("404", missing.error)
+
+    def test_concurrent_run_reuses_sessions(self):
+        """
+        Test that concurrent transfers use one session per worker thread and are summarized per kind.
+        """
+        digest = hashlib.sha256(FILES["file_5KB.bin"]).hexdigest()
+        path = os.path.join(self.client.download_dir, "upload.bin")
+        with open(path, "wb") as f:
+            f.write(FILES["file_5KB.bin"])
+
+        results, wall_seconds = self.client.run([("file_5KB.bin", digest)] * 12, [path] * 4, concurrency=3)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertLessEqual(len(self.client.sessions), 3)
+        self.assertEqual({result.sha256 for result in results}, {digest})
+
+        report = summarize(results, wall_seconds)
+        self.assertEqual((report["download"]["transfers"], report["upload"]["transfers"]), (12, 4))
+        self.assertEqual(report["all"]["bytes"], 16 * len(FILES["file_5KB.bin"]))
+        self.assertEqual(report["all"]["per_transfer_mb_per_second"]["count"], 16)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+from config.config import TRACE_LOG_PATH
+
+
+def new_trace_id():
+    return uuid.uuid4().hex[:16]
+
+
+def new_span_id():
+    return os.urandom(4).hex()
+
+
+class Span:
+    """
+    Timing record for one hop of a traced search.
+
+    `received_at` is wall-clock time so spans written by different processes can be lined up; the durations
+    are measured with a monotonic clock.
+    """
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "node", "file_name", "hops", "received_at",
+                 "local_search_seconds", "forward_seconds", "outcome", "start")
+
+    def __init__(self, trace_id, parent_id, node, file_name, hops):
+        self.trace_id = trace_id
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.node = node
+        self.file_name = file_name
+        self.hops = hops
+        self.received_at = time.time()
+        self.local_search_seconds = 0.0
+        self.forward_seconds = 0.0
+        self.outcome = None
+        self.start = time.perf_counter()
+
+    def context(self):
+        """Value of the trace field of messages sent on behalf of this span: <trace id>:<span id>."""
+        return f"{self.trace_id}:{self.span_id}"
+
+    def finish(self, outcome):
+        self.outcome = outcome
+        writer = get_writer()
+        if writer is not None:
+            writer.write(self)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "node": self.node,
+            "file_name": self.file_name,
+            "hops": self.hops,
+            "received_at": self.received_at,
+            "local_search_seconds": self.local_search_seconds,
+            "forward_seconds": self.forward_seconds,
+            "total_seconds": time.perf_counter() - self.start,
+            "outcome": self.outcome,
+        }
+
+
+class TraceWriter:
+    """Appends finished spans to a JSON-lines file, one span per line."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "a")
+
+    def write(self, span):
+        line = json.dumps(span.to_dict(), separators=(",", ":")) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def configure(path):
+    """Write spans of this process to `path` (None stops writing)."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+        _writer = TraceWriter(path) if path else None
+
+
+def get_writer():
+    return _writer
+
+
+def tracing_enabled():
+    return _writer is not None
+
+
+def start_span(trace_context, node, file_name, hops):
+    """
+    Start a span for a SER handled by `node`.
+
+    A span is recorded when the incoming message carries a trace context, or when this process writes traces
+    and the SER originates here (a new trace is started).
+
+    Returns:
+        Span: The new span, or None if the search is not traced.
+    """
+    if trace_context is not None:
+        trace_id, parent_id = trace_context
+        return Span(trace_id, parent_id, node, file_name, hops)
+    if tracing_enabled():
+        return Span(new_trace_id(), None, node, file_name, hops)
+    return None
+
+
+def load_spans(paths):
+    """Read spans from one or more JSON-lines trace files and group them by trace id."""
+    traces = {}
+    for path in paths:
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    span = json.loads(line)
+                    traces.setdefault(span["trace_id"], []).append(span)
+    return traces
+
+
+def critical_path(spans):
+    """
+    Rebuild the critical path of one traced query.
+
+    The path runs from the root span (the node that issued the SER) to the span that found the file, or to the
+    slowest leaf if nobody found it. Each hop reports its local search time, the time spent waiting on the
+    next hop, and its own overhead (total time minus the time of the next hop on the path).
+
+    Args:
+        spans (list): Span dicts of a single trace, as written by TraceWriter.
+
+    Returns:
+        list: One dict per hop, ordered from the originator to the last hop.
+    """
+    by_id = {span["span_id"]: span for span in spans}
+    children = {}
+    for span in spans:
+        children.setdefault(span["parent_id"], []).append(span)
+
+    hits = [span for span in spans if span["outcome"] == "hit"]
+    if hits:
+        end = min(hits, key=lambda span: span["received_at"])
+    else:
+        leaves = [span for span in spans if span["span_id"] not in children]
+        end = max(leaves, key=lambda span: span["received_at"] + span["total_seconds"])
+
+    path = [end]
+    while path[-1]["parent_id"] in by_id:
+        path.append(by_id[path[-1]["parent_id"]])
+    path.reverse()
+
+    breakdown = []
+    for i, span in enumerate(path):
+        downstream = path[i + 1]["total_seconds"] if i + 1 < len(path) else 0.0
+        breakdown.append({
+            "node": span["node"],
+            "hops": span["hops"],
+            "outcome": span["outcome"],
+            "local_search_seconds": span["local_search_seconds"],
+            "forward_seconds": span["forward_seconds"],
+            "total_seconds": span["total_seconds"],
+            "self_seconds": max(span["total_seconds"] - downstream, 0.0),
+        })
+    return breakdown
+
+
+if TRACE_LOG_PATH:
+    configure(TRACE_LOG_PATH)
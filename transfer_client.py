@@ -0,0 +1,311 @@
+"""
+Concurrent HTTP transfer client for the Flask API (app.py).
+
+Every worker thread keeps one keep-alive `requests.Session`, so repeated transfers reuse their TCP connections.
+Downloads are streamed to disk in chunks, which a `HashPipeline` worker hashes while the next ones arrive. The digest
+is compared with the one `/generate` reported, so a download is verified the moment its last byte is written.
+Uploads stream a local file to `/upload` as a multipart body and hash it as it is sent. Every transfer reports its
+MB/s, and a run reports the aggregate throughput over its wall-clock time.
+
+Example:
+    python transfer_client.py --url http://127.0.0.1:4000 --generate 4 --downloads 32 --uploads 8 --concurrency 8
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config.config import FLASK_API_URL
+from utils.hash_pipeline import HashPipeline
+from utils.streaming_stats import StreamingSummary
+
+CHUNK_SIZE = 1024 * 1024
+MB = 1024 * 1024
+
+
+class TransferResult:
+    __slots__ = ("kind", "name", "bytes", "seconds", "sha256", "verified", "error")
+
+    def __init__(self, kind, name, size=0, seconds=0.0, sha256=None, verified=None, error=None):
+        self.kind = kind
+        self.name = name
+        self.bytes = size
+        self.seconds = seconds
+        self.sha256 = sha256
+        self.verified = verified  # None when there was no digest to compare with
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None and self.verified is not False
+
+    @property
+    def mb_per_second(self):
+        return self.bytes / MB / self.seconds if self.seconds > 0 else 0.0
+
+
+class MultipartUpload:
+    """
+    multipart/form-data body with one file field, read in blocks while it is sent.
+
+    `requests` reads a file-like body with a length block by block as it writes it to the socket (instead of building
+    the whole body first, as it does for `files=`), so the file is hashed while it is sent.
+    """
+
+    def __init__(self, f, size, file_name, field="file"):
+        self.boundary = os.urandom(16).hex()
+        file_name = file_name.replace("\\", "\\\\").replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+        head = (f"--{self.boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{file_name}\"\r\n"
+                f"Content-Type: application/octet-stream\r\n\r\n").encode()
+        tail = f"\r\n--{self.boundary}--\r\n".encode()
+        self.length = len(head) + size + len(tail)
+        self.parts = [head, f, tail]
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        while self.parts:
+            part = self.parts[0]
+            if isinstance(part, bytes):
+                data = part if size < 0 else part[:size]
+                self.parts[0] = part[len(data):]
+            else:
+                data = part.read(size)
+                self.sha256.update(data)
+                self.bytes += len(data)
+            if data:
+                return data
+            self.parts.pop(0)
+        return b""
+
+
+class TransferClient:
+    def __init__(self, base_url=FLASK_API_URL, timeout=30, download_dir=None):
+        """
+        Args:
+            base_url (str): URL of the Flask API.
+            timeout (float): Seconds to wait for a connection or for the next chunk.
+            download_dir (str): Where downloads are written. Defaults to a temporary directory.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.download_dir = download_dir or tempfile.mkdtemp(prefix="transfers-")
+        os.makedirs(self.download_dir, exist_ok=True)
+        self.local = threading.local()
+        self.sessions = []
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def session(self):
+        """Return the calling thread's keep-alive session."""
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self.local.session = session
+            with self.lock:
+                self.sessions.append(session)
+        return session
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions:
+                session.close()
+            self.sessions = []
+
+    def url(self, *parts):
+        return "/".join([self.base_url] + [urllib.parse.quote(part) for part in parts])
+
+    def generate(self):
+        """
+        Ask the API to generate a random file.
+
+        Returns:
+            dict: file_name, file_size_mb and sha256_hash.
+        """
+        response = self.session().get(self.url("generate"), timeout=self.timeout)
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to generate file. Status: {response.status_code}, Response: {response.text}")
+        return response.json()
+
+    def download(self, file_name, expected_sha256=None, route="download", expected_blocks=None):
+        """
+        Stream a file to `download_dir` while a worker thread hashes the chunks already received.
+
+        Args:
+            file_name (str): Name of the file on the API.
+            expected_sha256 (str): Digest to verify against, e.g. the one returned by `generate`.
+            route (str): "download" for generated files or "uploaded" for uploaded ones.
+            expected_blocks (list): Per-block digests from `generate`, used to report the first corrupt block.
+
+        Returns:
+            TransferResult: The outcome; a failed transfer has `error` set rather than raising.
+        """
+        result = TransferResult(route, file_name)
+        # Downloads of the same file from several threads must not share a partial file
+        path = os.path.join(self.download_dir, f"{threading.get_ident()}-{os.path.basename(file_name)}")
+        start = time.perf_counter()
+        with HashPipeline(block_digests=expected_blocks is not None) as pipeline:
+            try:
+                with self.session().get(self.url(route, file_name), stream=True, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    with open(path, "wb") as f:
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            pipeline.feed(chunk)
+                            f.write(chunk)
+                            result.bytes += len(chunk)
+            except (requests.RequestException, OSError) as e:
+                result.error = str(e)
+            result.sha256 = pipeline.hexdigest()
+        result.seconds = time.perf_counter() - start
+        if expected_sha256 is not None and result.error is None:
+            result.verified = result.sha256 == expected_sha256
+            if not result.verified and expected_blocks is not None:
+                block = first_difference(pipeline.block_hexdigests(), expected_blocks)
+                result.error = f"SHA-256 mismatch from block {block}"
+        return result
+
+    def upload(self, path, name=None):
+        """
+        Upload a local file to /upload.
+
+        Returns:
+            TransferResult: The outcome, with the SHA-256 of the bytes sent.
+        """
+        name = name or os.path.basename(path)
+        result = TransferResult("upload", name)
+        start = time.perf_counter()
+        try:
+            with open(path, "rb") as f:
+                body = MultipartUpload(f, os.fstat(f.fileno()).st_size, name)
+                response = self.session().post(self.url("upload"), data=body,
+                                               headers={"Content-Type": body.content_type}, timeout=self.timeout)
+            response.raise_for_status()
+            result.bytes = body.bytes
+            result.sha256 = body.sha256.hexdigest()
+        except (requests.RequestException, OSError) as e:
+            result.error = str(e)
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def run(self, downloads=(), uploads=(), concurrency=8):
+        """
+        Run transfers concurrently.
+
+        Args:
+            downloads (list): (file name, expected SHA-256 or None) pairs.
+            uploads (list): Local file paths.
+            concurrency (int): Transfers in flight at once.
+
+        Returns:
+            tuple: (list of TransferResult, wall-clock seconds)
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(self.download, name, digest) for name, digest in downloads]
+            futures += [executor.submit(self.upload, path) for path in uploads]
+            results = [future.result() for future in futures]
+        return results, time.perf_counter() - start
+
+
+def first_difference(blocks, expected):
+    """Index of the first block whose digest differs, or the shorter length when one list is a prefix."""
+    for i, (block, other) in enumerate(zip(blocks, expected)):
+        if block != other:
+            return i
+    return min(len(blocks), len(expected))
+
+
+def summarize(results, wall_seconds):
+    """
+    Aggregate transfer results per kind.
+
+    Returns:
+        dict: Kind -> transfers, failures, bytes, aggregate MB/s over the wall-clock time, and a summary of the
+            per-transfer MB/s. The "all" entry covers every transfer.
+    """
+    report = {}
+    for kind in sorted({result.kind for result in results}) + ["all"]:
+        selected = [result for result in results if kind in ("all", result.kind)]
+        rates = StreamingSummary()
+        for result in selected:
+            if result.ok:
+                rates.add(result.mb_per_second)
+        total = sum(result.bytes for result in selected if result.ok)
+        report[kind] = {
+            "transfers": len(selected),
+            "failures": sum(not result.ok for result in selected),
+            "bytes": total,
+            "aggregate_mb_per_second": total / MB / wall_seconds if wall_seconds > 0 else 0.0,
+            "per_transfer_mb_per_second": rates.summary(),
+        }
+    return report
+
+
+def print_report(results, wall_seconds):
+    for result in results:
+        status = "ok" if result.ok else f"FAILED ({result.error or 'SHA-256 mismatch'})"
+        print(f"{result.kind:<10}{result.name:<28}{result.bytes / MB:>9.2f} MB{result.seconds:>9.3f} s"
+              f"{result.mb_per_second:>10.2f} MB/s  {status}")
+    for kind, stats in summarize(results, wall_seconds).items():
+        rates = stats["per_transfer_mb_per_second"]
+        line = (f"{kind}: {stats['transfers']} transfers, {stats['failures']} failed, {stats['bytes'] / MB:.1f} MB "
+                f"in {wall_seconds:.2f} s = {stats['aggregate_mb_per_second']:.2f} MB/s aggregate")
+        if rates["count"]:
+            line += f"; per transfer p50 {rates['p50']:.2f} MB/s, min {rates['min']:.2f} MB/s"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent downloads and uploads against the Flask API.")
+    parser.add_argument("--url", default=FLASK_API_URL)
+    parser.add_argument("--generate", type=int, default=2, help="Files to generate before downloading.")
+    parser.add_argument("--downloads", type=int, default=16, help="Downloads, spread over the generated files.")
+    parser.add_argument("--uploads", type=int, default=0, help="Uploads of the downloaded files.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--download-dir", help="Where downloads are written (a temporary directory by default).")
+    args = parser.parse_args(argv)
+
+    with TransferClient(args.url, download_dir=args.download_dir) as client:
+        # Generated names only encode the size, so a later file can replace an earlier one; keep the last digest
+        generated = {}
+        for _ in range(args.generate):
+            details = client.generate()
+            generated[details["file_name"]] = details["sha256_hash"]
+        files = sorted(generated.items())
+        downloads = [files[i % len(files)] for i in range(args.downloads)] if files else []
+        results, wall_seconds = client.run(downloads, concurrency=args.concurrency)
+
+        uploads = [os.path.join(client.download_dir, name) for name in os.listdir(client.download_dir)]
+        uploads = uploads[:args.uploads]
+        if uploads:
+            upload_results, upload_seconds = client.run(uploads=uploads, concurrency=args.concurrency)
+            results += upload_results
+            wall_seconds += upload_seconds
+    print_report(results, wall_seconds)
+    return 0 if all(result.ok for result in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
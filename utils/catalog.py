@@ -0,0 +1,125 @@
+"""
+Shared, cached catalog of file names (one name per line, e.g. `File Names.txt`).
+
+The catalog is read once into an immutable tuple and shared by every caller in the process. Afterwards `get` only
+compares the file's modification time, size and inode against the loaded copy, at most once per check interval and
+on a background thread, so callers such as the bootstrap server's REG handling never wait for disk I/O. Only the
+very first `get` of a path reads it synchronously.
+
+Large catalogs are read through a memory map and decoded line by line, so the raw file never sits in memory
+alongside the parsed names.
+"""
+import logging
+import mmap
+import os
+import threading
+import time
+
+from config.config import CATALOG_CHECK_INTERVAL
+
+catalogs = {}  # Absolute path -> FileCatalog, shared by the whole process
+catalogs_lock = threading.Lock()
+
+
+def iter_names(path):
+    """
+    Yield the non-empty, stripped lines of a UTF-8 file, read through a memory map.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return  # An empty file cannot be mapped
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start, size = 0, len(data)
+            while start < size:
+                end = data.find(b"\n", start)
+                if end == -1:
+                    end = size
+                name = data[start:end].decode("utf-8").strip()
+                if name:
+                    yield name
+                start = end + 1
+
+
+class FileCatalog:
+    def __init__(self, path, check_interval=CATALOG_CHECK_INTERVAL):
+        """
+        Args:
+            path (str): File with one name per line.
+            check_interval (float): Seconds between checks of the file for changes.
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self.names = None  # Tuple of names, replaced as a whole on reload
+        self.signature = None  # (mtime in ns, size, inode) of the loaded file
+        self.checked_at = 0.0
+        self.loads = 0
+        self.reload_lock = threading.Lock()
+        self.refresher = None  # Thread of the last background check
+
+    def get(self):
+        """
+        Return the names as a tuple. A due check for changes runs in the background; until it completes the
+        previous names are returned.
+        """
+        if self.names is None:
+            with self.reload_lock:
+                if self.names is None:
+                    self.refresh()
+            return self.names
+        if time.monotonic() - self.checked_at >= self.check_interval and self.reload_lock.acquire(blocking=False):
+            self.checked_at = time.monotonic()
+            self.refresher = threading.Thread(target=self.refresh_in_background, daemon=True)
+            self.refresher.start()
+        return self.names
+
+    def refresh_in_background(self):
+        try:
+            self.refresh()
+        finally:
+            self.reload_lock.release()
+
+    def refresh(self):
+        """
+        Reload the names if the file changed since it was loaded.
+
+        Returns:
+            bool: Whether the names were reloaded.
+        """
+        self.checked_at = time.monotonic()
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            if signature == self.signature:
+                return False
+            names = tuple(iter_names(self.path))
+        except FileNotFoundError:
+            logging.error(f"Error: File '{self.path}' not found.")
+            return self.keep_previous()
+        except PermissionError:
+            logging.error(f"Error: Permission denied for file '{self.path}'.")
+            return self.keep_previous()
+        except (UnicodeDecodeError, OSError, ValueError) as e:
+            logging.error(f"Error: Cannot read file names from '{self.path}': {e}")
+            return self.keep_previous()
+        self.names = names
+        self.signature = signature
+        self.loads += 1
+        logging.info(f"Loaded {len(names)} file names from {self.path}")
+        return True
+
+    def keep_previous(self):
+        """Keep serving the last names loaded, if any; a catalog being rewritten is better than none."""
+        self.signature = None  # Load again as soon as the file can be read
+        if self.names is None:
+            self.names = ()
+        return False
+
+
+def get_catalog(path):
+    """Return the process-wide catalog of a file, creating it on first use."""
+    key = os.path.abspath(path)
+    with catalogs_lock:
+        catalog = catalogs.get(key)
+        if catalog is None:
+            catalog = catalogs[key] = FileCatalog(path)
+        return catalog
@@ -1,10 +1,13 @@
-import logging
+from utils.catalog import get_catalog
 
 
 def read_file_names(file_path):
     """
     Reads a list of file names from a given file.
 
+    The file is read through a memory map once per process, and again only when it changes. The names are shared
+    with every other reader of the same path (see `utils.catalog`). Empty lines are skipped.
+
     Args:
         file_path (str): The path to the file containing the list of file names.
 
@@ -12,21 +15,7 @@ def read_file_names(file_path):
         list: A list of file names (str) read from the file. Returns an empty list if the file is not found.
 
     Exceptions:
-        FileNotFoundError: Logs an error and returns an empty list if the specified file does not exist.
+        FileNotFoundError, PermissionError, UnicodeDecodeError: Logged by the catalog; an empty list is returned if
+            the file could never be read.
     """
-    try:
-        with open(file_path, 'r') as file:
-            file_names = [line.strip() for line in file.readlines()]
-        return file_names
-    except FileNotFoundError:
-        logging.error(f"Error: File '{file_path}' not found.")
-        return []
-    except PermissionError:
-        logging.error(f"Error: Permission denied for file '{file_path}'.")
-        return []
-    except UnicodeDecodeError:
-        logging.error(f"Error: Cannot decode contents of file '{file_path}'.")
-        return []
-    except Exception as e:
-        logging.error(f"An unexpected error occurred while reading file '{file_path}': {e}")
-        return []
+    return list(get_catalog(file_path).get())
@@ -0,0 +1,123 @@
+"""
+Hashing that runs alongside the I/O producing the data.
+
+The thread receiving or generating a file feeds its chunks into a `HashPipeline` and goes straight back to I/O, while
+a worker thread hashes them. hashlib releases the GIL on large buffers, so hashing overlaps with the transfer and the
+digest is ready almost as soon as the last byte arrives, with no second read of the file. A bounded queue between
+the two keeps memory flat: a producer that outruns the hasher blocks until the hasher catches up.
+
+Besides the whole-file digest the worker computes a digest per fixed-size block, regardless of how the producer
+split the data, so two sides can compare files block by block.
+"""
+import hashlib
+import queue
+import threading
+
+from config.config import HASH_BLOCK_SIZE, HASH_PIPELINE_DEPTH
+
+STOP = object()
+
+
+class HashPipeline:
+    def __init__(self, algorithm="sha256", block_size=HASH_BLOCK_SIZE, depth=HASH_PIPELINE_DEPTH, block_digests=True):
+        """
+        Args:
+            algorithm (str): hashlib algorithm name.
+            block_size (int): Bytes covered by each per-block digest.
+            depth (int): Chunks queued for hashing before `feed` blocks.
+            block_digests (bool): Whether to compute per-block digests besides the whole-file digest.
+        """
+        self.algorithm = algorithm
+        self.block_size = block_size
+        self.block_digests = block_digests
+        self.queue = queue.Queue(depth)
+        self.digest = hashlib.new(algorithm)
+        self.block = hashlib.new(algorithm)
+        self.block_fill = 0
+        self.blocks = []  # Hex digests of the completed blocks, in order
+        self.bytes = 0
+        self.error = None
+        self.finished = False
+        self.worker = threading.Thread(target=self.run, name="hash-pipeline", daemon=True)
+        self.worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif not self.finished:
+            self.finished = True  # Let the worker finish in the background, the caller's error takes precedence
+            self.queue.put(STOP)
+
+    def feed(self, chunk):
+        """Queue a chunk of bytes for hashing; blocks while the queue is full."""
+        if self.finished:
+            raise ValueError("Hash pipeline is already finished")
+        if chunk:
+            self.queue.put(bytes(chunk))  # A private copy, the caller may reuse its buffer
+
+    def close(self):
+        """Wait for every queued chunk to be hashed."""
+        if not self.finished:
+            self.finished = True
+            self.queue.put(STOP)
+            self.worker.join()
+        if self.error is not None:
+            raise self.error
+
+    def hexdigest(self):
+        """Return the whole-file digest once everything fed so far has been hashed."""
+        self.close()
+        return self.digest.hexdigest()
+
+    def block_hexdigests(self):
+        """Return the per-block digests; the last block may be shorter than `block_size`."""
+        self.close()
+        if self.block_fill:
+            self.blocks.append(self.block.hexdigest())
+            self.block = hashlib.new(self.algorithm)
+            self.block_fill = 0
+        return list(self.blocks)
+
+    def run(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is STOP:
+                return
+            if self.error is not None:
+                continue  # Keep draining so that the producer never blocks on a dead worker
+            try:
+                self.hash(chunk)
+            except Exception as e:
+                self.error = e
+
+    def hash(self, chunk):
+        self.digest.update(chunk)
+        self.bytes += len(chunk)
+        if not self.block_digests:
+            return
+        view = memoryview(chunk)
+        while view:
+            take = min(self.block_size - self.block_fill, len(view))
+            self.block.update(view[:take])
+            self.block_fill += take
+            view = view[take:]
+            if self.block_fill == self.block_size:
+                self.blocks.append(self.block.hexdigest())
+                self.block = hashlib.new(self.algorithm)
+                self.block_fill = 0
+
+
+def hash_file(path, algorithm="sha256", block_size=HASH_BLOCK_SIZE, read_size=HASH_BLOCK_SIZE):
+    """
+    Hash a local file, reading the next chunk while the previous one is hashed.
+
+    Returns:
+        tuple: (whole-file hex digest, list of per-block hex digests)
+    """
+    with HashPipeline(algorithm, block_size) as pipeline, open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(read_size), b""):
+            pipeline.feed(chunk)
+    return pipeline.hexdigest(), pipeline.block_hexdigests()
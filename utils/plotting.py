@@ -0,0 +1,34 @@
+import os
+import sys
+
+
+def has_display():
+    """Return True if an interactive matplotlib window can be opened."""
+    if sys.platform in ("win32", "darwin"):
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def load_pyplot(headless=None):
+    """
+    Import matplotlib.pyplot on first use.
+
+    Args:
+        headless (bool): Force the non-interactive Agg backend. By default Agg is used when there is no display,
+            unless MPLBACKEND chooses a backend explicitly.
+
+    Returns:
+        module: matplotlib.pyplot
+    """
+    import matplotlib
+
+    if headless is None:
+        headless = not os.environ.get("MPLBACKEND") and not has_display()
+    if headless:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def is_interactive(plt):
+    return plt.get_backend().lower() != "agg"
@@ -0,0 +1,204 @@
+import math
+
+
+class RunningStats:
+    """
+    Count, mean, variance, min and max of a stream in O(1) memory (Welford's algorithm).
+
+    Two instances can be merged exactly (Chan et al.), so per-node or per-process results can be combined.
+    """
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2, self.min, self.max = other.count, other.mean, other.m2, other.min, other.max
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Sample variance, like `statistics.variance`."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance)
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.count, stats.mean, stats.m2, stats.min, stats.max = (
+            data["count"], data["mean"], data["m2"], data["min"], data["max"])
+        return stats
+
+
+class LogHistogram:
+    """
+    HDR-style histogram with logarithmic buckets for non-negative values.
+
+    Bucket boundaries grow by a factor of (1 + relative_error), so every quantile is reported within
+    `relative_error` of the true sample whatever its magnitude. Values below `lowest` share one bucket. Memory is
+    bounded by the number of buckets between `lowest` and the largest value seen (about 2,800 buckets to cover
+    1 microsecond to 1,000,000 seconds at 1%), not by the number of samples. Histograms with the same
+    parameters merge by adding counts.
+    """
+
+    __slots__ = ("relative_error", "lowest", "log_base", "counts", "zero_count", "total")
+
+    def __init__(self, relative_error=0.01, lowest=1e-6):
+        self.relative_error = relative_error
+        self.lowest = lowest
+        self.log_base = math.log1p(relative_error)
+        self.counts = {}  # bucket index -> count
+        self.zero_count = 0  # Values below `lowest`
+        self.total = 0
+
+    def bucket(self, value):
+        return int(math.log(value / self.lowest) / self.log_base)
+
+    def bucket_value(self, index):
+        """Representative value of a bucket: the middle of its bounds, within `relative_error` of any member."""
+        low = self.lowest * math.exp(index * self.log_base)
+        return low * (1 + self.relative_error / 2)
+
+    def add(self, value, count=1):
+        if value < 0:
+            raise ValueError("LogHistogram only records non-negative values")
+        self.total += count
+        if value < self.lowest:
+            self.zero_count += count
+        else:
+            index = self.bucket(value)
+            self.counts[index] = self.counts.get(index, 0) + count
+
+    def merge(self, other):
+        if (other.relative_error, other.lowest) != (self.relative_error, self.lowest):
+            raise ValueError("Cannot merge histograms with different precision")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.total += other.total
+        return self
+
+    def quantile(self, q):
+        """Return the value at quantile `q` (0..1), or None if the histogram is empty."""
+        if self.total == 0:
+            return None
+        rank = max(1, math.ceil(q * self.total))
+        seen = self.zero_count
+        if seen >= rank:
+            return 0.0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return self.bucket_value(index)
+        return self.bucket_value(max(self.counts))
+
+    def cdf(self):
+        """Return (values, cumulative fractions) suitable for plotting a CDF."""
+        values, fractions = [], []
+        seen = self.zero_count
+        if seen:
+            values.append(0.0)
+            fractions.append(seen / self.total)
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            values.append(self.bucket_value(index))
+            fractions.append(seen / self.total)
+        return values, fractions
+
+    def to_dict(self):
+        return {"relative_error": self.relative_error, "lowest": self.lowest, "zero_count": self.zero_count,
+                "counts": {str(index): count for index, count in self.counts.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data["relative_error"], data["lowest"])
+        histogram.zero_count = data["zero_count"]
+        histogram.counts = {int(index): count for index, count in data["counts"].items()}
+        histogram.total = histogram.zero_count + sum(histogram.counts.values())
+        return histogram
+
+
+class StreamingSummary:
+    """Exact min / max / mean / standard deviation plus approximate quantiles of a stream, in constant memory."""
+
+    __slots__ = ("stats", "histogram")
+
+    def __init__(self, relative_error=0.01, lowest=1e-6):
+        self.stats = RunningStats()
+        self.histogram = LogHistogram(relative_error, lowest)
+
+    def add(self, value):
+        self.stats.add(value)
+        self.histogram.add(value)
+
+    def merge(self, other):
+        self.stats.merge(other.stats)
+        self.histogram.merge(other.histogram)
+        return self
+
+    def __len__(self):
+        return self.stats.count
+
+    def quantile(self, q):
+        value = self.histogram.quantile(q)
+        if value is None:
+            return None
+        # Bucket midpoints can fall just outside the observed range
+        return min(max(value, self.stats.min), self.stats.max)
+
+    def summary(self):
+        if self.stats.count == 0:
+            return {"count": 0, "min": None, "max": None, "average": None, "std_dev": None,
+                    "p50": None, "p99": None, "p999": None}
+        return {
+            "count": self.stats.count,
+            "min": self.stats.min,
+            "max": self.stats.max,
+            "average": self.stats.mean,
+            "std_dev": self.stats.stdev,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "p999": self.quantile(0.999),
+        }
+
+    def to_dict(self):
+        return {"stats": self.stats.to_dict(), "histogram": self.histogram.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls()
+        summary.stats = RunningStats.from_dict(data["stats"])
+        summary.histogram = LogHistogram.from_dict(data["histogram"])
+        return summary
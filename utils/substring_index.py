@@ -0,0 +1,143 @@
+"""
+Case-insensitive substring and prefix index over file names.
+
+Every lowercased name is broken into its trigrams (three-character substrings), and each trigram maps to the set of
+names containing it. A query of three characters or more can only match names that contain all of its trigrams, so
+it intersects the smallest posting sets first and checks just the few remaining candidates, instead of lowercasing and
+scanning the whole catalog. Prefix queries use a sorted list of the lowercased names and bisection. Queries shorter
+than a trigram fall back to a scan, they match a large part of any catalog anyway, and so do small catalogs.
+"""
+import bisect
+import sys
+import threading
+
+GRAM = 3
+SCAN_LIMIT = 64  # Below this many names a scan of the lowercased names beats building the query's trigrams
+
+
+def trigrams(text):
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+class SubstringIndex:
+    def __init__(self, names=()):
+        self.lock = threading.Lock()
+        self.ids = {}  # Name -> id; ids grow with insertion, so sorting ids restores insertion order
+        self.lowered = {}  # Id -> (lowercased name, name)
+        self.postings = {}  # Trigram -> set of ids
+        self.sorted = []  # (lowercased name, id), for prefix queries
+        self.next_id = 0
+        self.source = None  # Collection last passed to `sync`
+        for name in names:
+            self.add_locked(name, keep_sorted=False)
+        self.sorted.sort()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, name):
+        with self.lock:
+            self.add_locked(name)
+
+    def remove(self, name):
+        with self.lock:
+            self.remove_locked(name)
+
+    def sync(self, names):
+        """
+        Make the index hold exactly `names`, applying only the difference to what it holds.
+
+        Callers replace their file list rather than mutating it, so an unchanged list is recognised by identity and
+        costs nothing.
+        """
+        with self.lock:
+            if names is self.source:
+                return
+            wanted = names if isinstance(names, (set, frozenset)) else set(names)
+            for name in [name for name in self.ids if name not in wanted]:
+                self.remove_locked(name)
+            for name in names:
+                if name not in self.ids:
+                    self.add_locked(name, keep_sorted=False)
+            self.sorted.sort()  # Appended entries are merged in one pass rather than inserted one by one
+            self.source = names
+
+    def search(self, query):
+        """
+        Return the names containing `query`, ignoring case, in insertion order.
+        """
+        query = query.lower()
+        with self.lock:
+            if len(query) < GRAM or len(self.ids) <= SCAN_LIMIT:
+                return [name for lowered, name in self.lowered.values() if query in lowered]
+            postings = []
+            for gram in trigrams(query):
+                ids = self.postings.get(gram)
+                if not ids:
+                    return []
+                postings.append(ids)
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for ids in postings[1:]:
+                candidates &= ids
+                if not candidates:
+                    return []
+            entries = [self.lowered[i] for i in sorted(candidates)]
+        return [name for lowered, name in entries if query in lowered]
+
+    def prefix(self, query):
+        """
+        Return the names starting with `query`, ignoring case, in lexicographic order.
+        """
+        query = query.lower()
+        with self.lock:
+            start = bisect.bisect_left(self.sorted, (query,))
+            matches = []
+            for lowered, i in self.sorted[start:]:
+                if not lowered.startswith(query):
+                    break
+                matches.append(self.lowered[i][1])
+        return matches
+
+    def stats(self):
+        """
+        Size of the index; `bytes` is an estimate from `sys.getsizeof` of its containers, keys and postings.
+        """
+        with self.lock:
+            size = sum(sys.getsizeof(each) for each in (self.ids, self.lowered, self.postings, self.sorted))
+            size += sum(sys.getsizeof(gram) + sys.getsizeof(ids) for gram, ids in self.postings.items())
+            size += sum(sys.getsizeof(entry) + sys.getsizeof(entry[0]) for entry in self.lowered.values())
+            size += len(self.sorted) * sys.getsizeof((None, None))
+            return {
+                "names": len(self.ids),
+                "trigrams": len(self.postings),
+                "postings": sum(len(ids) for ids in self.postings.values()),
+                "bytes": size,
+            }
+
+    def add_locked(self, name, keep_sorted=True):
+        if name in self.ids:
+            return
+        i = self.next_id
+        self.next_id += 1
+        lowered = name.lower()
+        self.ids[name] = i
+        self.lowered[i] = (lowered, name)
+        for gram in trigrams(lowered):
+            self.postings.setdefault(gram, set()).add(i)
+        if keep_sorted:
+            bisect.insort(self.sorted, (lowered, i))
+        else:
+            self.sorted.append((lowered, i))
+
+    def remove_locked(self, name):
+        i = self.ids.pop(name, None)
+        if i is None:
+            return
+        lowered, _ = self.lowered.pop(i)
+        for gram in trigrams(lowered):
+            ids = self.postings[gram]
+            ids.discard(i)
+            if not ids:
+                del self.postings[gram]
+        del self.sorted[bisect.bisect_left(self.sorted, (lowered, i))]